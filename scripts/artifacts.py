@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Versioned, content-addressed store for generated images.
+
+Every image gen_image.py produces is written once to
+out-images/.store/objects/<sha256>.jpg: first to a temporary file, then
+fsynced and renamed, so a crash or a concurrent run can never leave a
+truncated JPEG behind. The canonical name (out-images/<page-id>-openai.jpg)
+is a hard link to the chosen version, swapped in with an atomic rename, so
+gen_all_images.py, build_site.py and everything else keep reading the same path.
+Regenerating a page adds a version instead of destroying the previous one.
+
+Each canonical name has an index in out-images/.store/index/<name>.json
+listing its versions (hash, bytes, creation time, generation metadata) and
+the selected one.
+
+Usage:
+    python3 scripts/artifacts.py list [<page-id> ...]
+    python3 scripts/artifacts.py select <page-id> <hash-prefix>
+    python3 scripts/artifacts.py gc [--keep N] [--keep-days D] [--dry-run]
+    python3 scripts/artifacts.py verify
+    python3 scripts/artifacts.py adopt
+
+`gc` keeps the selected version of every image, plus its N most recent
+versions (default 3) and any version younger than D days (default 30), and
+deletes every other object. `verify` checks that each canonical image is
+intact and still points at its selected version. `adopt` brings images
+generated before the store existed under its management.
+
+Examples:
+    python3 scripts/artifacts.py list cu-01
+    python3 scripts/artifacts.py select cu-01 3fa9c2
+    python3 scripts/artifacts.py gc --keep 2 --keep-days 7
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: indexes are still replaced atomically, just not locked
+    fcntl = None
+
+OUT_DIR = Path('out-images')
+STORE_DIR = OUT_DIR / '.store'
+OBJECTS_DIR = STORE_DIR / 'objects'
+INDEX_DIR = STORE_DIR / 'index'
+TMP_DIR = STORE_DIR / 'tmp'
+
+DEFAULT_KEEP = 3
+DEFAULT_KEEP_DAYS = 30
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(sha: str) -> Path:
+    return OBJECTS_DIR / sha[:2] / f"{sha}.jpg"
+
+
+def index_path(canonical: Path) -> Path:
+    return INDEX_DIR / f"{canonical.name}.json"
+
+
+@contextmanager
+def _locked(canonical: Path):
+    """Serialize index updates for one canonical name across processes."""
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    with open(INDEX_DIR / f"{canonical.name}.lock", 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_index(canonical: Path) -> dict:
+    """Return a canonical name's index: {'name', 'selected', 'versions': [...]}."""
+    try:
+        with open(index_path(canonical), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'name': canonical.name, 'selected': None, 'versions': []}
+
+
+def _write_atomic_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".tmp-{os.getpid()}")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _point(canonical: Path, sha: str):
+    """Atomically make the canonical name refer to an object."""
+    tmp_path = canonical.with_name(f".{canonical.name}.tmp-{os.getpid()}")
+    try:
+        tmp_path.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(object_path(sha), tmp_path)
+    except OSError:
+        # Filesystems without hard links get a copy instead
+        shutil.copyfile(object_path(sha), tmp_path)
+    os.replace(tmp_path, canonical)
+
+
+def _add_object(tmp_file: Path) -> str:
+    """Move a finished temporary file into the object store. Returns its hash."""
+    sha = _hash_file(tmp_file)
+    target = object_path(sha)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        tmp_file.unlink()  # Identical content is already stored
+    else:
+        os.replace(tmp_file, target)
+    return sha
+
+
+def commit_file(tmp_file: Path, canonical: Path, metadata: Optional[dict] = None, select: bool = True) -> str:
+    """Store a fully written file as a new version of canonical. Returns its hash."""
+    sha = _add_object(tmp_file)
+    with _locked(canonical):
+        index = load_index(canonical)
+        if not any(v['sha'] == sha for v in index['versions']):
+            index['versions'].append({
+                'sha': sha,
+                'bytes': object_path(sha).stat().st_size,
+                'created_at': time.time(),
+                'metadata': metadata or {},
+            })
+        if select or index['selected'] is None:
+            index['selected'] = sha
+            _point(canonical, sha)
+        _write_atomic_json(index_path(canonical), index)
+    return sha
+
+
+def save_image(img, canonical: Path, metadata: Optional[dict] = None, **save_kwargs) -> str:
+    """
+    Save a PIL image as a new version of canonical and select it.
+    save_kwargs are passed to Image.save (e.g. quality=95). Returns the hash.
+    """
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=TMP_DIR, suffix='.jpg')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            img.save(f, "JPEG", **save_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        return commit_file(Path(tmp_name), canonical, metadata)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def selected_metadata(canonical: Path) -> dict:
+    """Return the generation metadata of canonical's selected version ({} if none)."""
+    index = load_index(canonical)
+    for version in index['versions']:
+        if version['sha'] == index['selected']:
+            return version['metadata']
+    return {}
+
+
+def select(canonical: Path, sha_prefix: str) -> str:
+    """Point canonical at an earlier version, by hash prefix. Returns the full hash."""
+    with _locked(canonical):
+        index = load_index(canonical)
+        matches = [v['sha'] for v in index['versions'] if v['sha'].startswith(sha_prefix)]
+        if len(matches) != 1:
+            raise ValueError(f"{len(matches)} versions of {canonical.name} match '{sha_prefix}'")
+        index['selected'] = matches[0]
+        _point(canonical, matches[0])
+        _write_atomic_json(index_path(canonical), index)
+    return matches[0]
+
+
+def all_indexes() -> List[Path]:
+    """Return the canonical path of every indexed image."""
+    if not INDEX_DIR.exists():
+        return []
+    return sorted(OUT_DIR / p.stem for p in INDEX_DIR.glob('*.json'))
+
+
+def gc(keep: int = DEFAULT_KEEP, keep_days: float = DEFAULT_KEEP_DAYS, dry_run: bool = False) -> dict:
+    """
+    Apply the retention policy to every index, then delete unreferenced objects.
+    Returns {'versions': dropped versions, 'objects': deleted objects, 'bytes': bytes freed}.
+    """
+    cutoff = time.time() - keep_days * 86400
+    referenced = set()
+    dropped = 0
+
+    for canonical in all_indexes():
+        with _locked(canonical):
+            index = load_index(canonical)
+            newest_first = sorted(index['versions'], key=lambda v: v['created_at'], reverse=True)
+            kept = [
+                v for position, v in enumerate(newest_first)
+                if v['sha'] == index['selected'] or position < keep or v['created_at'] >= cutoff
+            ]
+            dropped += len(index['versions']) - len(kept)
+            referenced.update(v['sha'] for v in kept)
+            if not dry_run and len(kept) != len(index['versions']):
+                index['versions'] = sorted(kept, key=lambda v: v['created_at'])
+                _write_atomic_json(index_path(canonical), index)
+
+    deleted, freed = 0, 0
+    if OBJECTS_DIR.exists():
+        for obj in OBJECTS_DIR.glob('*/*.jpg'):
+            # Skip objects a concurrent writer has stored but not indexed yet
+            if obj.stem in referenced or obj.stat().st_mtime > time.time() - 3600:
+                continue
+            deleted += 1
+            freed += obj.stat().st_size
+            if not dry_run:
+                obj.unlink()
+
+    # Temporary files left by crashed writers
+    if TMP_DIR.exists() and not dry_run:
+        for tmp_file in TMP_DIR.iterdir():
+            if tmp_file.stat().st_mtime < time.time() - 3600:
+                tmp_file.unlink()
+
+    return {'versions': dropped, 'objects': deleted, 'bytes': freed}
+
+
+def verify() -> List[str]:
+    """Return a problem description for every canonical image that is not intact."""
+    problems = []
+    for canonical in all_indexes():
+        index = load_index(canonical)
+        selected = index['selected']
+        if not selected:
+            continue
+        if not object_path(selected).exists():
+            problems.append(f"{canonical}: selected version {selected[:12]} is missing from the store")
+        elif not canonical.exists():
+            problems.append(f"{canonical}: missing (run 'select' to restore version {selected[:12]})")
+        elif _hash_file(canonical) != selected:
+            problems.append(f"{canonical}: does not match its selected version {selected[:12]}")
+    return problems
+
+
+def adopt() -> int:
+    """Add canonical images written before the store existed. Returns the number adopted."""
+    adopted = 0
+    for image in sorted(OUT_DIR.glob('*.jpg')):
+        index = load_index(image)
+        if index['versions']:
+            continue
+        TMP_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=TMP_DIR, suffix='.jpg')
+        os.close(fd)
+        shutil.copyfile(image, tmp_name)
+        commit_file(Path(tmp_name), image, {'adopted': True})
+        adopted += 1
+    return adopted
+
+
+def _format_bytes(size: int) -> str:
+    return f"{size / 1e6:.1f} MB"
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Manage versions of generated images",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/artifacts.py list cu-01
+    python3 scripts/artifacts.py select cu-01 3fa9c2
+    python3 scripts/artifacts.py gc --keep 2 --keep-days 7
+        """
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="List versions of images")
+    p.add_argument("page_ids", nargs="*")
+
+    p = sub.add_parser("select", help="Point an image at another version")
+    p.add_argument("page_id")
+    p.add_argument("sha_prefix")
+
+    p = sub.add_parser("gc", help="Delete versions outside the retention policy")
+    p.add_argument("--keep", type=int, default=DEFAULT_KEEP,
+                   help=f"Most recent versions to keep per image (default: {DEFAULT_KEEP})")
+    p.add_argument("--keep-days", type=float, default=DEFAULT_KEEP_DAYS,
+                   help=f"Keep every version younger than this (default: {DEFAULT_KEEP_DAYS})")
+    p.add_argument("--dry-run", action="store_true")
+
+    sub.add_parser("verify", help="Check canonical images against the store")
+    sub.add_parser("adopt", help="Add images generated before the store existed")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        canonicals = (
+            [OUT_DIR / f"{page_id}-openai.jpg" for page_id in args.page_ids]
+            if args.page_ids else all_indexes()
+        )
+        for canonical in canonicals:
+            index = load_index(canonical)
+            print(f"{canonical.name}: {len(index['versions'])} version(s)")
+            for version in sorted(index['versions'], key=lambda v: v['created_at']):
+                marker = "*" if version['sha'] == index['selected'] else " "
+                created = time.strftime('%Y-%m-%d %H:%M', time.localtime(version['created_at']))
+                meta = ", ".join(f"{k}={v}" for k, v in sorted(version['metadata'].items()))
+                print(f"  {marker} {version['sha'][:12]}  {created}  {_format_bytes(version['bytes']):>8}  {meta}")
+
+    elif args.command == "select":
+        canonical = OUT_DIR / f"{args.page_id}-openai.jpg"
+        try:
+            sha = select(canonical, args.sha_prefix)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        print(f"✓ {canonical} now points at {sha[:12]}")
+
+    elif args.command == "gc":
+        result = gc(args.keep, args.keep_days, args.dry_run)
+        action = "Would delete" if args.dry_run else "Deleted"
+        print(f"{action} {result['versions']} version(s) and {result['objects']} object(s), "
+              f"freeing {_format_bytes(result['bytes'])}")
+
+    elif args.command == "verify":
+        problems = verify()
+        for problem in problems:
+            print(f"✗ {problem}")
+        if problems:
+            return 1
+        print(f"✓ {len(all_indexes())} image(s) intact")
+
+    elif args.command == "adopt":
+        print(f"✓ Adopted {adopt()} image(s)")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
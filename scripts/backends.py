@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Image generation backends for gen_image.py.
+
+Each backend is a Backend subclass registered with @register. It declares:
+- What it needs: env_vars
+- What it can do (capability flags): supports_references, max_references,
+  reference_sheets, sizes, qualities, max_prompt_chars, supports_edits
+- How hard it may be driven: max_concurrency and requests_per_minute, which
+  its RateLimiter enforces across every process on the machine (the many
+  gen_image.py processes of a gen_all_images.py build share them)
+
+It implements `async generate(request) -> bytes`, returning the encoded
+image exactly as the service sent it. Backends with supports_edits also
+implement `async edit(request) -> bytes` for masked edits (edit_image.py). gen_image.py does the rest
+(post-processing, saving, the ledger), so a backend only talks to its API.
+
+To add a backend without touching gen_image.py, drop a module named
+scripts/backend_<name>.py containing a registered subclass:
+
+    from backends import Backend, register
+
+    @register
+    class MyBackend(Backend):
+        name = "mine"
+        description = "My image service"
+        env_vars = ["MY_API_KEY"]
+
+        async def generate(self, request):
+            ...
+            return image_bytes
+
+Usage:
+    python3 scripts/backends.py     # list backends and their capabilities
+"""
+
+import asyncio
+import functools
+import importlib
+import os
+import socket
+import sqlite3
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from singleflight import pid_alive
+
+# Shared by every process's RateLimiter
+RATE_LIMIT_DB = Path('out-images') / '.rate-limits.db'
+RATE_LIMIT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    token TEXT PRIMARY KEY,
+    backend TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    host TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS starts (
+    backend TEXT PRIMARY KEY,
+    next_start REAL NOT NULL
+);
+"""
+RATE_LIMIT_POLL = 0.2
+# A slot older than this is reclaimed even if its process still exists
+SLOT_LEASE = 900
+
+
+class GenerationRequest(NamedTuple):
+    """Everything a backend needs to generate one page."""
+    page_id: str
+    prompt: str
+    # [{'path': Path, 'description': str}], already capped at max_references
+    references: list
+    size: str
+    quality: str
+
+
+class EditRequest(NamedTuple):
+    """A masked edit of an existing image: only the transparent part of the mask changes."""
+    page_id: str
+    prompt: str
+    # PNG bytes, at `size`
+    image: bytes
+    # PNG bytes with an alpha channel, at `size`; alpha 0 marks the region to edit
+    mask: bytes
+    size: str
+    quality: str
+
+
+class RateLimiter:
+    """
+    Caps concurrent requests and spaces request starts to a per-minute rate,
+    across every process on this machine (gen_all_images.py runs one
+    gen_image.py per page). Slots and the next allowed start time are kept
+    in a small SQLite database (RATE_LIMIT_DB). A slot left by a crashed
+    process is reclaimed when its pid is gone or its lease expires. The
+    database calls run in a worker thread, so waiting on its lock never
+    blocks the event loop.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, requests_per_minute: Optional[float]):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.token: Optional[str] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        RATE_LIMIT_DB.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(RATE_LIMIT_DB), timeout=30, isolation_level=None)
+        conn.executescript(RATE_LIMIT_SCHEMA)
+        return conn
+
+    def _try_acquire(self, token: str) -> Optional[float]:
+        """Take a slot if one is free. Returns when the request may start, or None."""
+        now = time.time()
+        host = socket.gethostname()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for slot_token, pid, slot_host in conn.execute(
+                "SELECT token, pid, host FROM slots WHERE backend = ?", (self.name,)
+            ).fetchall():
+                if slot_host == host and not pid_alive(pid):
+                    conn.execute("DELETE FROM slots WHERE token = ?", (slot_token,))
+            conn.execute("DELETE FROM slots WHERE expires_at < ?", (now,))
+            in_use = conn.execute("SELECT COUNT(*) FROM slots WHERE backend = ?", (self.name,)).fetchone()[0]
+            if in_use >= self.max_concurrency:
+                conn.execute("COMMIT")
+                return None
+            row = conn.execute("SELECT next_start FROM starts WHERE backend = ?", (self.name,)).fetchone()
+            start = max(now, row[0] if row else 0.0)
+            conn.execute("INSERT OR REPLACE INTO starts (backend, next_start) VALUES (?, ?)",
+                         (self.name, start + self.interval))
+            conn.execute("INSERT INTO slots (token, backend, pid, host, expires_at) VALUES (?, ?, ?, ?, ?)",
+                         (token, self.name, os.getpid(), host, now + SLOT_LEASE))
+            conn.execute("COMMIT")
+            return start
+        finally:
+            conn.close()
+
+    def _release(self, token: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM slots WHERE token = ?", (token,))
+        finally:
+            conn.close()
+
+    async def __aenter__(self):
+        token = uuid.uuid4().hex
+        while True:
+            start = await run_blocking(self._try_acquire, token)
+            if start is not None:
+                break
+            await asyncio.sleep(RATE_LIMIT_POLL)
+        self.token = token
+        if start > time.time():
+            await asyncio.sleep(start - time.time())
+        return self
+
+    async def __aexit__(self, *exc):
+        await run_blocking(self._release, self.token)
+
+
+class Backend:
+    """Base class for image generation backends."""
+
+    name = ""
+    description = ""
+    env_vars: List[str] = []
+    deprecated = False
+
+    # Capabilities
+    model: Optional[str] = None
+    produces_image = True
+    supports_references = False
+    max_references = 0
+    # Send one composited sheet per character (reference_sheets.py) instead of
+    # every file, for services whose image cap the raw references overflow
+    reference_sheets = False
+    sizes = ("1536x1024",)
+    qualities = ("high",)
+    max_prompt_chars: Optional[int] = None
+    supports_edits = False
+
+    # Rate limits, shared by every process on this machine
+    max_concurrency = 4
+    requests_per_minute: Optional[float] = None
+
+    def missing_env_vars(self) -> List[str]:
+        """Return the required environment variables that are not set."""
+        return [var for var in self.env_vars if not os.getenv(var)]
+
+    def limiter(self) -> RateLimiter:
+        """Return a context manager that holds one of the backend's request slots."""
+        return RateLimiter(self.name, self.max_concurrency, self.requests_per_minute)
+
+    def quality_for(self, requested: str) -> str:
+        """Return the requested quality if supported, else the backend's best."""
+        return requested if requested in self.qualities else self.qualities[-1]
+
+    async def generate(self, request: GenerationRequest) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def edit(self, request: EditRequest) -> bytes:
+        raise NotImplementedError(f"{self.name} does not support masked edits")
+
+
+_REGISTRY: Dict[str, Backend] = {}
+_plugins_loaded = False
+
+
+def register(cls):
+    """Class decorator: register a backend under its name."""
+    _REGISTRY[cls.name] = cls()
+    return cls
+
+
+def _load_plugins():
+    """Import scripts/backend_*.py so their backends register themselves."""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    # Run as a script this module is __main__; plugins doing `from backends
+    # import register` must reach this registry, not a second copy of it
+    sys.modules.setdefault('backends', sys.modules[__name__])
+    for path in sorted(Path(__file__).parent.glob('backend_*.py')):
+        try:
+            importlib.import_module(path.stem)
+        except Exception as e:
+            print(f"Warning: Failed to load backend plugin {path.name}: {e}")
+
+
+def get_backend(name: str) -> Optional[Backend]:
+    """Return a registered backend by name, or None."""
+    _load_plugins()
+    return _REGISTRY.get(name)
+
+
+def all_backends() -> List[Backend]:
+    """Return every registered backend."""
+    _load_plugins()
+    return list(_REGISTRY.values())
+
+
+async def run_blocking(func, *args):
+    """Run a blocking call in the default thread pool (asyncio.to_thread needs 3.9)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args))
+
+
+async def _download(url: str) -> bytes:
+    import requests
+
+    def fetch():
+        response = requests.get(url, timeout=120)
+        response.raise_for_status()
+        return response.content
+
+    return await run_blocking(fetch)
+
+
+@register
+class OpenAIBackend(Backend):
+    name = "openai"
+    description = "OpenAI gpt-image-1"
+    env_vars = ["OPENAI_API_KEY"]
+    model = "gpt-image-1"
+    supports_references = True
+    max_references = 10
+    reference_sheets = True
+    sizes = ("1536x1024", "1024x1024", "1024x1536")
+    qualities = ("low", "medium", "high")
+    max_prompt_chars = 10000
+    supports_edits = True
+    max_concurrency = 10
+
+    @staticmethod
+    def _client():
+        try:
+            from openai import AsyncOpenAI
+        except ImportError:
+            raise RuntimeError("openai package not installed. Run: uv pip install openai")
+        return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    async def generate(self, request: GenerationRequest) -> bytes:
+        client = self._client()
+        # If we have reference images, use images.edit(); otherwise images.generate()
+        if request.references:
+            image_files = [open(ref['path'], 'rb') for ref in request.references]
+            try:
+                response = await client.images.edit(
+                    model=self.model,
+                    image=image_files,
+                    prompt=request.prompt,
+                    size=request.size,  # Landscape 3:2 (closest to 2:1 available)
+                    quality=request.quality,
+                    n=1,
+                )
+            finally:
+                for f in image_files:
+                    f.close()
+        else:
+            response = await client.images.generate(
+                model=self.model,
+                prompt=request.prompt,
+                size=request.size,
+                quality=request.quality,
+                n=1,
+            )
+        return await self._image_bytes(response)
+
+    async def edit(self, request: EditRequest) -> bytes:
+        response = await self._client().images.edit(
+            model=self.model,
+            image=("image.png", request.image, "image/png"),
+            mask=("mask.png", request.mask, "image/png"),
+            prompt=request.prompt,
+            size=request.size,
+            quality=request.quality,
+            n=1,
+        )
+        return await self._image_bytes(response)
+
+    @staticmethod
+    async def _image_bytes(response) -> bytes:
+        # Handle both URL and base64 responses
+        data = response.data[0]
+        if getattr(data, 'url', None):
+            return await _download(data.url)
+        if getattr(data, 'b64_json', None):
+            import base64
+            return base64.b64decode(data.b64_json)
+        raise RuntimeError(f"Unexpected response format from OpenAI API: {response}")
+
+
+@register
+class ReplicateBackend(Backend):
+    name = "replicate"
+    description = "Replicate IPAdapter Style SDXL (DEPRECATED)"
+    env_vars = ["REPLICATE_API_TOKEN"]
+    deprecated = True
+    model = "lucataco/ipadapter-style-sdxl:9a89134b4c84c264c817645f1703db1e73f66a43c3f0bf2697ec2edce95f7d39"
+    # A single style image steers the whole generation
+    supports_references = True
+    max_references = 1
+    sizes = ("1536x768", "1536x1024")
+    max_concurrency = 2
+
+    async def generate(self, request: GenerationRequest) -> bytes:
+        try:
+            import replicate
+        except ImportError:
+            raise RuntimeError("replicate package not installed. Run: uv pip install replicate")
+        if not request.references:
+            raise RuntimeError("Replicate needs a style reference image in ref-images/")
+
+        width, height = (int(v) for v in request.size.split('x'))
+
+        def run():
+            with open(request.references[0]['path'], 'rb') as style_image:
+                return replicate.run(self.model, input={
+                    "prompt": request.prompt,
+                    "style_image": style_image,
+                    "width": width,
+                    "height": height,
+                    "num_outputs": 1,
+                    "guidance_scale": 7.5,
+                    "num_inference_steps": 50,
+                    "style_strength": 0.5,  # How much to apply the style (0-1)
+                })
+
+        output = await run_blocking(run)
+        return await _download(str(output[0]))
+
+
+@register
+class IdeogramBackend(Backend):
+    name = "ideogram"
+    description = "Ideogram v3 (DEPRECATED)"
+    env_vars = ["IDEOGRAM_API_KEY", "IDEOGRAM_API_URL"]
+    deprecated = True
+    model = "ideogram-v3"
+    # Ideogram takes an aspect ratio rather than pixel dimensions
+    sizes = ("3x1",)
+    max_concurrency = 2
+
+    async def generate(self, request: GenerationRequest) -> bytes:
+        import requests
+
+        api_url = os.getenv("IDEOGRAM_API_URL", "https://api.ideogram.ai/v1/ideogram-v3/generate")
+        headers = {"Api-Key": os.getenv("IDEOGRAM_API_KEY"), "Content-Type": "application/json"}
+        # Use flat JSON structure (not nested under image_request)
+        payload = {"prompt": request.prompt, "aspect_ratio": request.size, "magic_prompt": "OFF"}
+
+        def post():
+            response = requests.post(api_url, headers=headers, json=payload, timeout=180)
+            response.raise_for_status()
+            return response.json()
+
+        result = await run_blocking(post)
+        if not result.get("data"):
+            raise RuntimeError(f"Unexpected API response structure: {result}")
+        return await _download(result["data"][0]["url"])
+
+
+@register
+class PromptBackend(Backend):
+    name = "prompt"
+    description = "Prompt Only (Testing)"
+    produces_image = False
+    supports_references = True
+    max_references = 10
+
+    async def generate(self, request: GenerationRequest) -> None:
+        """Display the prompt without generating an image."""
+        print(f"\n{'='*80}")
+        print("GENERATED PROMPT")
+        print(f"{'='*80}\n")
+        print(request.prompt)
+        print(f"\n{'='*80}")
+        print(f"Prompt length: {len(request.prompt)} characters")
+        print(f"Page ID: {request.page_id}")
+        print(f"{'='*80}\n")
+        return None
+
+
+def main():
+    """List every backend and its capabilities."""
+    for backend in all_backends():
+        flags = []
+        if backend.supports_references:
+            flags.append(f"up to {backend.max_references} reference image(s)")
+        if backend.reference_sheets:
+            flags.append("reference sheets")
+        if backend.produces_image:
+            flags.append(f"sizes {', '.join(backend.sizes)}")
+            flags.append(f"quality {'/'.join(backend.qualities)}")
+        if backend.supports_edits:
+            flags.append("masked edits")
+        flags.append(f"{backend.max_concurrency} concurrent")
+        if backend.requests_per_minute:
+            flags.append(f"{backend.requests_per_minute:g}/min")
+        missing = backend.missing_env_vars()
+        status = f"missing {', '.join(missing)}" if missing else "ready"
+        print(f"  {backend.name:12} {backend.description}")
+        print(f"  {'':12} {'; '.join(flags)} ({status})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Cost planning and budget enforcement for image generation.
+
+Estimates what a gen_all_images.py run will cost before anything is
+submitted: one request per page to generate, priced by quality tier, plus
+the prompt text and reference images sent as input. The generation ledger
+(scripts/ledger.py) supplies the observed failure rate, so retries are
+included in the estimate, and tells which pages are already current.
+
+Prices are OpenAI's published gpt-image-1 rates at the time of writing, in
+USD. Update PRICES when they change.
+
+Usage:
+    python3 scripts/budget.py <character-code> [--quality low|medium|high] [--skip-current]
+
+Examples:
+    python3 scripts/budget.py cu
+    python3 scripts/budget.py em --quality medium --skip-current
+"""
+
+import argparse
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+# USD per 1536x1024 output image, by quality tier
+PRICES = {
+    "low": 0.016,
+    "medium": 0.063,
+    "high": 0.25,
+}
+QUALITIES = list(PRICES)
+
+# Input pricing: text tokens (~4 characters each) and images (~1000 tokens each)
+TEXT_TOKEN_PRICE = 5.0 / 1_000_000
+IMAGE_TOKEN_PRICE = 10.0 / 1_000_000
+TOKENS_PER_REFERENCE_IMAGE = 1000
+MAX_REFERENCE_IMAGES = 10
+
+
+def request_cost(quality: str, prompt_chars: int, reference_count: int) -> float:
+    """Return the estimated cost of one image request."""
+    text_tokens = min(prompt_chars, 10000) / 4
+    image_tokens = min(reference_count, MAX_REFERENCE_IMAGES) * TOKENS_PER_REFERENCE_IMAGE
+    return PRICES[quality] + text_tokens * TEXT_TOKEN_PRICE + image_tokens * IMAGE_TOKEN_PRICE
+
+
+def failure_rate() -> float:
+    """Return the fraction of recorded requests that failed, or 0 without a ledger."""
+    import ledger
+
+    if not ledger.LEDGER_FILE.exists():
+        return 0.0
+    conn = ledger.connect()
+    total, failed = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(outcome != 'ok'), 0) FROM generations"
+    ).fetchone()
+    conn.close()
+    return failed / total if total else 0.0
+
+
+def plan(page_filenames: List[str], quality: str, skip_current: bool = False) -> dict:
+    """
+    Return the build plan for a story:
+    {'pages': [{'page_id', 'status', 'generate', 'references', 'cost'}],
+     'requests', 'cost', 'failure_rate', 'expected_cost'}
+    """
+    # Imported here so the price table can be used without gen_image's dependencies
+    import gen_image
+    import ledger
+    from project import load_yaml
+
+    # page ID -> ledger.stale() result, which already carries the compiled request's size
+    checked = {}
+    if skip_current and ledger.LEDGER_FILE.exists():
+        conn = ledger.connect()
+        checked = {result['page_id']: result for result in ledger.stale(conn, page_filenames, quality)}
+        conn.close()
+
+    visual_style = gen_image.load_visual_style()
+    typeset_text = gen_image.typeset_enabled()
+    max_chars = gen_image.get_backend("openai").max_prompt_chars
+    pages = []
+    for page_filename in page_filenames:
+        page_id = Path(page_filename).stem
+        result = checked.get(page_id, {})
+        status = result.get('status', 'unknown' if skip_current else 'regenerate')
+        generate = status != 'current'
+        if not generate:
+            prompt_chars = reference_count = 0
+        elif 'prompt_chars' in result:
+            prompt_chars, reference_count = result['prompt_chars'], result['references']
+        else:
+            # Planning only: don't compose reference sheets for pages that may not be generated
+            references = gen_image.get_reference_images(page_id, build=False)
+            prompt = gen_image.build_full_prompt(
+                load_yaml(Path("pages") / page_filename) or {}, visual_style, references,
+                gen_image.load_character_descriptions(page_id), typeset_text, max_chars,
+            )
+            prompt_chars, reference_count = len(prompt), len(references)
+        pages.append({
+            'page_id': page_id,
+            'status': status,
+            'generate': generate,
+            'references': min(reference_count, MAX_REFERENCE_IMAGES),
+            'cost': request_cost(quality, prompt_chars, reference_count) if generate else 0.0,
+        })
+
+    cost = sum(page['cost'] for page in pages)
+    rate = failure_rate()
+    return {
+        'pages': pages,
+        'requests': sum(1 for page in pages if page['generate']),
+        'cost': cost,
+        'failure_rate': rate,
+        # Failed requests are paid for and retried
+        'expected_cost': cost * (1 + rate),
+    }
+
+
+def print_plan(build_plan: dict, quality: str, budget: Optional[float] = None):
+    """Print which pages would be generated and what they would cost."""
+    for page in build_plan['pages']:
+        if page['generate']:
+            print(f"  + {page['page_id']:12} {page['status']:10} {page['references']:2} ref(s)  ${page['cost']:.3f}")
+        else:
+            print(f"  = {page['page_id']:12} {page['status']:10} skipped")
+    print(f"\n{build_plan['requests']} request(s) at quality '{quality}': ${build_plan['cost']:.2f}")
+    if build_plan['failure_rate']:
+        print(f"Including retries at the ledger's {build_plan['failure_rate']:.0%} failure rate: "
+              f"${build_plan['expected_cost']:.2f}")
+    if budget is not None:
+        if build_plan['cost'] > budget:
+            print(f"⚠️  Over the ${budget:.2f} budget: generation will stop once it is reached")
+        else:
+            print(f"Within the ${budget:.2f} budget")
+
+
+class Budget:
+    """Thread-safe spending cap. Requests reserve their cost before they start."""
+
+    def __init__(self, limit: Optional[float]):
+        self.limit = limit
+        self.spent = 0.0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def reserve(self, cost: float) -> bool:
+        """Reserve cost for one request. Returns False once the cap would be exceeded."""
+        with self._lock:
+            if self.limit is not None and (self.exhausted or self.spent + cost > self.limit):
+                # Once a request is refused, refuse all later ones so the run winds down
+                self.exhausted = True
+                return False
+            self.spent += cost
+            return True
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Estimate the cost of generating a character's book",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/budget.py cu
+    python3 scripts/budget.py em --quality medium --skip-current
+        """
+    )
+    parser.add_argument("char_code", type=str, help="Two-letter character code (e.g., cu, em, ha)")
+    parser.add_argument("--quality", choices=QUALITIES, default="high", help="Quality tier (default: high)")
+    parser.add_argument("--skip-current", action="store_true",
+                        help="Skip pages whose image matches the current YAML (per the ledger)")
+    parser.add_argument("--budget", type=float, help="Compare the estimate with a budget in USD")
+    args = parser.parse_args()
+
+    from gen_all_images import load_character_story
+
+    build_plan = plan(load_character_story(args.char_code), args.quality, args.skip_current)
+    print_plan(build_plan, args.quality, args.budget)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
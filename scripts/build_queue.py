@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed job queue for building many families' books overnight.
+
+Each family is a project directory (a fork kept current with
+scripts/pull-from-base.sh). A job builds one character's book in one
+project by running scripts/gen_all_images.py there. Any number of worker
+processes, on one machine or several machines sharing the queue file, pull
+jobs from the same queue.
+
+Usage:
+    uv run scripts/build_queue.py submit <project-dir> [<char-code> ...] [--priority N]
+    uv run scripts/build_queue.py worker [--jobs N] [--api-limit N] [--image-workers N]
+    uv run scripts/build_queue.py status
+    uv run scripts/build_queue.py cancel <project-dir>|--all
+    uv run scripts/build_queue.py retry [--all]
+
+All commands take --db PATH (default: $KATHA_QUEUE_DB or ~/.katha/queue.db).
+
+Scheduling:
+- Per-tenant fairness: a worker always claims from the project with the
+  fewest running jobs, and among those the one served least recently, so one
+  family with 50 books can't starve another with 2.
+- Global API concurrency: each job holds --image-workers API slots for as
+  long as it runs (the gen_all_images.py --workers value). A job is only
+  claimed if the slots held by all running jobs, across every worker, stay
+  within the --api-limit stored in the queue.
+- Crashed workers: running jobs hold a lease that their worker renews every
+  LEASE_RENEW_SECONDS. Jobs whose lease expired are put back in the queue
+  (up to MAX_ATTEMPTS attempts). If a worker can no longer renew a lease it
+  stops the build and fails the attempt, so no job runs without one.
+- Failed builds are requeued until they have been attempted MAX_ATTEMPTS
+  times; after that they stay failed until `retry` requeues them.
+
+Note: SQLite locking needs a filesystem with working POSIX locks. Most local
+and SMB shares are fine; some NFS setups are not.
+
+Examples:
+    uv run scripts/build_queue.py submit ../katha-smith
+    uv run scripts/build_queue.py submit ../katha-jones cu em --priority 1
+    uv run scripts/build_queue.py worker --jobs 4 --api-limit 20
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from project import load_characters
+
+DEFAULT_DB = Path(os.getenv("KATHA_QUEUE_DB", Path.home() / ".katha" / "queue.db"))
+
+LEASE_SECONDS = 120
+LEASE_RENEW_SECONDS = 30
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 5
+JOB_TIMEOUT = 60 * 60  # One book should never take an hour
+JOB_COMMAND = ["uv", "run", "scripts/gen_all_images.py"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tenant TEXT NOT NULL,
+    char_code TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    slots INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, tenant);
+CREATE TABLE IF NOT EXISTS tenants (
+    tenant TEXT PRIMARY KEY,
+    last_served REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Open the queue database, creating it if needed."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 30000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_setting(conn, key: str, default: str) -> str:
+    row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_setting(conn, key: str, value: str):
+    conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+
+def find_characters(project_dir: Path) -> List[str]:
+    """Return the character codes in a project directory, keyed by id as the registry does."""
+    errors = []
+    codes = sorted(load_characters(project_dir / "characters", errors))
+    for char_file, e in errors:
+        print(f"Warning: Skipping {char_file}: {e}")
+    return codes
+
+
+def submit(conn, project_dir: Path, char_codes: List[str], priority: int) -> int:
+    """Queue one job per character. Skips characters already queued or running."""
+    tenant = str(project_dir.resolve())
+    if not (project_dir / "scripts" / "gen_all_images.py").exists():
+        print(f"Error: {project_dir} does not look like a katha project (no scripts/gen_all_images.py)")
+        sys.exit(1)
+
+    char_codes = char_codes or find_characters(project_dir)
+    if not char_codes:
+        print(f"Error: No characters found in {project_dir / 'characters'}")
+        sys.exit(1)
+
+    added = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR IGNORE INTO tenants (tenant) VALUES (?)", (tenant,))
+        for code in char_codes:
+            pending = conn.execute(
+                "SELECT 1 FROM jobs WHERE tenant = ? AND char_code = ? AND status IN ('queued', 'running')",
+                (tenant, code),
+            ).fetchone()
+            if pending:
+                print(f"  - {code}: already queued")
+                continue
+            conn.execute(
+                "INSERT INTO jobs (tenant, char_code, priority, created_at) VALUES (?, ?, ?, ?)",
+                (tenant, code, priority, time.time()),
+            )
+            print(f"  + {code}")
+            added += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return added
+
+
+def requeue_expired(conn):
+    """Put running jobs whose worker stopped renewing its lease back in the queue."""
+    now = time.time()
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', finished_at = ?, slots = 0, "
+        "message = 'lease expired ' || attempts || ' times' "
+        "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+        (now, now, MAX_ATTEMPTS),
+    )
+    conn.execute(
+        "UPDATE jobs SET status = 'queued', worker = NULL, slots = 0, message = 'lease expired, requeued' "
+        "WHERE status = 'running' AND lease_expires < ?",
+        (now,),
+    )
+
+
+def claim(conn, worker_id: str, slots: int) -> Optional[sqlite3.Row]:
+    """Atomically claim the next job, respecting fairness and the API limit."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        requeue_expired(conn)
+
+        api_limit = int(get_setting(conn, "api_limit", "10"))
+        in_use = conn.execute(
+            "SELECT COALESCE(SUM(slots), 0) FROM jobs WHERE status = 'running'"
+        ).fetchone()[0]
+        slots = min(slots, api_limit)
+        if in_use + slots > api_limit:
+            conn.execute("COMMIT")
+            return None
+
+        # Fewest running jobs first, then least recently served, then priority/age
+        row = conn.execute(
+            """
+            SELECT j.* FROM jobs j
+            JOIN tenants t ON t.tenant = j.tenant
+            WHERE j.status = 'queued'
+            ORDER BY
+                (SELECT COUNT(*) FROM jobs r WHERE r.tenant = j.tenant AND r.status = 'running'),
+                t.last_served,
+                j.priority DESC,
+                j.created_at
+            LIMIT 1
+            """
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, slots = ?, attempts = attempts + 1, "
+            "started_at = ?, lease_expires = ?, message = NULL WHERE id = ?",
+            (worker_id, slots, now, now + LEASE_SECONDS, row["id"]),
+        )
+        conn.execute("UPDATE tenants SET last_served = ? WHERE tenant = ?", (now, row["tenant"]))
+        conn.execute("COMMIT")
+        return conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def finish(conn, job, worker_id: str, ok: bool, message: str) -> str:
+    """
+    Record a job's outcome (unless another worker has since taken it over).
+    A failed job is requeued while it has attempts left. Returns the new status.
+    """
+    if ok:
+        status = "done"
+    elif job["attempts"] < MAX_ATTEMPTS:
+        status = "queued"
+        message = f"{message}; requeued after attempt {job['attempts']}/{MAX_ATTEMPTS}"
+    else:
+        status = "failed"
+    conn.execute(
+        "UPDATE jobs SET status = ?, worker = CASE WHEN ? = 'queued' THEN NULL ELSE worker END, "
+        "finished_at = ?, slots = 0, lease_expires = NULL, message = ? "
+        "WHERE id = ? AND worker = ? AND status = 'running'",
+        (status, status, time.time(), message, job["id"], worker_id),
+    )
+    return status
+
+
+def renew_lease(conn, job_id: int, worker_id: str):
+    """Extend a running job's lease by LEASE_SECONDS."""
+    conn.execute(
+        "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ?",
+        (time.time() + LEASE_SECONDS, job_id, worker_id),
+    )
+
+
+def run_job(db_path: Path, job, worker_id: str) -> bool:
+    """
+    Run gen_all_images.py for a job, renewing its lease while it runs.
+    If the lease can't be renewed, the build is stopped and the attempt fails:
+    once the lease expires another worker may claim the job.
+    """
+    tenant = Path(job["tenant"])
+    label = f"{tenant.name}/{job['char_code']}"
+    print(f"[{worker_id}] ▶ {label} (job {job['id']}, {job['slots']} API slot(s))")
+
+    stop = threading.Event()
+    renew_error = []
+
+    def renew():
+        try:
+            conn = connect(db_path)
+            try:
+                while not stop.wait(LEASE_RENEW_SECONDS):
+                    renew_lease(conn, job["id"], worker_id)
+            finally:
+                conn.close()
+        except Exception as e:
+            renew_error.append(e)
+
+    renewer = threading.Thread(target=renew, daemon=True)
+    renewer.start()
+
+    start = time.time()
+    proc = None
+    try:
+        proc = subprocess.Popen(
+            JOB_COMMAND + [job["char_code"], "--workers", str(job["slots"])],
+            cwd=tenant,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        # Wait in short steps so a dead lease renewer is noticed while the build runs
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=POLL_SECONDS)
+                break
+            except subprocess.TimeoutExpired:
+                if time.time() - start > JOB_TIMEOUT:
+                    raise
+                if not renewer.is_alive():
+                    raise RuntimeError(f"lease renewal failed: {renew_error[0] if renew_error else 'stopped'}")
+        ok = proc.returncode == 0
+        tail = (stdout + stderr).strip().splitlines()[-1:] or [""]
+        message = f"exit code {proc.returncode}: {tail[0][:200]}"
+    except subprocess.TimeoutExpired:
+        ok, message = False, f"timeout after {JOB_TIMEOUT}s"
+    except Exception as e:
+        ok, message = False, str(e)[:200]
+    finally:
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.communicate()
+        stop.set()
+        renewer.join()
+
+    conn = connect(db_path)
+    status = finish(conn, job, worker_id, ok, message)
+    conn.close()
+    symbol = "✓" if ok else "✗"
+    print(f"[{worker_id}] {symbol} {label} in {time.time() - start:.0f}s ({status}: {message})")
+    return ok
+
+
+def worker_loop(db_path: Path, worker_id: str, slots: int, exit_when_idle: bool):
+    """Claim and run jobs until the queue is empty (or forever)."""
+    conn = connect(db_path)
+    while True:
+        job = claim(conn, worker_id, slots)
+        if job is None:
+            idle = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0] == 0
+            if exit_when_idle and idle:
+                return
+            time.sleep(POLL_SECONDS)
+            continue
+        run_job(db_path, job, worker_id)
+
+
+def print_status(conn):
+    """Print per-tenant job counts and running jobs."""
+    rows = conn.execute(
+        "SELECT tenant, status, COUNT(*) AS n FROM jobs GROUP BY tenant, status ORDER BY tenant"
+    ).fetchall()
+    by_tenant = {}
+    for row in rows:
+        by_tenant.setdefault(row["tenant"], {})[row["status"]] = row["n"]
+
+    api_limit = int(get_setting(conn, "api_limit", "10"))
+    in_use = conn.execute("SELECT COALESCE(SUM(slots), 0) FROM jobs WHERE status = 'running'").fetchone()[0]
+    print(f"API slots in use: {in_use}/{api_limit}\n")
+
+    print(f"{'Project':40} {'queued':>7} {'running':>8} {'done':>6} {'failed':>7}")
+    for tenant, counts in sorted(by_tenant.items()):
+        print(f"{Path(tenant).name[:40]:40} {counts.get('queued', 0):>7} {counts.get('running', 0):>8} "
+              f"{counts.get('done', 0):>6} {counts.get('failed', 0):>7}")
+
+    running = conn.execute("SELECT * FROM jobs WHERE status = 'running' ORDER BY started_at").fetchall()
+    if running:
+        print("\nRunning:")
+        for job in running:
+            print(f"  {Path(job['tenant']).name}/{job['char_code']} on {job['worker']} "
+                  f"for {time.time() - job['started_at']:.0f}s")
+
+    failed = conn.execute("SELECT * FROM jobs WHERE status = 'failed' ORDER BY finished_at DESC LIMIT 10").fetchall()
+    if failed:
+        print("\nRecently failed:")
+        for job in failed:
+            print(f"  {Path(job['tenant']).name}/{job['char_code']}: {job['message']}")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Queue and run book builds for many project directories",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    uv run scripts/build_queue.py submit ../katha-smith
+    uv run scripts/build_queue.py worker --jobs 4 --api-limit 20
+    uv run scripts/build_queue.py status
+        """
+    )
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help=f"Queue database (default: {DEFAULT_DB})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("submit", help="Queue builds for a project")
+    p.add_argument("project_dir", type=Path)
+    p.add_argument("char_codes", nargs="*", help="Characters to build (default: all)")
+    p.add_argument("--priority", type=int, default=0, help="Higher runs first within a project")
+
+    p = sub.add_parser("worker", help="Pull and run jobs")
+    p.add_argument("--jobs", type=int, default=2, help="Books to build concurrently in this process (default: 2)")
+    p.add_argument("--image-workers", type=int, default=5,
+                   help="gen_all_images.py --workers per job, i.e. API slots per job (default: 5)")
+    p.add_argument("--api-limit", type=int, help="Set the global limit on concurrent API requests")
+    p.add_argument("--exit-when-idle", action="store_true", help="Stop once the queue is empty")
+
+    sub.add_parser("status", help="Show queue status")
+
+    p = sub.add_parser("cancel", help="Remove queued jobs")
+    p.add_argument("project_dir", type=Path, nargs="?")
+    p.add_argument("--all", action="store_true")
+
+    p = sub.add_parser("retry", help="Requeue failed jobs")
+    p.add_argument("project_dir", type=Path, nargs="?")
+    p.add_argument("--all", action="store_true")
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+
+    if args.command == "submit":
+        added = submit(conn, args.project_dir, args.char_codes, args.priority)
+        print(f"✓ Queued {added} job(s) for {args.project_dir}")
+
+    elif args.command == "worker":
+        if args.api_limit is not None:
+            set_setting(conn, "api_limit", str(args.api_limit))
+        worker_base = f"{socket.gethostname()}:{os.getpid()}"
+        print(f"Worker {worker_base}: {args.jobs} job(s) x {args.image_workers} API slot(s), "
+              f"global limit {get_setting(conn, 'api_limit', '10')}")
+        threads = [
+            threading.Thread(
+                target=worker_loop,
+                args=(args.db, f"{worker_base}/{i}", args.image_workers, args.exit_when_idle),
+                daemon=True,
+            )
+            for i in range(max(1, args.jobs))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            # Running jobs' leases expire and they are requeued
+            print("\nInterrupted; running jobs will be requeued when their leases expire")
+            sys.exit(1)
+
+    elif args.command == "status":
+        print_status(conn)
+
+    elif args.command in ("cancel", "retry"):
+        if not args.all and not args.project_dir:
+            print(f"Error: Give a project directory or --all")
+            sys.exit(1)
+        where, params = "", ()
+        if not args.all:
+            where, params = " AND tenant = ?", (str(args.project_dir.resolve()),)
+        if args.command == "cancel":
+            count = conn.execute(f"DELETE FROM jobs WHERE status = 'queued'{where}", params).rowcount
+            print(f"✓ Cancelled {count} queued job(s)")
+        else:
+            count = conn.execute(
+                f"UPDATE jobs SET status = 'queued', attempts = 0, message = NULL WHERE status = 'failed'{where}",
+                params,
+            ).rowcount
+            print(f"✓ Requeued {count} failed job(s)")
+
+
+if __name__ == "__main__":
+    main()
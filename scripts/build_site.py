@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Build a static HTML preview site for reviewing every character's book.
+
+Usage:
+    python3 scripts/build_site.py [--output-dir DIR] [--workers N] [--force]
+
+The site has an index plus one page per character book, with spreads in
+story order. Each spread shows its generated image next to the story text and
+description, and shared pages link to the same spread in the other
+participants' books.
+
+Images are read from out-images/<page-id>-openai.jpg and downscaled once into
+responsive thumbnails (see THUMB_WIDTHS). Widths at or above the source's own
+are skipped, and the original is offered at its real width instead.
+Thumbnails and HTML pages are only rebuilt when their inputs change: a manifest
+in the output directory records the fingerprint (path, size, mtime) of every
+input used for each output.
+
+Options:
+    --output-dir DIR    Where to write the site (default: out-site)
+    --workers N         Number of concurrent thumbnail encodes (default: 4)
+    --force             Rebuild everything, ignoring the manifest
+
+Examples:
+    python3 scripts/build_site.py
+    python3 scripts/build_site.py --output-dir /tmp/preview --workers 8
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from project import load_project, page_id
+
+# Thumbnail widths for srcset; the largest is still far below 3579px
+THUMB_WIDTHS = [480, 960, 1600]
+THUMB_QUALITY = 82
+
+# Bump when the HTML layout changes so every page is rebuilt
+SITE_VERSION = "1"
+
+STYLE = """
+body { font-family: Georgia, serif; margin: 0 auto; max-width: 90em; padding: 1em 2em; color: #222; }
+nav a { margin-right: 1em; }
+.spread { display: flex; gap: 2em; align-items: flex-start; margin: 2.5em 0; scroll-margin-top: 1em; }
+.spread figure { flex: 3; margin: 0; }
+.spread img { width: 100%; height: auto; display: block; box-shadow: 0 1px 6px rgba(0,0,0,.3); }
+.spread .missing { aspect-ratio: 3579 / 2406; background: #eee; display: flex; align-items: center; justify-content: center; color: #888; }
+.spread aside { flex: 2; }
+.spread .text { font-size: 1.2em; }
+.spread .description { color: #666; font-style: italic; }
+.shared { font-size: .9em; }
+@media (max-width: 50em) { .spread { flex-direction: column; } }
+"""
+
+
+def fingerprint(paths) -> str:
+    """Return a hash of the size and mtime of every path (missing paths included)."""
+    h = hashlib.sha256(SITE_VERSION.encode())
+    for path in paths:
+        path = Path(path)
+        try:
+            stat = path.stat()
+            h.update(f"{path.as_posix()}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        except OSError:
+            h.update(f"{path.as_posix()}:missing\n".encode())
+    return h.hexdigest()
+
+
+def load_manifest(out_dir: Path) -> Dict[str, str]:
+    """Load the output -> input fingerprint manifest."""
+    try:
+        with open(out_dir / ".manifest.json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir: Path, manifest: Dict[str, str]):
+    """Save the output -> input fingerprint manifest."""
+    with open(out_dir / ".manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def source_image(pid: str) -> Path:
+    """Return the generated image path for a page ID."""
+    return Path("out-images") / f"{pid}-openai.jpg"
+
+
+def image_width(source: Path) -> int:
+    """Return an image's width in pixels (reads only the file header)."""
+    from PIL import Image
+
+    with Image.open(source) as img:
+        return img.width
+
+
+def thumb_widths(source_width: int) -> List[int]:
+    """Return the thumbnail widths narrower than the source; wider ones would just be copies."""
+    return [w for w in THUMB_WIDTHS if w < source_width]
+
+
+def make_thumbnails(source: Path, thumbs_dir: Path, pid: str) -> List[str]:
+    """Downscale one image to every thumbnail width below its own. Returns the written filenames."""
+    from PIL import Image
+
+    written = []
+    with Image.open(source) as img:
+        img = img.convert("RGB")
+        # Resize from the largest thumbnail down, so each step starts smaller
+        for width in sorted(thumb_widths(img.width), reverse=True):
+            height = round(img.height * width / img.width)
+            img = img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            name = f"{pid}-{width}.jpg"
+            img.save(thumbs_dir / name, "JPEG", quality=THUMB_QUALITY, optimize=True, progressive=True)
+            written.append(name)
+    return written
+
+
+def build_thumbnails(project, out_dir: Path, manifest: Dict[str, str], workers: int, force: bool):
+    """Generate thumbnails for every page image whose source changed."""
+    thumbs_dir = out_dir / "thumbs"
+    thumbs_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    for page_filename in sorted(project.pages):
+        pid = page_id(page_filename)
+        source = source_image(pid)
+        if not source.exists():
+            continue
+        key = f"thumbs/{pid}"
+        stamp = fingerprint([source])
+        outputs_exist = all((thumbs_dir / f"{pid}-{w}.jpg").exists()
+                            for w in thumb_widths(image_width(source)))
+        if force or manifest.get(key) != stamp or not outputs_exist:
+            jobs.append((key, stamp, source, pid))
+
+    if not jobs:
+        print("Thumbnails up to date")
+        return
+
+    print(f"Generating thumbnails for {len(jobs)} image(s)...")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(make_thumbnails, source, thumbs_dir, pid): (key, stamp, pid)
+            for key, stamp, source, pid in jobs
+        }
+        for future, (key, stamp, pid) in futures.items():
+            try:
+                future.result()
+                manifest[key] = stamp
+                print(f"  ✓ {pid}")
+            except Exception as e:
+                print(f"  ✗ {pid}: {e}")
+
+
+def render_spread(project, out_dir: Path, code: str, spread: int, page_filename: str) -> str:
+    """Render one spread of a character's book."""
+    pid = page_id(page_filename)
+    page_data = project.page(page_filename) or {}
+
+    if source_image(pid).exists():
+        full_size = Path(os.path.relpath(source_image(pid).resolve(), out_dir.resolve())).as_posix()
+        # Offer the original at its real width as the largest candidate
+        source_width = image_width(source_image(pid))
+        widths = thumb_widths(source_width)
+        candidates = [(f"thumbs/{pid}-{w}.jpg", w) for w in widths] + [(full_size, source_width)]
+        srcset = ", ".join(f"{src} {w}w" for src, w in candidates)
+        default = candidates[min(1, len(candidates) - 1)][0]
+        figure = (
+            f'<a href="{html.escape(full_size)}">'
+            f'<img src="{html.escape(default)}" srcset="{html.escape(srcset)}" '
+            f'sizes="(max-width: 50em) 100vw, 60vw" loading="lazy" alt="{html.escape(pid)}"></a>'
+        )
+    else:
+        figure = '<div class="missing">Not generated yet</div>'
+
+    shared = []
+    for other in project.participants(page_filename):
+        if other != code and other in project.characters:
+            shared.append(f'<a href="{other}.html#{pid}">{html.escape(project.character_name(other))}\'s book</a>')
+    shared_html = f'<p class="shared">Shared with {", ".join(shared)}</p>' if shared else ""
+
+    text = str(page_data.get("text", "")).strip()
+    description = str(page_data.get("description", "")).strip()
+    paragraphs = "".join(f"<p>{html.escape(p)}</p>" for p in text.split("\n\n") if p.strip())
+
+    return f"""<section class="spread" id="{pid}">
+<figure>{figure}</figure>
+<aside>
+<h2>Spread {spread} <small>{html.escape(pid)}</small></h2>
+<div class="text">{paragraphs}</div>
+<p class="description">{html.escape(description)}</p>
+{shared_html}
+</aside>
+</section>
+"""
+
+
+def render_page(project, title: str, body: str) -> str:
+    """Wrap a page body in the site layout."""
+    nav = " ".join(
+        f'<a href="{code}.html">{html.escape(project.character_name(code))}</a>'
+        for code in project.codes()
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)}</title>
+<style>{STYLE}</style>
+</head>
+<body>
+<nav><a href="index.html">Index</a> {nav}</nav>
+{body}
+</body>
+</html>
+"""
+
+
+def book_inputs(project, code: str) -> List[Path]:
+    """Return every file a character's book page is rendered from."""
+    inputs = [project.characters[c]['file'] for c in project.codes()]
+    for page_filename in project.story(code):
+        pid = page_id(page_filename)
+        inputs.append(Path("pages") / page_filename)
+        inputs.append(source_image(pid))
+    return inputs
+
+
+def write_if_changed(out_dir: Path, name: str, inputs, manifest, force: bool, render) -> bool:
+    """Render and write an HTML page unless its input fingerprint is unchanged."""
+    stamp = fingerprint(inputs)
+    if not force and manifest.get(name) == stamp and (out_dir / name).exists():
+        return False
+    with open(out_dir / name, "w") as f:
+        f.write(render())
+    manifest[name] = stamp
+    return True
+
+
+def build_site(out_dir: Path, workers: int = 4, force: bool = False):
+    """Build (or incrementally update) the preview site."""
+    project = load_project()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {} if force else load_manifest(out_dir)
+
+    build_thumbnails(project, out_dir, manifest, workers, force)
+
+    written = []
+    for code in project.codes():
+        def render_book(code=code):
+            name = project.character_name(code)
+            spreads = "".join(
+                render_spread(project, out_dir, code, spread, page_filename)
+                for spread, page_filename in enumerate(project.story(code), start=1)
+            )
+            return render_page(project, f"{name}'s Book", f"<h1>{html.escape(name)}'s Book</h1>\n{spreads}")
+
+        if write_if_changed(out_dir, f"{code}.html", book_inputs(project, code), manifest, force, render_book):
+            written.append(f"{code}.html")
+
+    def render_index():
+        title = project.book.get("title") or project.book.get("name") or "Storybooks"
+        items = "".join(
+            f'<li><a href="{code}.html">{html.escape(project.character_name(code))}\'s Book</a> '
+            f'({len(project.story(code))} spreads)</li>\n'
+            for code in project.codes()
+        )
+        return render_page(project, title, f"<h1>{html.escape(title)}</h1>\n<ul>\n{items}</ul>")
+
+    index_inputs = [Path("book.yaml")] + [project.characters[c]['file'] for c in project.codes()]
+    if write_if_changed(out_dir, "index.html", index_inputs, manifest, force, render_index):
+        written.append("index.html")
+
+    save_manifest(out_dir, manifest)
+
+    if written:
+        print(f"Wrote {len(written)} page(s): {', '.join(written)}")
+    else:
+        print("Pages up to date")
+    print(f"✓ Site ready: {out_dir / 'index.html'}")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Build a static HTML preview site for every character's book",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/build_site.py
+    python3 scripts/build_site.py --output-dir /tmp/preview --workers 8
+        """
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default="out-site",
+        help="Where to write the site (default: out-site)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of concurrent thumbnail encodes (default: 4)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild everything, ignoring the manifest",
+    )
+    args = parser.parse_args()
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Error: PIL/Pillow not installed. Run: uv pip install pillow")
+        sys.exit(1)
+
+    build_site(Path(args.output_dir), args.workers, args.force)
+
+
+if __name__ == "__main__":
+    main()
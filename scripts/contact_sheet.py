@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Build contact sheets: grids of every spread, per character and library-wide.
+
+Images are read with JPEG draft mode, which makes libjpeg decode at a
+reduced scale (1/2, 1/4 or 1/8) straight from the DCT coefficients. A
+3579x2406 spread shrunk to a 320 px cell is decoded at about 447x300, so
+only about 1/64 of the pixels are ever produced. Decoding runs in a process
+pool, and a spread shared by several books is decoded once.
+
+Every cell is labelled with its spread number and page ID. The library
+sheet has one row per character, in story order, so shared spreads line up
+in the same column.
+
+Usage:
+    python3 scripts/contact_sheet.py [<character-code> ...] [--library]
+                                     [--cell-width PX] [--columns N]
+                                     [--output-dir DIR] [--workers N]
+
+With no character codes, a sheet is made for every character. --library
+also makes library.jpg with every character.
+
+Examples:
+    python3 scripts/contact_sheet.py
+    python3 scripts/contact_sheet.py cu ha --cell-width 480 --columns 4
+    python3 scripts/contact_sheet.py --library --output-dir review/
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from gen_image import BLEED, PHOTOBOOK_SIZE
+from project import load_project, page_id
+from typeset import load_font
+
+OUT_DIR = Path('out-images') / 'contact-sheets'
+
+LABEL_HEIGHT = 22
+GAP = 8
+BACKGROUND = (40, 40, 40)
+LABEL_COLOUR = (230, 230, 230)
+MISSING_COLOUR = (90, 90, 90)
+
+
+def decode_cell(job: Tuple[str, int, int]) -> Optional[Tuple[Tuple[int, int], bytes]]:
+    """
+    Decode one image at reduced scale into a cell (runs in a worker process).
+    Returns ((width, height), RGB bytes), or None if the image can't be read.
+    """
+    from PIL import Image
+
+    path, cell_w, cell_h = job
+    try:
+        with Image.open(path) as img:
+            full_size = img.size
+            # Let libjpeg scale down during decoding (no-op for non-JPEGs)
+            img.draft('RGB', (cell_w, cell_h))
+            # The photobook canvas's white bleed border is not artwork
+            if full_size == PHOTOBOOK_SIZE:
+                scale = img.size[0] / full_size[0]
+                p = round(BLEED * scale)
+                img = img.crop((p, p, img.size[0] - p, img.size[1] - p))
+            img = img.convert('RGB')
+            img.thumbnail((cell_w, cell_h), Image.Resampling.BILINEAR)
+            return img.size, img.tobytes()
+    except OSError:
+        return None
+
+
+def decode_all(paths: List[Path], cell_w: int, cell_h: int, workers: int) -> Dict[Path, Optional[tuple]]:
+    """Decode every distinct image once, in parallel."""
+    unique = sorted({path for path in paths if path.exists()})
+    jobs = [(str(path), cell_w, cell_h) for path in unique]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        return dict(zip(unique, executor.map(decode_cell, jobs, chunksize=chunksize)))
+
+
+def compose(rows: List[Tuple[Optional[str], List[Tuple[str, Path]]]], cells: Dict[Path, Optional[tuple]],
+            cell_w: int, cell_h: int, columns: int):
+    """
+    Lay out labelled cells in a grid.
+    rows: [(row title or None, [(label, image path), ...])]; long rows wrap at columns.
+    """
+    from PIL import Image, ImageDraw
+
+    font = load_font(14)
+    title_font = load_font(18)
+
+    # Expand each titled row into grid lines of at most `columns` cells
+    lines = []
+    for title, items in rows:
+        chunks = [items[i:i + columns] for i in range(0, len(items), columns)] or [[]]
+        for n, chunk in enumerate(chunks):
+            lines.append((title if n == 0 else None, chunk))
+
+    has_titles = any(title for title, _ in rows)
+    title_h = LABEL_HEIGHT + 6 if has_titles else 0
+    line_h = title_h + cell_h + LABEL_HEIGHT + GAP
+    width = GAP + columns * (cell_w + GAP)
+    height = GAP + len(lines) * line_h
+    sheet = Image.new('RGB', (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+
+    for line, (title, chunk) in enumerate(lines):
+        y = GAP + line * line_h
+        if title:
+            draw.text((GAP, y), title, fill=LABEL_COLOUR, font=title_font)
+        y += title_h
+        for column, (label, path) in enumerate(chunk):
+            x = GAP + column * (cell_w + GAP)
+            cell = cells.get(path)
+            if cell is None:
+                draw.rectangle((x, y, x + cell_w - 1, y + cell_h - 1), fill=MISSING_COLOUR)
+                draw.text((x + 8, y + 8), "missing", fill=LABEL_COLOUR, font=font)
+            else:
+                size, data = cell
+                image = Image.frombytes('RGB', size, data)
+                # Centre cells whose aspect ratio differs from the grid's
+                sheet.paste(image, (x + (cell_w - size[0]) // 2, y + (cell_h - size[1]) // 2))
+            draw.text((x, y + cell_h + 4), label, fill=LABEL_COLOUR, font=font)
+    return sheet
+
+
+def story_cells(project, code: str) -> List[Tuple[str, Path]]:
+    """Return [(label, image path)] for a character's spreads in story order."""
+    return [
+        (f"spread {spread} · {page_id(page)}", Path('out-images') / f"{page_id(page)}-openai.jpg")
+        for spread, page in enumerate(project.story(code), start=1)
+    ]
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Build contact sheets of every spread",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/contact_sheet.py
+    python3 scripts/contact_sheet.py cu ha --cell-width 480 --columns 4
+    python3 scripts/contact_sheet.py --library --output-dir review/
+        """
+    )
+    parser.add_argument("codes", nargs="*", help="Character codes (default: every character)")
+    parser.add_argument("--library", action="store_true", help="Also build library.jpg with every character")
+    parser.add_argument("--cell-width", type=int, default=320, help="Width of each cell in pixels (default: 320)")
+    parser.add_argument("--columns", type=int, default=6, help="Cells per row on character sheets (default: 6)")
+    parser.add_argument("--output-dir", type=Path, default=OUT_DIR, help=f"Output directory (default: {OUT_DIR})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Decode processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    project = load_project()
+    codes = args.codes or project.codes()
+    unknown = [code for code in codes if code not in project.characters]
+    if unknown:
+        print(f"Error: Unknown character code(s): {', '.join(unknown)}")
+        return 1
+
+    # Spreads are 3:2 (1536x1024 before upscaling)
+    cell_w = args.cell_width
+    cell_h = round(cell_w * 2 / 3)
+
+    stories = {code: story_cells(project, code) for code in (project.codes() if args.library else codes)}
+    paths = [path for cells in stories.values() for _, path in cells]
+    decoded = decode_all(paths, cell_w, cell_h, max(1, args.workers))
+    decode_ms = (time.perf_counter() - start) * 1000
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for code in codes:
+        sheet = compose([(None, stories[code])], decoded, cell_w, cell_h, args.columns)
+        path = args.output_dir / f"{code}.jpg"
+        sheet.save(path, "JPEG", quality=85)
+        written.append(path)
+
+    if args.library:
+        rows = [(f"{code.upper()} - {project.character_name(code)}", stories[code]) for code in project.codes()]
+        longest = max((len(cells) for cells in stories.values()), default=1)
+        sheet = compose(rows, decoded, cell_w, cell_h, longest)
+        path = args.output_dir / "library.jpg"
+        sheet.save(path, "JPEG", quality=85)
+        written.append(path)
+
+    missing = sum(1 for path in set(paths) if decoded.get(path) is None)
+    elapsed = time.perf_counter() - start
+    for path in written:
+        print(f"✓ {path}")
+    print(f"\n{len(decoded)} image(s) decoded in {decode_ms:.0f} ms, {len(written)} sheet(s) in {elapsed:.1f} s")
+    if missing:
+        print(f"⚠️  {missing} spread(s) have no image yet (shown as 'missing')")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Track characters, traits and props across spreads and flag continuity issues.
+
+Usage:
+    python3 scripts/continuity.py [--character CODE] [--entity NAME]
+                                  [--index] [--json] [--rebuild]
+
+Entities are seeded from each character's attributes:
+- The character's name, age and visual traits from `visual_description`
+  (e.g. "Piercing blue eyes" -> eyes: blue, "Thirteen years old" -> age 13)
+- Keywords from the other attribute lists (hobbies, memorable details, ...)
+
+Each page's description, visual and text are then scanned for:
+- Mentions of each character and of their attribute keywords
+- Ages ("Thirteen-year-old Cullan") and trait colours ("his blonde hair")
+- Props a character holds, from possessives ("his camera",
+  "his blue pyramid toy"), attributed to the nearest matching character
+
+From those it builds an index of which entities appear on which spread in
+every book, and reports:
+- Contradictions (errors): an age or trait colour that differs from the
+  character file, or a prop whose colour changes between pages
+- Disappearances (warnings): a single prop (not a collection like "his
+  toys") a character carries on at least MIN_PROP_SPREADS spreads of their
+  book, but not on spreads in between
+
+Feelings, ideas and people ("her joy", "his journey", "her brother") are
+not props.
+
+Per-page scans are cached in .katha-cache/continuity.json. Only pages whose
+mtime or size changed since the last run are re-scanned (all pages are
+re-scanned if the character seeds change), so it is cheap to run on save.
+
+Exit codes:
+- 0: No contradictions (disappearances are warnings)
+- 1: One or more contradictions
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from project import load_characters, load_yaml
+
+CACHE_FILE = Path('.katha-cache') / 'continuity.json'
+CACHE_VERSION = 1
+
+SCANNED_FIELDS = ('description', 'visual', 'text')
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13,
+    'fourteen': 14, 'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18,
+}
+
+COLOURS = {
+    'black', 'blonde', 'blond', 'blue', 'brown', 'ginger', 'golden', 'gray', 'green',
+    'grey', 'hazel', 'orange', 'pink', 'purple', 'red', 'silver', 'white', 'yellow',
+    'auburn', 'dark', 'light',
+}
+
+# Body nouns are traits rather than props
+TRAIT_NOUNS = {
+    'hair', 'eyes', 'eye', 'skin', 'face', 'smile', 'cheeks', 'freckles', 'curls',
+}
+BODY_NOUNS = TRAIT_NOUNS | {
+    'hand', 'hands', 'arm', 'arms', 'head', 'feet', 'foot', 'leg', 'legs', 'body',
+    'mouth', 'shoulder', 'shoulders', 'chest', 'fingers', 'finger', 'knees',
+    'lap', 'posture', 'expression', 'voice', 'heart', 'breath', 'mind',
+    'neck', 'lips', 'cheek', 'palm', 'palms', 'nose', 'brow', 'forehead', 'chin',
+    'eyebrows', 'tears', 'grin', 'gaze', 'look', 'toes', 'ears', 'wrist',
+}
+
+# Adjectives that often sit in front of a prop ("his trusty camera")
+MODIFIERS = {
+    'favorite', 'favourite', 'little', 'small', 'big', 'large', 'old', 'new', 'own',
+    'tiny', 'trusty', 'precious', 'beloved', 'worn', 'well', 'special', 'wooden',
+    'bright', 'shiny', 'soft', 'first', 'last', 'best', 'whole',
+}
+
+ADJECTIVE_SUFFIXES = ('ic', 'ful', 'ous', 'ive', 'al', 'ible', 'able', 'ish', 'less')
+
+# Possessives that name feelings, ideas, people or places rather than things
+# a character carries ("her joy", "his journey", "her brother")
+ABSTRACT_NOUNS = {
+    'joy', 'fear', 'love', 'hope', 'pride', 'anger', 'delight', 'wonder', 'courage', 'fantasy',
+    'goal', 'dream', 'dreams', 'journey', 'quest', 'adventure', 'vision', 'idea', 'ideas', 'plan',
+    'turn', 'name', 'life', 'world', 'time', 'day', 'side', 'place', 'home', 'room', 'way', 'path',
+    'brother', 'sister', 'mum', 'mom', 'dad', 'mother', 'father', 'cousin', 'cousins', 'friend',
+    'friends', 'family', 'parents', 'grandma', 'grandpa', 'siblings',
+}
+ABSTRACT_SUFFIXES = ('ity', 'ness', 'ment', 'tion', 'sion', 'ance', 'ence', 'ship', 'hood', 'dom', 'ism',
+                     'graphy', 'logy')
+
+# Adjectives that can end a possessive with no noun after them ("her happy ...")
+NON_NOUNS = {
+    'happy', 'sad', 'usual', 'gentle', 'quiet', 'eager', 'brave', 'excited', 'proud', 'sweet', 'curious',
+}
+
+# Project data rather than grammar: words on this repository's pages that
+# follow "his" or "her" but are not things a character carries, and that the
+# rules above can't tell apart from props ("his grasp", "her drawn face").
+# When continuity.py reports a prop that isn't one, add the word here.
+PROJECT_ABSTRACT_NOUNS = {
+    'grasp', 'struggles', 'features', 'form', 'movements', 'presence', 'reflection', 'shadow',
+    'attempt', 'attempts', 'work', 'play', 'energy', 'step', 'steps', 'secret', 'spot', 'attention',
+    'focus',
+}
+PROJECT_NON_NOUNS = {'visible', 'handsome', 'familiar', 'desperate', 'deeper', 'simple', 'drawn'}
+
+DETERMINERS = {'a', 'an', 'the', 'his', 'her', 'their', 'its'}
+
+# A prop must be carried on at least this many spreads of its owner's book
+# before gaps in between are reported
+MIN_PROP_SPREADS = 3
+
+# Words that end a possessive noun phrase
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'of', 'to', 'in', 'on', 'at', 'by', 'for',
+    'with', 'from', 'into', 'onto', 'over', 'under', 'as', 'is', 'are', 'was', 'were',
+    'be', 'been', 'has', 'have', 'had', 'that', 'this', 'which', 'who', 'while', 'when',
+    'where', 'his', 'her', 'their', 'its', 'he', 'she', 'they', 'it', 'him', 'them',
+    'tight', 'close', 'up', 'down', 'out', 'away', 'back', 'forward', 'around', 'high',
+    'low', 'still', 'just', 'now', 'then', 'again', 'too', 'very', 'against', 'beside',
+    'behind', 'above', 'below', 'through', 'across', 'toward', 'towards', 'near', 'so',
+    'rests', 'sits', 'hangs', 'lies', 'glows', 'catches', 'shows', 'reveals', 'seems',
+    'more', 'most', 'rather', 'than', 'there', 'here', 'like', 'earlier',
+}
+
+WORD_RE = re.compile(r"[A-Za-z]+(?:'[a-z]+)?|[.!?]")
+AGE_RE = re.compile(r"\b(\w+)[- ]years?[- ]old\b(?:\s+([A-Z][a-z]+))?")
+
+
+def _stamp(path: Path) -> Optional[List[int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _parse_age(word: str) -> Optional[int]:
+    word = word.lower()
+    if word.isdigit():
+        return int(word)
+    return NUMBER_WORDS.get(word)
+
+
+def _keywords(item: str) -> List[str]:
+    """Return the content words of an attribute item."""
+    return [
+        w for w in (m.lower() for m in re.findall(r"[A-Za-z]+", item))
+        if len(w) > 3 and w not in STOPWORDS
+    ]
+
+
+def seed_character(code: str, char_data: dict) -> dict:
+    """Seed a character's entities from its attributes."""
+    attributes = char_data.get('attributes') or {}
+    seed = {
+        'code': code,
+        'name': attributes.get('name', code.upper()),
+        'gender': str(attributes.get('gender', '')).lower(),
+        'age': attributes.get('age') if isinstance(attributes.get('age'), int) else None,
+        'traits': {},
+        'keywords': [],
+        'story': list(char_data.get('story') or []),
+    }
+
+    for item in attributes.get('visual_description') or []:
+        item = str(item)
+        m = AGE_RE.search(item)
+        if m and _parse_age(m.group(1)) is not None:
+            seed['age'] = _parse_age(m.group(1))
+        words = [w.lower() for w in re.findall(r"[A-Za-z]+", item)]
+        for prev, word in zip(words, words[1:]):
+            if word in TRAIT_NOUNS and prev in COLOURS:
+                seed['traits'][word] = prev
+
+    keywords = set()
+    for key, value in attributes.items():
+        if key == 'visual_description' or not isinstance(value, list):
+            continue
+        for item in value:
+            keywords.update(_keywords(str(item)))
+    seed['keywords'] = sorted(keywords)
+    return seed
+
+
+def _possessive_phrase(tokens: List[str], start: int) -> List[str]:
+    """Collect the noun phrase after a possessive pronoun."""
+    phrase = []
+    end = start
+    for token in tokens[start:start + 4]:
+        word = token.lower()
+        if not token.isalpha() or word in STOPWORDS or word.endswith(('ing', 'ed', 'ly')):
+            break
+        phrase.append(word)
+        end += 1
+    # A word followed directly by a determiner is a verb ("his camera captures the ...")
+    if len(phrase) > 1 and end < len(tokens) and tokens[end].lower() in DETERMINERS:
+        phrase.pop()
+    return phrase
+
+
+def _is_y_adjective(word: str) -> bool:
+    """Words like "bushy", "lanky" or "happy"; not "toy" or "journey"."""
+    return len(word) > 3 and word.endswith('y') and word[-2] not in 'aeiouy'
+
+
+def _prop_key(phrase: List[str]) -> Optional[str]:
+    """
+    Return the word that identifies a prop ("blue pyramid toy" -> "pyramid"),
+    or None if the phrase names something abstract rather than a thing.
+    """
+    for i, word in enumerate(phrase):
+        if word in COLOURS or word in MODIFIERS or word in NON_NOUNS or word in PROJECT_NON_NOUNS:
+            continue
+        # Skip adjective-looking words when a noun follows ("geometric blocks", "bushy tail")
+        if i < len(phrase) - 1 and (word.endswith(ADJECTIVE_SUFFIXES) or _is_y_adjective(word)):
+            continue
+        if (word in ABSTRACT_NOUNS or word in PROJECT_ABSTRACT_NOUNS or word.endswith(ABSTRACT_SUFFIXES)
+                or word.endswith(ADJECTIVE_SUFFIXES)):
+            return None
+        return word
+    return None
+
+
+def _is_plural(noun: str) -> bool:
+    return noun.endswith('s') and not noun.endswith(('ss', 'us', 'is'))
+
+
+def scan_page(page_data: dict, seeds: Dict[str, dict], participants: List[str]) -> dict:
+    """Extract mentions, ages, traits and props from one page."""
+    names = {seed['name'].lower(): code for code, seed in seeds.items()}
+    keyword_owners = defaultdict(list)
+    for code, seed in seeds.items():
+        for keyword in seed['keywords']:
+            keyword_owners[keyword].append(code)
+
+    result = {'mentions': {}, 'keywords': {}, 'ages': [], 'traits': [], 'props': [], 'coloured': []}
+
+    for field in SCANNED_FIELDS:
+        text = page_data.get(field)
+        if not isinstance(text, str):
+            continue
+
+        for m in AGE_RE.finditer(text):
+            age = _parse_age(m.group(1))
+            code = names.get((m.group(2) or '').lower())
+            if age is not None and code:
+                result['ages'].append([code, age])
+
+        tokens = WORD_RE.findall(text)
+        # Every "<colour> <word>" pair, so unowned mentions ("the blue pyramid")
+        # can be checked against the colour of a known prop
+        for prev, token in zip(tokens, tokens[1:]):
+            if prev.lower() in COLOURS and token.isalpha():
+                result['coloured'].append([prev.lower(), token.lower()])
+        # Most recent character mentioned, per pronoun gender
+        recent = {}
+        for i, token in enumerate(tokens):
+            word = token.lower()
+            if token in '.!?':
+                continue
+            if word in names:
+                code = names[word]
+                result['mentions'][code] = result['mentions'].get(code, 0) + 1
+                recent[seeds[code]['gender']] = code
+                continue
+            if word in keyword_owners:
+                result['keywords'][word] = result['keywords'].get(word, 0) + 1
+            if word not in ('his', 'her'):
+                continue
+
+            gender = 'male' if word == 'his' else 'female'
+            owner = recent.get(gender)
+            if owner is None:
+                candidates = [c for c in participants if c in seeds and seeds[c]['gender'] == gender]
+                owner = candidates[0] if len(candidates) == 1 else None
+            phrase = _possessive_phrase(tokens, i + 1)
+            if owner is None or not phrase:
+                continue
+
+            colours = [w for w in phrase if w in COLOURS]
+            trait = next((w for w in phrase if w in TRAIT_NOUNS), None)
+            if trait and colours:
+                result['traits'].append([owner, trait, colours[-1]])
+            elif not any(w in BODY_NOUNS for w in phrase):
+                key = _prop_key(phrase)
+                if key:
+                    result['props'].append([owner, " ".join(phrase), key])
+
+    return result
+
+
+class ContinuityTracker:
+    """Incrementally maintained entity index across every book."""
+
+    def __init__(self, data: Optional[dict] = None):
+        data = data or {}
+        self.seed_hash = data.get('seed_hash')
+        # page filename -> {'stamp', 'spread', 'scan'}
+        self.pages = data.get('pages', {})
+        self.seeds = {}
+
+    def update(self, pages_dir: Path = Path('pages'), char_dir: Path = Path('characters')) -> int:
+        """Re-seed characters and re-scan changed pages. Returns the number of pages scanned."""
+        errors = []
+        seeds = {code: seed_character(code, char_info['data'])
+                 for code, char_info in load_characters(char_dir, errors).items()}
+        for char_file, e in errors:
+            print(f"Warning: Skipping {char_file}: {e}", file=sys.stderr)
+        self.seeds = seeds
+
+        # Stories don't affect per-page scans, so leave them out of the hash.
+        # Include this script so changes to the scanner invalidate the cache.
+        scan_inputs = {c: {k: v for k, v in s.items() if k != 'story'} for c, s in seeds.items()}
+        h = hashlib.sha256(json.dumps(scan_inputs, sort_keys=True).encode())
+        h.update(Path(__file__).read_bytes())
+        seed_hash = h.hexdigest()
+        if seed_hash != self.seed_hash:
+            self.pages = {}
+            self.seed_hash = seed_hash
+
+        scanned = 0
+        seen = set()
+        for entry in os.scandir(pages_dir) if pages_dir.exists() else []:
+            if not entry.name.endswith('.yaml'):
+                continue
+            seen.add(entry.name)
+            stamp = _stamp(Path(entry.path))
+            cached = self.pages.get(entry.name)
+            if cached and cached['stamp'] == stamp:
+                continue
+            try:
+                page_data = load_yaml(entry.path) or {}
+            except Exception as e:
+                print(f"Warning: Failed to scan {entry.path}: {e}", file=sys.stderr)
+                continue
+            participants = [p for p in Path(entry.name).stem.split('-') if len(p) == 2 and p.isalpha()]
+            self.pages[entry.name] = {
+                'stamp': stamp,
+                'scan': scan_page(page_data, seeds, participants),
+            }
+            scanned += 1
+        for page in set(self.pages) - seen:
+            del self.pages[page]
+        return scanned
+
+    def to_dict(self) -> dict:
+        return {'version': CACHE_VERSION, 'seed_hash': self.seed_hash, 'pages': self.pages}
+
+    def index(self) -> Dict[str, List[dict]]:
+        """Return {entity: [{'book', 'spread', 'page'}]} across every book."""
+        entities = defaultdict(list)
+        for code, seed in sorted(self.seeds.items()):
+            for spread, page in enumerate(seed['story'], start=1):
+                scan = self.pages.get(page, {}).get('scan')
+                if not scan:
+                    continue
+                found = set()
+                for mentioned in scan['mentions']:
+                    found.add(self.seeds[mentioned]['name'])
+                found.update(scan['keywords'])
+                for owner, phrase, head in scan['props']:
+                    found.add(f"{self.seeds[owner]['name']}'s {head}")
+                for entity in found:
+                    entities[entity].append({'book': code, 'spread': spread, 'page': page})
+        return dict(entities)
+
+    def issues(self) -> List[dict]:
+        """Return every contradiction and disappearance."""
+        issues = []
+
+        for page, entry in sorted(self.pages.items()):
+            scan = entry['scan']
+            for code, age in scan['ages']:
+                expected = self.seeds[code]['age']
+                if expected is not None and age != expected:
+                    issues.append({
+                        'level': 'error', 'page': page, 'entity': f"{self.seeds[code]['name']}'s age",
+                        'message': f"{self.seeds[code]['name']} is {age} here but {expected} in the character file",
+                    })
+            for code, noun, colour in scan['traits']:
+                expected = self.seeds[code]['traits'].get(noun)
+                if expected and colour != expected and {colour, expected} != {'blond', 'blonde'}:
+                    issues.append({
+                        'level': 'error', 'page': page, 'entity': f"{self.seeds[code]['name']}'s {noun}",
+                        'message': f"{self.seeds[code]['name']}'s {noun} is {colour} here but {expected} in the character file",
+                    })
+
+        # Props: colour changes, and gaps in the owner's own book
+        for code, seed in sorted(self.seeds.items()):
+            colours = defaultdict(dict)
+            carried = defaultdict(list)
+            for spread, page in enumerate(seed['story'], start=1):
+                scan = self.pages.get(page, {}).get('scan')
+                if not scan:
+                    continue
+                for owner, phrase, head in scan['props']:
+                    if owner != code:
+                        continue
+                    if not carried[head] or carried[head][-1] != spread:
+                        carried[head].append(spread)
+                    for word in phrase.split():
+                        if word in COLOURS:
+                            colours[head].setdefault(word, []).append(page)
+
+            # Unowned colour mentions of a known prop in the owner's book
+            for page in seed['story']:
+                scan = self.pages.get(page, {}).get('scan')
+                for colour, noun in (scan or {}).get('coloured', []):
+                    if noun in colours:
+                        colours[noun].setdefault(colour, []).append(page)
+
+            for head, by_colour in sorted(colours.items()):
+                if len(by_colour) > 1:
+                    detail = "; ".join(f"{c} on {', '.join(sorted(set(p)))}" for c, p in sorted(by_colour.items()))
+                    issues.append({
+                        'level': 'error', 'page': None, 'entity': f"{seed['name']}'s {head}",
+                        'message': f"{seed['name']}'s {head} changes colour: {detail}",
+                    })
+
+            for head, spreads in sorted(carried.items()):
+                # Collections ("his toys") come and go; only a single carried thing is tracked
+                if len(spreads) < MIN_PROP_SPREADS or _is_plural(head):
+                    continue
+                for before, after in zip(spreads, spreads[1:]):
+                    if after - before > 1:
+                        missing = seed['story'][before:after - 1]
+                        gap = f"spread {before + 1}" if after - before == 2 else f"spreads {before + 1}-{after - 1}"
+                        issues.append({
+                            'level': 'warning', 'page': missing[0], 'entity': f"{seed['name']}'s {head}",
+                            'message': (
+                                f"{seed['name']}'s {head} disappears on {gap} "
+                                f"({', '.join(Path(p).stem for p in missing)}) between spreads {before} and {after}"
+                            ),
+                        })
+        return issues
+
+
+def load_tracker(rebuild: bool = False) -> ContinuityTracker:
+    """Load the cached tracker and bring it up to date with the files on disk."""
+    tracker = None
+    if not rebuild:
+        try:
+            with open(CACHE_FILE, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                tracker = ContinuityTracker(data)
+        except (OSError, ValueError):
+            pass
+    tracker = tracker or ContinuityTracker()
+
+    if tracker.update() or rebuild:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_FILE.with_suffix(f'.tmp-{os.getpid()}')
+        with open(tmp_path, 'w') as f:
+            json.dump(tracker.to_dict(), f)
+        os.replace(tmp_path, CACHE_FILE)
+    return tracker
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Track entities across spreads and flag continuity issues",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/continuity.py
+    python3 scripts/continuity.py --character ha
+    python3 scripts/continuity.py --index --entity camera
+        """
+    )
+    parser.add_argument("--character", type=str, help="Only report on this character's book")
+    parser.add_argument("--entity", type=str, help="Only report entities containing this text")
+    parser.add_argument("--index", action="store_true", help="Print the entity index instead of issues")
+    parser.add_argument("--json", action="store_true", help="Print as JSON")
+    parser.add_argument("--rebuild", action="store_true", help="Re-scan every page")
+    args = parser.parse_args()
+
+    tracker = load_tracker(args.rebuild)
+    entity_filter = args.entity.lower() if args.entity else None
+    code_filter = args.character.lower() if args.character else None
+
+    if args.index:
+        index = {
+            entity: [o for o in occurrences if not code_filter or o['book'] == code_filter]
+            for entity, occurrences in sorted(tracker.index().items())
+            if not entity_filter or entity_filter in entity.lower()
+        }
+        index = {entity: occurrences for entity, occurrences in index.items() if occurrences}
+        if args.json:
+            print(json.dumps(index, indent=2))
+            return 0
+        for entity, occurrences in index.items():
+            by_book = defaultdict(list)
+            for o in occurrences:
+                by_book[o['book']].append(str(o['spread']))
+            books = "; ".join(f"{book}: {', '.join(spreads)}" for book, spreads in sorted(by_book.items()))
+            print(f"{entity:30} {books}")
+        return 0
+
+    issues = tracker.issues()
+    if code_filter:
+        name = tracker.seeds[code_filter]['name'] if code_filter in tracker.seeds else code_filter
+        story = set(tracker.seeds.get(code_filter, {}).get('story', []))
+        issues = [i for i in issues if i['page'] in story or i['entity'].startswith(f"{name}'s")]
+    if entity_filter:
+        issues = [i for i in issues if entity_filter in i['entity'].lower()]
+
+    if args.json:
+        print(json.dumps(issues, indent=2))
+    else:
+        for issue in issues:
+            symbol = "✗" if issue['level'] == 'error' else "⚠"
+            print(f"{symbol} {issue['message']}")
+        errors = sum(issue['level'] == 'error' for issue in issues)
+        print(f"\n{errors} contradiction(s), {len(issues) - errors} disappearance(s)")
+
+    return 1 if any(issue['level'] == 'error' for issue in issues) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Fix one region of a generated page with a masked edit.
+
+Regenerating a whole spread to fix one detail (the colour of a toy, a
+missing hand) costs a full request and often breaks parts that were fine.
+This script sends the page's stored image and a mask to the backend's
+images edit endpoint with a correction prompt, then merges only the masked
+region of the result back into the stored master. Every pixel outside the
+mask (slightly feathered to hide the seam) is kept exactly as it was.
+
+The master is out-images/<page-id>-openai.jpg, or the text-free
+out-images/<page-id>-openai-art.jpg when book.yaml has `typeset_text: true`,
+in which case the text is typeset again afterwards. The edited master is
+saved as a new version in the artifact store, so an edit can be undone
+with `python3 scripts/artifacts.py select`. Edits are recorded in
+the ledger as backend '<name>-edit' and don't make a page stale.
+
+The region is either a rectangle in the master's pixel coordinates
+(3579x2406 for photobook images, bleed included) or a mask image of any
+size with the same aspect ratio: white (or, for images with an alpha
+channel, transparent) pixels are edited.
+
+Usage:
+    uv run scripts/edit_image.py <page-path> (--rect X,Y,W,H | --mask PATH) "<correction>"
+                                 [--quality Q] [--backend NAME] [--feather PX]
+
+Examples:
+    uv run scripts/edit_image.py pages/ha-01.yaml --rect 2100,1300,500,400 "Make Hansel's toy boat red"
+    uv run scripts/edit_image.py pages/cu-03.yaml --mask fix-ladder.png "Give the ladder five rungs" --quality medium
+"""
+
+import argparse
+import asyncio
+import io
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+import artifacts
+import ledger
+import profiling
+import typeset
+from backends import EditRequest, all_backends, get_backend
+from gen_image import BLEED, PHOTOBOOK_SIZE, check_api_keys, load_page_data, load_visual_style, typeset_enabled
+from singleflight import single_flight
+
+# Load environment variables from .env file
+load_dotenv()
+
+# The edit is sent at the backend's generation size
+EDIT_SIZE = "1536x1024"
+
+# Grow the region sent to the API so the model can blend into its surroundings
+MASK_GROW = 24
+DEFAULT_FEATHER = 12
+
+
+def parse_rect(value: str) -> Tuple[int, int, int, int]:
+    """Parse X,Y,W,H into a (left, top, right, bottom) box."""
+    try:
+        x, y, w, h = (int(v) for v in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected X,Y,W,H in pixels, got '{value}'")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError(f"width and height must be positive, got '{value}'")
+    return x, y, x + w, y + h
+
+
+def content_box(size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """Return the part of a master that came from the model (the photobook canvas has a border)."""
+    if size == PHOTOBOOK_SIZE:
+        return BLEED, BLEED, size[0] - BLEED, size[1] - BLEED
+    return 0, 0, size[0], size[1]
+
+
+def region_mask(size: Tuple[int, int], rect: Optional[tuple] = None, mask_path: Optional[Path] = None):
+    """Return an 'L' mask at the master's size: 255 where the image may change."""
+    from PIL import Image, ImageDraw
+
+    if rect is not None:
+        mask = Image.new('L', size, 0)
+        ImageDraw.Draw(mask).rectangle((rect[0], rect[1], rect[2] - 1, rect[3] - 1), fill=255)
+        return mask
+
+    with Image.open(mask_path) as img:
+        if 'A' in img.getbands():
+            # OpenAI's convention: transparent pixels are the ones to edit
+            mask = img.getchannel('A').point(lambda a: 255 if a < 128 else 0)
+        else:
+            mask = img.convert('L').point(lambda v: 255 if v >= 128 else 0)
+    return mask.resize(size, Image.Resampling.NEAREST)
+
+
+def build_request(master, mask, page_id: str, prompt: str, quality: str) -> EditRequest:
+    """Scale the master's content and the mask down to the API's size."""
+    from PIL import Image, ImageFilter
+
+    box = content_box(master.size)
+    api_size = tuple(int(v) for v in EDIT_SIZE.split("x"))
+    image = master.crop(box).resize(api_size, Image.Resampling.LANCZOS)
+    region = mask.crop(box).resize(api_size, Image.Resampling.BILINEAR)
+    grow = max(1, MASK_GROW * api_size[0] // (box[2] - box[0])) * 2 + 1
+    region = region.filter(ImageFilter.MaxFilter(grow)).point(lambda v: 255 if v else 0)
+
+    api_mask = Image.new('RGBA', api_size, (0, 0, 0, 255))
+    api_mask.putalpha(region.point(lambda v: 0 if v else 255))
+    image_png, mask_png = io.BytesIO(), io.BytesIO()
+    image.save(image_png, 'PNG')
+    api_mask.save(mask_png, 'PNG')
+    return EditRequest(page_id, prompt, image_png.getvalue(), mask_png.getvalue(), EDIT_SIZE, quality)
+
+
+def merge_edit(master, mask, edited_bytes: bytes, feather: int):
+    """Return the master with the masked region replaced by the edited image."""
+    from PIL import Image, ImageFilter
+
+    box = content_box(master.size)
+    with Image.open(io.BytesIO(edited_bytes)) as edited:
+        edited = edited.convert('RGB').resize((box[2] - box[0], box[3] - box[1]), Image.Resampling.LANCZOS)
+    full = master.copy()
+    full.paste(edited, box[:2])
+    alpha = mask.filter(ImageFilter.GaussianBlur(feather)) if feather else mask
+    return Image.composite(full, master, alpha)
+
+
+def build_prompt(correction: str, visual_style: str) -> str:
+    """Wrap the correction so the model only repaints the masked region, in style."""
+    parts = [
+        "This is an illustration for a children's storybook two-page spread.",
+        "Change only the masked region, as follows:",
+        correction.strip(),
+        "",
+        "Keep everything else exactly as it is. Match the existing lighting, line work and colours "
+        "so the edit blends in seamlessly. Do not add any text.",
+    ]
+    if visual_style:
+        parts += ["", "--- VISUAL STYLE ---", visual_style]
+    return "\n".join(parts)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Fix one region of a generated page with a masked edit",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    uv run scripts/edit_image.py pages/ha-01.yaml --rect 2100,1300,500,400 "Make Hansel's toy boat red"
+    uv run scripts/edit_image.py pages/cu-03.yaml --mask fix-ladder.png "Give the ladder five rungs"
+        """
+    )
+    parser.add_argument("page_path", help="Path to the page YAML file (e.g. pages/ha-01.yaml)")
+    parser.add_argument("correction", help="What to change in the region")
+    region = parser.add_mutually_exclusive_group(required=True)
+    region.add_argument("--rect", type=parse_rect, help="Region to edit as X,Y,W,H in the stored image's pixels")
+    region.add_argument("--mask", type=Path, help="Mask image: white (or transparent) pixels are edited")
+    parser.add_argument("--backend", default="openai", help="Backend with masked edit support (default: openai)")
+    parser.add_argument("--quality", choices=["low", "medium", "high"], default="high",
+                        help="Quality tier (default: high)")
+    parser.add_argument("--feather", type=int, default=DEFAULT_FEATHER,
+                        help=f"Blur radius of the merge seam in pixels (default: {DEFAULT_FEATHER})")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.enable("edit_image", args)
+
+    backend = get_backend(args.backend)
+    if backend is None or not backend.supports_edits:
+        names = ", ".join(b.name for b in all_backends() if b.supports_edits)
+        print(f"Error: Backend '{args.backend}' can't do masked edits (choose from {names})")
+        return 1
+    check_api_keys(backend)
+    if args.mask is not None and not args.mask.exists():
+        print(f"Error: Mask not found: {args.mask}")
+        return 1
+
+    page_id = Path(args.page_path).stem
+    page_data = load_page_data(args.page_path)
+    typeset_text = typeset_enabled()
+    canonical = artifacts.OUT_DIR / f"{page_id}-{backend.name}.jpg"
+    master_path = typeset.art_path(page_id, backend.name) if typeset_text else canonical
+    if not master_path.exists():
+        print(f"Error: No image to edit at {master_path}; generate the page first")
+        return 1
+
+    return asyncio.run(edit_page(backend, args, page_id, page_data, canonical, master_path, typeset_text))
+
+
+async def edit_page(backend, args, page_id: str, page_data: dict, canonical: Path, master_path: Path,
+                    typeset_text: bool) -> int:
+    """Edit the master under the page's generation lock, so concurrent runs can't overwrite each other."""
+    from PIL import Image
+
+    async with single_flight(canonical.name, log=lambda message: print(f"[{backend.name}] {message}")):
+        started_at = time.time()
+        with Image.open(master_path) as img:
+            master = img.convert('RGB')
+        mask = region_mask(master.size, args.rect, args.mask)
+        if mask.getbbox() is None:
+            print("Error: The region to edit is empty (check --rect or the mask)")
+            return 1
+        prompt = build_prompt(args.correction, load_visual_style())
+        request = build_request(master, mask, page_id, prompt, backend.quality_for(args.quality))
+
+        print(f"[{backend.name}] Editing {mask.getbbox()} of {master_path}...")
+        timings = {"prompt_ms": (time.time() - started_at) * 1000}
+        record = dict(page_id=page_id, backend=f"{backend.name}-edit", prompt=prompt, references=[],
+                      started_at=started_at, timings=timings, model=backend.model, size=request.size,
+                      quality=request.quality)
+        try:
+            api_start = time.perf_counter()
+            with profiling.stage(f"api ({backend.name} edit)"):
+                edited = await backend.edit(request)
+            timings["api_ms"] = (time.perf_counter() - api_start) * 1000
+
+            postprocess_start = time.perf_counter()
+            with profiling.stage("merge"):
+                merged = merge_edit(master, mask, edited, args.feather)
+            previous = artifacts.load_index(master_path)['selected']
+            metadata = dict(page_id=page_id, backend=backend.name, quality=request.quality,
+                            edit=args.correction, edit_box=list(mask.getbbox()), edited_from=previous)
+            with profiling.stage("jpeg encode + save"):
+                artifacts.save_image(merged, master_path, metadata, quality=95)
+            if typeset_text:
+                with profiling.stage("typeset"):
+                    typeset.typeset_page(page_id, page_data, backend.name, force=True)
+            timings["postprocess_ms"] = (time.perf_counter() - postprocess_start) * 1000
+        except Exception as e:
+            print(f"Error editing image with {backend.description}: {e}")
+            ledger.record(outcome="error", error=str(e), **record)
+            return 1
+
+        ledger.record(outcome="ok", output_path=str(canonical), **record)
+        print(f"\n✓ Edited {canonical}")
+        if previous and master_path == artifacts.OUT_DIR / f"{page_id}-openai.jpg":
+            print(f"  Undo with: python3 scripts/artifacts.py select {page_id} {previous[:12]}")
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
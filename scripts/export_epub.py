@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Export characters' books as fixed-layout EPUB3 files for tablets.
+
+Usage:
+    python3 scripts/export_epub.py <character-code> [...] | --all
+                                   [--height PX] [--workers N] [--force]
+
+Each book is built from the character's `story` list. Every spread is split
+at the gutter into a left and a right page, so a tablet shows the spread
+two-up in landscape and one page at a time in portrait. The 3579x2406 print
+images are far too large for a screen, so each page gets a screen rendition
+(default 1600 px tall, about 0.4 MB). Renditions are encoded in parallel and
+cached in .katha-cache/epub/. A manifest records the fingerprint (path, size,
+mtime) of each rendition's source, so only pages whose image changed are
+encoded again. Pages shared by several books are encoded once, so exporting
+the whole library is quick.
+
+The story text is included as real text, so it can be read aloud, searched
+and resized by the reader. With `typeset_text: true` in book.yaml, the
+text-free artwork is used and the text is laid over it as HTML, where
+scripts/typeset.py would put it. Otherwise the text is already painted into
+the image, and the HTML copy is kept for screen readers and search only.
+
+Output goes to out-images/<code>.epub.
+
+Options:
+    --all           Export every character's book
+    --height PX     Height of each page rendition (default: 1600)
+    --workers N     Number of concurrent rendition encodes (default: 4)
+    --force         Encode every rendition again, ignoring the manifest
+
+Examples:
+    python3 scripts/export_epub.py cu
+    python3 scripts/export_epub.py --all --workers 8
+    python3 scripts/export_epub.py ha --height 2048 --force
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import sys
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import typeset
+from gen_image import BLEED, PHOTOBOOK_SIZE
+from project import load_project, page_id
+
+CACHE_DIR = Path('.katha-cache') / 'epub'
+OUT_DIR = Path('out-images')
+
+DEFAULT_HEIGHT = 1600
+RENDITION_QUALITY = 82
+
+# Bump when renditions are cropped or encoded differently so all are rebuilt
+RENDITION_VERSION = "1"
+
+SIDES = ('left', 'right')
+
+CSS = """
+html, body { margin: 0; padding: 0; }
+.page { position: relative; overflow: hidden; }
+.page img { position: absolute; top: 0; left: 0; width: 100%; height: 100%; }
+.story { position: absolute; margin: 0; font-family: Georgia, "DejaVu Serif", serif; color: rgb(40, 32, 24);
+         background: rgba(255, 252, 242, 0.75); border-radius: 0.6em; padding: 0.6em; line-height: 1.35; }
+.hidden { position: absolute; width: 1px; height: 1px; overflow: hidden; clip: rect(0 0 0 0); white-space: nowrap; }
+"""
+
+
+def fingerprint(path: Path, height: int) -> str:
+    """Return a hash of a rendition's source (size and mtime) and settings."""
+    h = hashlib.sha256(f"{RENDITION_VERSION}:{height}:".encode())
+    try:
+        stat = path.stat()
+        h.update(f"{path.as_posix()}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    except OSError:
+        h.update(f"{path.as_posix()}:missing".encode())
+    return h.hexdigest()
+
+
+def load_manifest() -> Dict[str, str]:
+    try:
+        with open(CACHE_DIR / ".manifest.json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: Dict[str, str]):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_DIR / ".manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def source_image(pid: str, typeset_text: bool) -> Path:
+    """Return the image a page's renditions are made from."""
+    if typeset_text:
+        return typeset.art_path(pid)
+    return OUT_DIR / f"{pid}-openai.jpg"
+
+
+def rendition_path(pid: str, side: str) -> Path:
+    return CACHE_DIR / f"{pid}-{side}.jpg"
+
+
+def make_renditions(source: Path, pid: str, height: int) -> Tuple[int, int]:
+    """Crop the artwork, split it at the gutter and encode both pages. Returns the page size."""
+    from PIL import Image
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as img:
+        img = img.convert("RGB")
+        if img.size == PHOTOBOOK_SIZE:
+            img = img.crop((BLEED, BLEED, img.width - BLEED, img.height - BLEED))
+        page_width = round(img.width / 2 * height / img.height)
+        img = img.resize((page_width * 2, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    for n, side in enumerate(SIDES):
+        page = img.crop((n * page_width, 0, (n + 1) * page_width, height))
+        page.save(rendition_path(pid, side), "JPEG", quality=RENDITION_QUALITY, optimize=True, progressive=True)
+    return page_width, height
+
+
+def build_renditions(page_ids: List[str], height: int, typeset_text: bool, workers: int,
+                     force: bool) -> Dict[str, Tuple[int, int]]:
+    """Encode the renditions of every page whose source changed. Returns {page id: page size}."""
+    from PIL import Image
+
+    manifest = load_manifest()
+    sizes = {}
+    jobs = []
+    for pid in page_ids:
+        source = source_image(pid, typeset_text)
+        if not source.exists():
+            raise ValueError(f"Missing image for {pid}: {source}")
+        stamp = fingerprint(source, height)
+        outputs = [rendition_path(pid, side) for side in SIDES]
+        if force or manifest.get(pid) != stamp or not all(path.exists() for path in outputs):
+            jobs.append((pid, source, stamp))
+        else:
+            with Image.open(outputs[0]) as img:
+                sizes[pid] = img.size
+
+    print(f"Encoding renditions for {len(jobs)} of {len(page_ids)} page(s)...")
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(make_renditions, source, pid, height): (pid, stamp) for pid, source, stamp in jobs}
+        for future, (pid, stamp) in futures.items():
+            try:
+                sizes[pid] = future.result()
+                manifest[pid] = stamp
+                print(f"  ✓ {pid}")
+            except Exception as e:
+                failed.append(pid)
+                print(f"  ✗ {pid}: {e}")
+    save_manifest(manifest)
+    if failed:
+        raise ValueError(f"Failed to encode {', '.join(failed)}")
+    return sizes
+
+
+def text_style(page_data: dict, width: int, height: int) -> str:
+    """Position the story text where scripts/typeset.py would set it on this page."""
+    font_size = height * typeset.FONT_SIZE
+    # The panel sits against the outside edge, clear of the gutter
+    edge = 'left' if (page_data.get('text_side') or 'left') == 'left' else 'right'
+    max_width = (1 - typeset.OUTER_MARGIN - typeset.GUTTER_MARGIN) * width - 2 * typeset.PANEL_PADDING * font_size
+    return (f"{edge}: {typeset.OUTER_MARGIN * width:.0f}px; top: {typeset.TOP_MARGIN * height:.0f}px; "
+            f"max-width: {max_width:.0f}px; font-size: {font_size:.0f}px;")
+
+
+def page_xhtml(title: str, language: str, image: str, size: Tuple[int, int], alt: str,
+               text: Optional[str], text_style_: Optional[str]) -> str:
+    """Render one fixed-layout page."""
+    width, height = size
+    story = ""
+    if text:
+        paragraphs = "<br/>".join(html.escape(line) for line in text.split("\n\n"))
+        if text_style_:
+            story = f'\n<p class="story" style="{text_style_}">{paragraphs}</p>'
+        else:
+            story = f'\n<p class="hidden">{paragraphs}</p>'
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{language}" xml:lang="{language}">
+<head>
+<meta charset="utf-8"/>
+<meta name="viewport" content="width={width}, height={height}"/>
+<title>{html.escape(title)}</title>
+<link rel="stylesheet" href="book.css"/>
+</head>
+<body>
+<div class="page" style="width: {width}px; height: {height}px;">
+<img src="images/{image}" alt="{html.escape(alt, quote=True)}"/>{story}
+</div>
+</body>
+</html>
+"""
+
+
+def write_epub(project, code: str, sizes: Dict[str, Tuple[int, int]], typeset_text: bool,
+               output_path: Path) -> int:
+    """Write one character's EPUB. Returns the number of pages."""
+    book_title = project.book.get('title') or project.book.get('name') or 'Storybook'
+    title = f"{book_title}: {project.character_name(code)}"
+    language = project.book.get('language') or 'en'
+    identifier = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, f'katha:{book_title}:{code}')}"
+    modified = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+    documents = []  # (xhtml name, contents, page-spread side)
+    images = []     # (zip name, rendition path)
+    seen_images = set()
+    nav_items = []
+    for spread, page_filename in enumerate(project.story(code), start=1):
+        pid = page_id(page_filename)
+        page_data = project.page(page_filename) or {}
+        text = (page_data.get('text') or '').strip()
+        text_side = page_data.get('text_side') or 'left'
+        alt = (page_data.get('description') or '').strip()
+        for side in SIDES:
+            image = f"{pid}-{side}.jpg"
+            if image not in seen_images:
+                seen_images.add(image)
+                images.append((image, rendition_path(pid, side)))
+            # The text appears once per spread, on the page it is set on
+            on_page = text if side == text_side else None
+            style = text_style(page_data, *sizes[pid]) if typeset_text and on_page else None
+            name = f"s{spread:02d}-{side}.xhtml"
+            documents.append((name, page_xhtml(f"{title} - {spread}", language, image, sizes[pid],
+                                               alt if side == 'left' else "", on_page, style), side))
+        nav_items.append(f'<li><a href="s{spread:02d}-left.xhtml">{spread}. {html.escape(page_data.get("beat") or pid)}</a></li>')
+
+    manifest_items = [
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+        '<item id="css" href="book.css" media-type="text/css"/>',
+    ]
+    for n, (image, _) in enumerate(images):
+        properties = ' properties="cover-image"' if n == 0 else ""
+        manifest_items.append(f'<item id="img{n}" href="images/{image}" media-type="image/jpeg"{properties}/>')
+    spine_items = []
+    for n, (name, _, side) in enumerate(documents):
+        manifest_items.append(f'<item id="p{n}" href="{name}" media-type="application/xhtml+xml"/>')
+        spine_items.append(f'<itemref idref="p{n}" properties="page-spread-{side}"/>')
+
+    opf = f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id"
+         prefix="rendition: http://www.idpf.org/vocab/rendition/#">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="book-id">{identifier}</dc:identifier>
+<dc:title>{html.escape(title)}</dc:title>
+<dc:language>{language}</dc:language>
+<meta property="dcterms:modified">{modified}</meta>
+<meta property="rendition:layout">pre-paginated</meta>
+<meta property="rendition:spread">landscape</meta>
+<meta property="rendition:orientation">auto</meta>
+</metadata>
+<manifest>
+{chr(10).join(manifest_items)}
+</manifest>
+<spine page-progression-direction="ltr">
+{chr(10).join(spine_items)}
+</spine>
+</package>
+"""
+    nav = f"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{language}" xml:lang="{language}">
+<head><meta charset="utf-8"/><title>{html.escape(title)}</title></head>
+<body>
+<nav epub:type="toc" id="toc"><h1>{html.escape(title)}</h1>
+<ol>
+{chr(10).join(nav_items)}
+</ol>
+</nav>
+</body>
+</html>
+"""
+    container = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>
+"""
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+    with zipfile.ZipFile(tmp_path, "w") as epub:
+        # The mimetype must come first and be stored uncompressed
+        epub.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        epub.writestr("META-INF/container.xml", container, compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/content.opf", opf, compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/nav.xhtml", nav, compress_type=zipfile.ZIP_DEFLATED)
+        epub.writestr("OEBPS/book.css", CSS, compress_type=zipfile.ZIP_DEFLATED)
+        for name, contents, _ in documents:
+            epub.writestr(f"OEBPS/{name}", contents, compress_type=zipfile.ZIP_DEFLATED)
+        # JPEGs don't compress further
+        for image, path in images:
+            epub.write(path, f"OEBPS/images/{image}", compress_type=zipfile.ZIP_STORED)
+    tmp_path.replace(output_path)
+    return len(documents)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Export characters' books as fixed-layout EPUB3 files",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/export_epub.py cu
+    python3 scripts/export_epub.py --all --workers 8
+        """
+    )
+    parser.add_argument("char_codes", nargs="*", help="Character codes to export")
+    parser.add_argument("--all", action="store_true", help="Export every character's book")
+    parser.add_argument("--height", type=int, default=DEFAULT_HEIGHT,
+                        help=f"Height of each page rendition in pixels (default: {DEFAULT_HEIGHT})")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent rendition encodes (default: 4)")
+    parser.add_argument("--force", action="store_true", help="Encode every rendition again")
+    args = parser.parse_args()
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Error: PIL/Pillow not installed. Run: uv pip install pillow")
+        return 1
+
+    project = load_project()
+    codes = project.codes() if args.all else args.char_codes
+    if not codes:
+        parser.error("give character codes or --all")
+    for code in codes:
+        if code not in project.characters:
+            print(f"Error: Unknown character code: {code}")
+            return 1
+
+    typeset_text = bool(project.book.get('typeset_text'))
+    page_ids = list(dict.fromkeys(page_id(name) for code in codes for name in project.story(code)))
+    try:
+        sizes = build_renditions(page_ids, args.height, typeset_text, args.workers, args.force)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    for code in codes:
+        output_path = OUT_DIR / f"{code}.epub"
+        pages = write_epub(project, code, sizes, typeset_text, output_path)
+        size_mb = output_path.stat().st_size / 1e6
+        print(f"✓ {output_path} ({pages} page(s), {size_mb:.1f} MB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
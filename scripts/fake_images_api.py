@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI images API, with fault injection.
+
+Serves POST /v1/images/generations and POST /v1/images/edits with
+deterministic placeholder images: the colour and caption come from a hash of
+the prompt, so the same page always gets the same picture. Point the
+pipeline at it with OPENAI_BASE_URL; nothing else changes:
+
+    python3 scripts/fake_images_api.py --scenario flaky
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake \\
+        uv run scripts/gen_all_images.py cu
+
+Scenarios configure what the server does to each request:
+- latency:    fixed, uniform or lognormal delay before responding
+- error_rate: fraction of requests answered with a 500
+- burst_429:  every `every` seconds, answer everything with 429 (and a
+              Retry-After header) for `duration` seconds
+- slow_body:  with `probability`, trickle the response body out over
+              `seconds` seconds
+
+GET /_stats returns request counts by endpoint and status. Randomness is
+seeded, so a scenario produces the same faults in the same order each run.
+
+Usage:
+    python3 scripts/fake_images_api.py [--port N] [--scenario NAME | --scenario-file PATH]
+                                       [--time-scale X] [--seed N]
+    python3 scripts/fake_images_api.py --list
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import math
+import random
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import yaml
+
+SCENARIOS = {
+    "baseline": {
+        "description": "Healthy API: ~2 s lognormal latency, no faults",
+        "latency": {"distribution": "lognormal", "median": 2.0, "sigma": 0.3},
+    },
+    "slow-tail": {
+        "description": "Heavy latency tail: same median, p99 around 20 s",
+        "latency": {"distribution": "lognormal", "median": 2.0, "sigma": 1.0},
+    },
+    "flaky": {
+        "description": "20% of requests fail with a 500",
+        "latency": {"distribution": "lognormal", "median": 2.0, "sigma": 0.3},
+        "error_rate": 0.2,
+    },
+    "rate-limited": {
+        "description": "429 for 5 s out of every 15 s",
+        "latency": {"distribution": "lognormal", "median": 2.0, "sigma": 0.3},
+        "burst_429": {"every": 15, "duration": 5, "retry_after": 2},
+    },
+    "slow-body": {
+        "description": "30% of responses trickle out over 10 s",
+        "latency": {"distribution": "fixed", "seconds": 1.0},
+        "slow_body": {"probability": 0.3, "seconds": 10},
+    },
+}
+
+PLACEHOLDER_SIZE = "1536x1024"
+
+
+def load_scenario(name: Optional[str] = None, path: Optional[str] = None) -> dict:
+    """Return a built-in scenario by name, or one read from a YAML/JSON file."""
+    if path:
+        with open(path, 'r') as f:
+            return yaml.safe_load(f) or {}
+    if name not in SCENARIOS:
+        raise ValueError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+    return SCENARIOS[name]
+
+
+def placeholder_png(prompt: str, size: str) -> bytes:
+    """Return a deterministic placeholder image for a prompt."""
+    from PIL import Image, ImageDraw
+
+    digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+    width, height = (int(v) for v in size.split('x'))
+    img = Image.new('RGB', (width, height), tuple(digest[:3]))
+    draw = ImageDraw.Draw(img)
+    # A darker centre band so the gutter split is visible in previews
+    draw.rectangle((width // 2 - 4, 0, width // 2 + 4, height), fill=tuple(v // 2 for v in digest[:3]))
+    draw.text((40, 40), f"FAKE {digest.hex()[:12]}", fill=(255, 255, 255))
+    draw.text((40, 70), prompt[-200:].replace("\n", " ")[:120], fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class FaultInjector:
+    """Decides, deterministically, what happens to each request."""
+
+    def __init__(self, scenario: dict, seed: int = 0, time_scale: float = 1.0):
+        self.scenario = scenario
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def latency(self) -> float:
+        spec = self.scenario.get('latency') or {'distribution': 'fixed', 'seconds': 0}
+        with self.lock:
+            if spec['distribution'] == 'lognormal':
+                value = self.random.lognormvariate(math.log(spec['median']), spec['sigma'])
+            elif spec['distribution'] == 'uniform':
+                value = self.random.uniform(spec['min'], spec['max'])
+            else:
+                value = spec.get('seconds', 0)
+        return value * self.time_scale
+
+    def rate_limited(self) -> Optional[float]:
+        """Return a Retry-After value if we're inside a 429 burst, else None."""
+        burst = self.scenario.get('burst_429')
+        if not burst:
+            return None
+        elapsed = (time.monotonic() - self.started) / self.time_scale
+        if elapsed % burst['every'] < burst['duration']:
+            return burst.get('retry_after', 1)
+        return None
+
+    def fails(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.scenario.get('error_rate', 0)
+
+    def slow_body_seconds(self) -> float:
+        spec = self.scenario.get('slow_body')
+        if not spec:
+            return 0.0
+        with self.lock:
+            hit = self.random.random() < spec.get('probability', 1.0)
+        return spec['seconds'] * self.time_scale if hit else 0.0
+
+
+class ImagesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None, trickle: float = 0.0):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        if trickle:
+            chunks = 20
+            step = max(1, len(body) // chunks)
+            for i in range(0, len(body), step):
+                self.wfile.write(body[i:i + step])
+                self.wfile.flush()
+                time.sleep(trickle / chunks)
+        else:
+            self.wfile.write(body)
+
+    def _record(self, endpoint: str, status: int, started: float):
+        with self.server.stats_lock:
+            stats = self.server.stats
+            stats['requests'] += 1
+            key = f"{endpoint} {status}"
+            stats['responses'][key] = stats['responses'].get(key, 0) + 1
+            stats['latencies_ms'].append(round((time.monotonic() - started) * 1000, 1))
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            with self.server.stats_lock:
+                self._send_json(200, self.server.stats)
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def _read_prompt(self) -> tuple:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            data = json.loads(body or b"{}")
+            return data.get("prompt", ""), data.get("size") or PLACEHOLDER_SIZE
+        # images.edit sends multipart/form-data
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if name in ("prompt", "size"):
+                fields[name] = part.get_content()
+        return fields.get("prompt", ""), fields.get("size") or PLACEHOLDER_SIZE
+
+    def do_POST(self):
+        started = time.monotonic()
+        endpoint = self.path.rstrip("/").split("/")[-1]
+        if endpoint not in ("generations", "edits"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        if not self.headers.get("Authorization"):
+            self._record(endpoint, 401, started)
+            self._send_json(401, {"error": {"message": "missing API key", "type": "invalid_request_error"}})
+            return
+
+        prompt, size = self._read_prompt()
+        faults = self.server.faults
+
+        retry_after = faults.rate_limited()
+        if retry_after is not None:
+            self._record(endpoint, 429, started)
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            headers={"Retry-After": retry_after})
+            return
+
+        time.sleep(faults.latency())
+        if faults.fails():
+            self._record(endpoint, 500, started)
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        image = placeholder_png(prompt, size)
+        payload = {"created": int(time.time()), "data": [{"b64_json": base64.b64encode(image).decode('ascii')}]}
+        trickle = faults.slow_body_seconds()
+        self._send_json(200, payload, trickle=trickle)
+        self._record(endpoint, 200, started)
+
+
+class FakeImagesServer:
+    """Runs the fake API in a background thread."""
+
+    def __init__(self, scenario: dict, port: int = 0, seed: int = 0, time_scale: float = 1.0, verbose: bool = False):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), ImagesHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.faults = FaultInjector(scenario, seed, time_scale)
+        self.httpd.stats = {"requests": 0, "responses": {}, "latencies_ms": []}
+        self.httpd.stats_lock = threading.Lock()
+        self.httpd.verbose = verbose
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeImagesServer":
+        self.thread.start()
+        return self
+
+    def stats(self) -> dict:
+        with self.httpd.stats_lock:
+            return json.loads(json.dumps(self.httpd.stats))
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Run a local fake images API with fault injection",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/fake_images_api.py --scenario flaky
+    python3 scripts/fake_images_api.py --scenario-file my-scenario.yaml --port 9000
+        """
+    )
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on (default: 8089)")
+    parser.add_argument("--scenario", default="baseline", help="Built-in scenario (default: baseline)")
+    parser.add_argument("--scenario-file", help="YAML/JSON scenario file instead of a built-in one")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every delay by this (e.g. 0.1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for injected faults (default: 0)")
+    parser.add_argument("--list", action="store_true", help="List the built-in scenarios")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"  {name:14} {scenario['description']}")
+        return 0
+
+    try:
+        scenario = load_scenario(args.scenario, args.scenario_file)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    server = FakeImagesServer(scenario, args.port, args.seed, args.time_scale, args.verbose)
+    print(f"Fake images API ({scenario.get('description', args.scenario_file or args.scenario)})")
+    print(f"  export OPENAI_BASE_URL={server.base_url}")
+    print(f"  export OPENAI_API_KEY=fake")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        stats = server.stats()
+        print(f"\n{stats['requests']} request(s): {json.dumps(stats['responses'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,28 +3,77 @@
 Generate images for a character's story pages in parallel, then create a PDF.
 
 Usage:
-    uv run scripts/gen_all_images.py <character-code> [--workers N]
+    uv run scripts/gen_all_images.py <character-code> [--workers N] [--quality Q]
+                                     [--budget USD] [--skip-current] [--dry-run]
 
 Arguments:
     character-code  Two-letter character code (e.g., cu, em, ha)
 
 Options:
     --workers N     Number of concurrent image generations (default: 5)
+    --quality Q     OpenAI quality tier: low, medium or high (default: high)
+    --budget USD    Hard spending cap. Once the next request would exceed it,
+                    no new requests start; requests in flight finish, and no
+                    PDF is made.
+    --skip-current  Skip pages whose image matches the current YAML and
+                    reference images (according to the generation ledger)
+    --dry-run       Print the pages that would be generated and the
+                    estimated cost, then exit without calling the API
+    --print-profile P
+                    Render the finished book with a print profile from
+                    print-profiles/ (see scripts/impose.py) instead of the
+                    default 100 dpi PDF
+    --profile [DIR] Profile this run and every gen_image.py it starts
+                    (see scripts/profiling.py)
+
+Pages flow through a pipeline of stages (see scripts/pipeline.py):
+generate -> QA -> render -> assemble. Each page is checked (size,
+truncation, blank image) and rendered as soon as its image exists, and the
+PDF is written in story order as pages become ready, so it is finished
+shortly after the slowest page. Pages that are already up to date go
+straight to QA (with `typeset_text: true` in book.yaml, their text is
+typeset again first if it changed). If any page fails, no PDF is kept.
 
 Examples:
     uv run scripts/gen_all_images.py cu
     uv run scripts/gen_all_images.py em --workers 10
     uv run scripts/gen_all_images.py ha --workers 3
+    uv run scripts/gen_all_images.py cu --dry-run --quality medium
+    uv run scripts/gen_all_images.py em --budget 5 --skip-current
 """
 
+import functools
+import os
+import shutil
 import subprocess
 import sys
+import tempfile
 import yaml
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import argparse
 
+import profiling
+from budget import QUALITIES, Budget, plan, print_plan
+from gen_image import PHOTOBOOK_SIZE
+from impose import PdfWriter, cover_images, load_profile, plan_jobs, render_item
+from pipeline import ItemResult, Pipeline, Stage, print_timeline
+from project import load_yaml
+from schemas import validate_documents
+from singleflight import STALE_AFTER
+
+# gen_image.py output sizes: photobook canvas, and --raw
+EXPECTED_SIZES = {PHOTOBOOK_SIZE, (1536, 1024)}
+
+# The default PDF lays images out at this resolution
+PDF_DPI = 100
+
+# How long one gen_image.py request may take
+GENERATION_TIMEOUT = 180
+# Before its own request, gen_image.py may wait on another run generating the
+# same page: until that run finishes, or its lock goes stale if it crashed
+PAGE_TIMEOUT = max(GENERATION_TIMEOUT, STALE_AFTER) + GENERATION_TIMEOUT
+
 
 def load_character_story(char_code: str) -> List[str]:
     """Load a character's story pages from their YAML file."""
@@ -62,13 +111,17 @@ def load_character_story(char_code: str) -> List[str]:
     return story
 
 
-def generate_image(page_path: Path) -> Tuple[Path, bool, str]:
+def generate_image(page_path: Path, quality: str = "high", budget: Optional[Budget] = None,
+                   cost: float = 0.0) -> Tuple[Path, bool, str]:
     """
-    Generate image for a single page.
+    Generate image for a single page, if the budget allows it.
     Returns (page_path, success, message).
     """
     page_id = page_path.stem
 
+    if budget is not None and not budget.reserve(cost):
+        return (page_path, False, f"✗ {page_id}: Skipped (budget of ${budget.limit:.2f} reached)")
+
     try:
         # Print header for this worker
         print(f"\n{'='*80}")
@@ -78,8 +131,8 @@ def generate_image(page_path: Path) -> Tuple[Path, bool, str]:
         # Call gen_image.py as subprocess, letting output flow through
         # Always use openai backend, no guide lines
         result = subprocess.run(
-            ["uv", "run", "scripts/gen_image.py", "openai", str(page_path)],
-            timeout=180,  # 3 minute timeout per image
+            ["uv", "run", "scripts/gen_image.py", "openai", str(page_path), "--quality", quality],
+            timeout=PAGE_TIMEOUT,
         )
 
         # Print footer for this worker
@@ -94,9 +147,9 @@ def generate_image(page_path: Path) -> Tuple[Path, bool, str]:
 
     except subprocess.TimeoutExpired:
         print(f"\n{'='*80}")
-        print(f"[{page_id}] TIMEOUT after 3 minutes")
+        print(f"[{page_id}] TIMEOUT after {PAGE_TIMEOUT // 60} minutes")
         print(f"{'='*80}\n")
-        return (page_path, False, f"✗ {page_id}: Timeout (>3min)")
+        return (page_path, False, f"✗ {page_id}: Timeout (>{PAGE_TIMEOUT // 60}min)")
     except Exception as e:
         print(f"\n{'='*80}")
         print(f"[{page_id}] ERROR: {str(e)}")
@@ -104,50 +157,146 @@ def generate_image(page_path: Path) -> Tuple[Path, bool, str]:
         return (page_path, False, f"✗ {page_id}: {str(e)[:100]}")
 
 
-def create_pdf(char_code: str, page_filenames: List[str]) -> None:
-    """Create a PDF from generated images in story order."""
-    try:
-        from PIL import Image
-    except ImportError:
-        print("Error: PIL/Pillow not installed. Run: uv pip install pillow")
-        sys.exit(1)
+def generate_stage(job: dict, _previous, quality: str, budget: Budget, costs: dict) -> None:
+    """Pipeline stage: generate a page's image, raising if it fails."""
+    _, success, message = generate_image(Path(job['page']), quality, budget, costs[job['page_id']])
+    if not success:
+        raise RuntimeError(message)
 
-    print("\n" + "=" * 80)
-    print("Creating PDF...")
-    print("=" * 80)
 
-    # Collect images in order
-    images = []
-    out_images_dir = Path("out-images")
+def typeset_stage(job: dict, _previous) -> None:
+    """Pipeline stage (worker process): re-typeset a page whose text changed since its art was made."""
+    from typeset import typeset_page
 
-    for page_filename in page_filenames:
-        page_id = Path(page_filename).stem
-        image_path = out_images_dir / f"{page_id}-openai.jpg"
+    typeset_page(job['page_id'], load_yaml(Path(job['page'])) or {})
 
-        if not image_path.exists():
-            print(f"Error: Missing image file: {image_path}")
-            sys.exit(1)
 
-        print(f"Adding page: {page_id}")
-        img = Image.open(image_path)
-        images.append(img)
+def check_image(job: dict, _previous) -> dict:
+    """
+    Pipeline stage (worker process): check a page's image before it goes in the book.
+    Returns {'width', 'height', 'mode', 'format'}.
+    """
+    from PIL import Image, ImageStat
+
+    path = job['image']
+    if not os.path.exists(path):
+        raise ValueError(f"Missing image file: {path}")
+    with Image.open(path) as img:
+        info = {'width': img.size[0], 'height': img.size[1], 'mode': img.mode, 'format': img.format}
+        if img.size not in EXPECTED_SIZES:
+            raise ValueError(f"{path} is {img.size[0]}x{img.size[1]}, not a gen_image.py size")
+        # Decoding at 1/8 scale still reads every byte, so truncation shows up
+        img.draft('RGB', (img.size[0] // 8, img.size[1] // 8))
+        img.load()
+        if ImageStat.Stat(img.convert('L')).stddev[0] < 1:
+            raise ValueError(f"{path} is blank")
+    return info
+
+
+def pdf_page(job: dict, info: dict) -> List[dict]:
+    """Pipeline stage: describe a page for the default PDF (a JPEG is embedded as-is)."""
+    path = job['image']
+    if info['format'] != 'JPEG' or info['mode'] != 'RGB':
+        from PIL import Image
+
+        path = os.path.join(job['tmp_dir'], f"{job['index']:04d}-0.jpg")
+        with Image.open(job['image']) as img:
+            img.convert('RGB').save(path, "JPEG", quality=95)
+    return [{
+        'path': path,
+        'mode': 'RGB',
+        'width_px': info['width'],
+        'height_px': info['height'],
+        'width_mm': info['width'] / PDF_DPI * 25.4,
+        'height_mm': info['height'] / PDF_DPI * 25.4,
+    }]
+
+
+def render_stage(job: dict, _previous) -> List[dict]:
+    """Pipeline stage (worker process): render a spread or cover with a print profile."""
+    return render_item(job)
 
-    # Save as PDF
-    pdf_path = out_images_dir / f"{char_code}.pdf"
-    print(f"\nSaving PDF to: {pdf_path}")
 
-    if len(images) == 1:
-        images[0].save(pdf_path, "PDF", resolution=100.0)
+def build_book(char_code: str, page_paths: List[Path], costs: dict, quality: str, budget: Budget,
+               workers: int, print_profile: Optional[dict] = None, typeset_text: bool = False) -> List[ItemResult]:
+    """
+    Generate, check and render every page, writing the PDF as pages become ready.
+    Returns the pipeline results; the PDF is only kept if every page succeeded.
+    """
+    out_dir = Path("out-images")
+    images = [out_dir / f"{page_path.stem}-openai.jpg" for page_path in page_paths]
+    tmp_dir = tempfile.mkdtemp(prefix='gen-all-')
+
+    if print_profile:
+        book_jobs, cover_jobs = plan_jobs(print_profile, images, cover_images(print_profile, char_code), tmp_dir)
+        output_path = out_dir / f"{char_code}-{print_profile['id']}.pdf"
+        bleed_mm = print_profile['bleed_mm']
     else:
-        images[0].save(
-            pdf_path,
-            "PDF",
-            resolution=100.0,
-            save_all=True,
-            append_images=images[1:]
-        )
+        book_jobs = [
+            {'index': i, 'image': str(image), 'kind': 'spread', 'profile': None, 'tmp_dir': tmp_dir}
+            for i, image in enumerate(images, start=1)
+        ]
+        cover_jobs = []
+        output_path = out_dir / f"{char_code}.pdf"
+        bleed_mm = 0
+    spreads = [job for job in book_jobs if job['kind'] == 'spread']
+    for job, page_path in zip(spreads, page_paths):
+        job['page'] = str(page_path)
+        job['page_id'] = page_path.stem
+
+    stages = [
+        Stage("generate", functools.partial(generate_stage, quality=quality, budget=budget, costs=costs),
+              when=lambda job: job.get('page_id') in costs),
+        # Text edits don't make a page stale, so up-to-date art may need its text set again
+        Stage("typeset", typeset_stage, pool="process",
+              when=lambda job: typeset_text and job['kind'] == 'spread' and job.get('page_id') not in costs),
+        Stage("qa", check_image, pool="process", when=lambda job: job['kind'] == 'spread'),
+        Stage("render", render_stage, pool="process") if print_profile else Stage("pdf page", pdf_page),
+    ]
+    pipeline = Pipeline(stages, threads=workers)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    book = PdfWriter(output_path, bleed_mm)
+    covers = PdfWriter(output_path.with_name(f"{output_path.stem}-cover.pdf"), bleed_mm) if cover_jobs else None
+    generated = 0
+
+    def progress(result: ItemResult, stage: str):
+        nonlocal generated
+        label = result.item.get('page_id') or f"{result.item['kind']} {Path(result.item['image']).name}"
+        if result.failed_stage == stage:
+            print(result.error if stage == "generate" else f"✗ {label}: {stage} failed: {result.error}")
+        elif stage == "generate":
+            generated += 1
+            print(f"[{generated}/{len(costs)}] ✓ {label}")
+
+    def assemble(job: dict, pages: List[dict]):
+        writer = covers if covers and job['kind'] == 'cover' else book
+        for page in pages:
+            writer.add_page(page)
+            if page['path'] != job['image']:
+                os.unlink(page['path'])
 
-    print(f"✓ PDF created successfully: {pdf_path}")
+    try:
+        results = pipeline.run(book_jobs + cover_jobs, sink=assemble, on_stage_done=progress)
+        if all(result.ok for result in results):
+            for writer in (book, covers):
+                if writer:
+                    writer.close()
+                    print(f"\n✓ PDF created successfully: {writer.path} ({len(writer.page_ids)} page(s))")
+        else:
+            for writer in (book, covers):
+                if writer:
+                    writer.abort()
+    except BaseException:
+        for writer in (book, covers):
+            if writer:
+                writer.abort()
+        raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print_timeline(pipeline, results)
+    return results
 
 
 def main():
@@ -172,8 +321,45 @@ Examples:
         default=5,
         help="Number of concurrent image generations (default: 5)",
     )
+    parser.add_argument(
+        "--quality",
+        choices=QUALITIES,
+        default="high",
+        help="OpenAI quality tier (default: high)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="Stop starting new requests once this many USD would be exceeded",
+    )
+    parser.add_argument(
+        "--skip-current",
+        action="store_true",
+        help="Skip pages whose image matches the current YAML (per the ledger)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which pages would be generated and the estimated cost, then exit",
+    )
+    parser.add_argument(
+        "--print-profile",
+        type=str,
+        help="Render the PDF with a print profile from print-profiles/ (e.g. photobook)",
+    )
+    profiling.add_arguments(parser)
 
     args = parser.parse_args()
+    profiling.enable("gen_all_images", args)
+
+    # Check the print profile before spending anything on images
+    print_profile = None
+    if args.print_profile:
+        try:
+            print_profile = load_profile(args.print_profile)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
 
     # Load character's story
     page_filenames = load_character_story(args.char_code)
@@ -194,48 +380,62 @@ Examples:
             sys.exit(1)
         page_paths.append(page_path)
 
-    # Process pages in parallel
-    successes = []
-    failures = []
+    # Fail on bad pages before spending any API calls on them, with the same
+    # checks as validate_structure.py (including spreads against stories)
+    with profiling.stage("validate pages"):
+        violations = [f"{v.path}: {v.message}" for v in validate_documents(page_paths)]
+    if violations:
+        print(f"Error: {len(violations)} schema violation(s) in this story's pages:")
+        for violation in violations:
+            print(f"  - {violation}")
+        print("Run python3 scripts/validate_structure.py for details")
+        sys.exit(1)
 
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        # Submit all tasks
-        future_to_page = {
-            executor.submit(generate_image, page): page
-            for page in page_paths
-        }
+    # Estimate the run before spending anything
+    with profiling.stage("plan"):
+        build_plan = plan(page_filenames, args.quality, args.skip_current)
+    print("\nBuild plan:")
+    print_plan(build_plan, args.quality, args.budget)
+    print("=" * 80)
+    if args.dry_run:
+        sys.exit(0)
 
-        # Process results as they complete
-        completed = 0
-        for future in as_completed(future_to_page):
-            page_path, success, message = future.result()
-            completed += 1
+    costs = {page["page_id"]: page["cost"] for page in build_plan["pages"] if page["generate"]}
+    # Imported here so the pipeline's worker processes don't load gen_image's dependencies
+    from gen_image import typeset_enabled
+    budget = Budget(args.budget)
 
-            print(f"[{completed}/{total}] {message}")
+    # Each page moves on to QA and PDF rendering as soon as its image is ready
+    try:
+        with profiling.stage("build"):
+            results = build_book(args.char_code, page_paths, costs, args.quality, budget,
+                                 args.workers, print_profile, typeset_enabled())
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
-            if success:
-                successes.append(page_path)
-            else:
-                failures.append((page_path, message))
+    failures = [result for result in results if not result.ok]
+    generate_failures = [result for result in failures if result.failed_stage == "generate"]
 
     # Print summary
     print("=" * 80)
     print(f"\nImage Generation Summary:")
     print(f"  Total pages:    {total}")
-    print(f"  Successful:     {len(successes)}")
-    print(f"  Failed:         {len(failures)}")
+    print(f"  Up to date:     {total - len(costs)}")
+    print(f"  Successful:     {len(costs) - len(generate_failures)}")
+    print(f"  Failed:         {len(generate_failures)}")
+    print(f"  Estimated cost: ${budget.spent:.2f}")
 
     if failures:
-        print(f"\nFailed pages:")
-        for page_path, message in failures:
-            print(f"  - {page_path.name}: {message}")
+        print(f"\nFailed pages (no PDF written):")
+        for result in failures:
+            label = result.item.get('page_id') or Path(result.item['image']).name
+            print(f"  - {label} ({result.failed_stage}): {result.error}")
+        if budget.exhausted:
+            print(f"\nBudget of ${budget.limit:.2f} reached; re-run with --skip-current to finish the book")
         sys.exit(1)
-    else:
-        print(f"\n✓ All images generated successfully!")
-
-        # Create PDF
-        create_pdf(args.char_code, page_filenames)
-        sys.exit(0)
+    print(f"\n✓ All images generated successfully!")
+    sys.exit(0)
 
 
 if __name__ == "__main__":
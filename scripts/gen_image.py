@@ -3,7 +3,7 @@
 Generate images for storybook pages using various AI models.
 
 Usage:
-    uv run scripts/gen_image.py <model-backend> <page-path> [--add-guides] [--raw]
+    uv run scripts/gen_image.py <model-backend>[,<model-backend>...] <page-path> [--add-guides] [--raw]
 
 Model Backends:
     openai      - OpenAI gpt-image-1 (generates at 1536x1024)
@@ -12,74 +12,105 @@ Model Backends:
                   Falls back to generation if no reference images found
     prompt      - Display prompt without generating image (testing)
 
-    (Deprecated backends: replicate, ideogram)
+    (Deprecated backends: replicate, ideogram; refused unless --allow-deprecated)
+
+    Backends are plugins registered in scripts/backends.py (or dropped in as
+    scripts/backend_<name>.py); `python3 scripts/backends.py` lists them with
+    their capabilities. Several backends separated by commas run concurrently
+    on the same prompt, each saving out-images/<page-id>-<backend>.jpg, and a
+    side-by-side comparison is written to out-images/compare/<page-id>.jpg.
 
 Options:
     --add-guides    Add 5 black guide lines for photobook printing alignment
                     (2 horizontal: y=36, y=2370; 3 vertical: x=36, x=1789, x=3543)
     --raw           Output raw image without upscaling or bleed (1536x1024 direct from API)
+    --quality Q     Quality tier: low, medium or high (default: high; backends
+                    without tiers use their own)
+    --allow-deprecated
+                    Run deprecated backends (replicate, ideogram) anyway
+    --separate-references
+                    Send every reference image on its own to backends that
+                    otherwise get one composited, labelled sheet per
+                    character and one for the style images (openai); the
+                    other backends always get the separate images
 
 Reference Images:
     The script automatically includes reference images based on the page ID:
     - style-*.jpg: Always included for style
     - {char}-*.jpg: Included when character appears in the scene
       (e.g., cu-1.jpg for Cullan, em-1.jpg for Emer, ha-1.jpg for Hansel)
+    Each group is sent as one labelled sheet (scripts/reference_sheets.py,
+    cached in .katha-cache/ref-sheets/), so the image count stays at one
+    plus the number of characters on the page.
+    Characters and reference images are discovered from characters/*.yaml
+    and ref-images/ by scripts/registry.py, so new characters need no code
+    changes.
+
+Story Text:
+    By default the model paints the page's text into the image. With
+    `typeset_text: true` in book.yaml it draws text-free artwork instead,
+    saved as out-images/<page-id>-<backend>-art.jpg, and scripts/typeset.py
+    sets the text locally (on the left page, or the right with
+    `text_side: right` in the page). Text edits then only need
+    `python3 scripts/typeset.py <character-code>`, not a new image.
 
 Examples:
     uv run scripts/gen_image.py openai pages/cu-01.yaml
     uv run scripts/gen_image.py openai pages/cu-01.yaml --raw
     uv run scripts/gen_image.py openai pages/cu-ha-02.yaml --add-guides
     uv run scripts/gen_image.py prompt pages/cu-ha-02.yaml
+    uv run scripts/gen_image.py openai,ideogram pages/cu-01.yaml --allow-deprecated
 """
 
-import os
 import sys
 import argparse
+import asyncio
+import time
 import yaml
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
+import artifacts
+import ledger
+import profiling
+import prompts
+import typeset
+from backends import Backend, GenerationRequest, all_backends, get_backend, run_blocking
+from singleflight import single_flight
+from reference_sheets import build_sheet, sheet_path
+from registry import get_registry
+from schemas import validate_page
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Model backend configurations
-BACKENDS = {
-    "openai": {
-        "name": "OpenAI gpt-image-1",
-        "env_vars": ["OPENAI_API_KEY"],
-        "deprecated": False,
-    },
-    "replicate": {
-        "name": "Replicate IPAdapter Style SDXL (DEPRECATED)",
-        "env_vars": ["REPLICATE_API_TOKEN"],
-        "deprecated": True,
-    },
-    "ideogram": {
-        "name": "Ideogram v3 (DEPRECATED)",
-        "env_vars": ["IDEOGRAM_API_KEY", "IDEOGRAM_API_URL"],
-        "deprecated": True,
-    },
-    "prompt": {
-        "name": "Prompt Only (Testing)",
-        "env_vars": [],
-        "deprecated": False,
-    },
-}
-
 
 def print_help():
     """Print help message."""
     print(__doc__)
     print("\nAvailable Model Backends:")
-    for backend, config in BACKENDS.items():
-        print(f"  {backend:12} - {config['name']}")
+    for backend in all_backends():
+        print(f"  {backend.name:12} - {backend.description}")
     print("\nRequired Environment Variables:")
-    for backend, config in BACKENDS.items():
-        print(f"  {backend:12} - {', '.join(config['env_vars'])}")
+    for backend in all_backends():
+        print(f"  {backend.name:12} - {', '.join(backend.env_vars)}")
     print("\nNote: Copy .env.example to .env and fill in your API keys")
 
 
+def parse_backends(value: str) -> List[Backend]:
+    """Parse a comma-separated list of backend names (e.g. openai,ideogram)."""
+    backends = []
+    for name in value.split(","):
+        backend = get_backend(name.strip())
+        if backend is None:
+            names = ", ".join(b.name for b in all_backends())
+            raise argparse.ArgumentTypeError(f"unknown backend '{name}' (choose from {names})")
+        if backend not in backends:
+            backends.append(backend)
+    return backends
+
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -90,13 +121,15 @@ Examples:
     uv run scripts/gen_image.py openai pages/cu-01.yaml
     uv run scripts/gen_image.py openai pages/cu-ha-02.yaml --add-guides
     uv run scripts/gen_image.py prompt pages/cu-ha-02.yaml
+    uv run scripts/gen_image.py openai,ideogram pages/cu-01.yaml
         """
     )
 
     parser.add_argument(
         "backend",
-        choices=BACKENDS.keys(),
-        help="Model backend to use for generation"
+        type=parse_backends,
+        help="Model backend to use, or several separated by commas to compare them "
+             f"({', '.join(b.name for b in all_backends())})"
     )
 
     parser.add_argument(
@@ -117,68 +150,89 @@ Examples:
         help="Output raw image without upscaling or bleed (1536x1024 direct from API)"
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--quality",
+        choices=["low", "medium", "high"],
+        default="high",
+        help="OpenAI quality tier (default: high)"
+    )
+
+    parser.add_argument(
+        "--separate-references",
+        action="store_true",
+        help="Send each reference image on its own, even to backends that take composited sheets (openai)"
+    )
+
+    parser.add_argument(
+        "--allow-deprecated",
+        action="store_true",
+        help="Run deprecated backends (replicate, ideogram), which are not maintained"
+    )
 
+    profiling.add_arguments(parser)
 
-def check_api_keys(backend: str):
-    """Check if required API keys are present."""
-    # Skip check for prompt backend
-    if backend == "prompt":
-        return
+    return parser.parse_args()
 
-    missing_keys = []
-    required_vars = BACKENDS[backend]["env_vars"]
 
-    for var in required_vars:
-        if not os.getenv(var):
-            missing_keys.append(var)
+def check_api_keys(backend: Backend):
+    """Check if required API keys are present."""
+    missing_keys = backend.missing_env_vars()
 
     if missing_keys:
-        print(f"Error: Missing required environment variables for {backend}:")
+        print(f"Error: Missing required environment variables for {backend.name}:")
         for key in missing_keys:
             print(f"  - {key}")
         print("\nPlease set these in your .env file (see .env.example)")
         sys.exit(1)
 
 
-def get_reference_images(page_id: str) -> list:
+def get_reference_images(page_id: str, sheets: bool = True, build: bool = True) -> list:
     """
     Get reference images for a page based on its ID.
     Returns a list of dicts with 'path' and 'description'.
+
+    By default the style images and each character's images are composited
+    into one labelled sheet per group (see scripts/reference_sheets.py), so a
+    request carries one image per character however many files they have.
+    Only backends with reference_sheets are sent sheets; with sheets=False the
+    individual images are returned. With build=False the sheets' cache paths are returned without composing
+    missing ones, for planning and staleness checks.
     """
-    ref_dir = Path("ref-images")
-    if not ref_dir.exists():
+    if not Path("ref-images").exists():
         return []
 
-    # Character ID to name mapping
-    char_names = {
-        "cu": "Cullan",
-        "em": "Emer",
-        "ha": "Hansel",
-    }
+    registry = get_registry()
+    if sheets:
+        sheet = build_sheet if build else sheet_path
+        references = []
+        if registry.style_images():
+            references.append({
+                "path": sheet("Style", registry.style_images()),
+                "description": "a sheet of style reference images",
+            })
+        for char_id in registry.resolve(page_id):
+            images = registry.reference_images(char_id)
+            if images:
+                char_name = registry.name(char_id)
+                references.append({
+                    "path": sheet(char_name, images),
+                    "description": f"a labelled reference sheet for {char_name}",
+                })
+        return references
 
     references = []
 
     # Always include style reference images
-    style_images = sorted(ref_dir.glob("style-*.jpg"))
-    for img in style_images:
+    for img in registry.style_images():
         references.append(
             {"path": img, "description": "a style reference image"}
         )
 
-    # Parse character IDs from page ID
-    # Examples: cu-01 -> [cu], cu-ha-02 -> [cu, ha], em-06 -> [em]
-    parts = page_id.split("-")
-    char_ids = []
-    for part in parts:
-        if len(part) == 2 and part.isalpha() and part in char_names:
-            char_ids.append(part)
-
     # Include character reference images
-    for char_id in char_ids:
-        char_images = sorted(ref_dir.glob(f"{char_id}-*.jpg"))
-        char_name = char_names.get(char_id, char_id.upper())
-        for img in char_images:
+    # Examples: cu-01 -> [cu], cu-ha-02 -> [cu, ha], em-06 -> [em]
+    for char_id in registry.resolve(page_id):
+        char_name = registry.name(char_id)
+        for img in registry.reference_images(char_id):
             references.append(
                 {"path": img, "description": f"a reference image for {char_name}"}
             )
@@ -209,52 +263,39 @@ def load_visual_style() -> str:
     return ""
 
 
+def typeset_enabled() -> bool:
+    """Return True if book.yaml asks for text-free art with locally typeset text."""
+    book_path = Path("book.yaml")
+    if not book_path.exists():
+        return False
+    try:
+        with open(book_path, "r") as f:
+            return bool((yaml.safe_load(f) or {}).get("typeset_text", False))
+    except Exception:
+        return False
+
+
 def load_character_descriptions(page_id: str) -> dict:
     """
     Load visual descriptions for characters appearing in this page.
     Returns dict mapping character names to their visual descriptions.
     """
-    char_dir = Path("characters")
-    if not char_dir.exists():
+    if not Path("characters").exists():
         print("Warning: characters/ directory not found")
         return {}
 
-    # Character ID to filename mapping
-    char_files = {
-        "cu": "cu-cullan.yaml",
-        "em": "em-emer.yaml",
-        "ha": "ha-hansel.yaml",
-    }
-
-    # Parse character IDs from page ID
-    parts = page_id.split("-")
-    char_ids = []
-    for part in parts:
-        if len(part) == 2 and part.isalpha() and part in char_files:
-            char_ids.append(part)
-
+    registry = get_registry()
     character_descriptions = {}
 
-    for char_id in char_ids:
-        char_file = char_dir / char_files[char_id]
-        if not char_file.exists():
-            print(f"Warning: Character file not found: {char_file}")
-            continue
-
-        try:
-            with open(char_file, "r") as f:
-                char_data = yaml.safe_load(f)
-        except Exception as e:
-            print(f"Warning: Failed to load {char_file}: {e}")
-            continue
-
-        char_name = char_data.get("attributes", {}).get("name", char_id.upper())
-        visual_desc = char_data.get("attributes", {}).get("visual_description", [])
+    for char_id in registry.resolve(page_id):
+        char = registry.get(char_id)
+        char_name = char["name"]
+        visual_desc = char["visual_description"]
 
         if visual_desc:
             character_descriptions[char_name] = visual_desc
         else:
-            print(f"Warning: No 'visual_description' found for {char_name} in {char_file}")
+            print(f"Warning: No 'visual_description' found for {char_name} in {char['file']}")
 
     return character_descriptions
 
@@ -274,368 +315,300 @@ def load_page_data(page_path: str) -> dict:
         print(f"Error: Failed to load page file: {e}")
         sys.exit(1)
 
-    visual_prompt = page_data.get("visual", "")
-    if not visual_prompt:
-        print(f"Error: No 'visual' field found in {page_path}")
+    # Report every schema violation (missing 'visual', wrong id, ...) at once
+    violations = validate_page(page_data, page_path)
+    if violations:
+        print(f"Error: {page_path} does not match templates/page-example.yaml:")
+        for violation in violations:
+            print(f"  - {violation}")
         sys.exit(1)
 
     return page_data
 
 
 def build_full_prompt(
-    page_data: dict, visual_style: str, references: list, character_descriptions: dict
+    page_data: dict, visual_style: str, references: list, character_descriptions: dict,
+    typeset_text: bool = False, max_chars: Optional[int] = None
 ) -> str:
-    """Build the complete prompt with visual style and visual content."""
-    visual = page_data.get("visual", "")
-    text = page_data.get("text", "")
-
-    prompt_parts = [
-        "Create a beautiful illustration for a children's storybook page.",
-        "Output a single wide image for a two-page spread.",
-        "Do not multiple images or panels, just one cohesive scene.",
-    ]
-
-    # Add text instructions at the top if text is present
-    if text:
-        prompt_parts.append("")
-        prompt_parts.append("IMPORTANT: You MUST include story text as readable typography in the image.")
-        prompt_parts.append("The text should be clearly legible, using 16pt font size.")
-        prompt_parts.append("CRITICAL: Do NOT place any text across the 50% vertical centerline of the image.")
-        prompt_parts.append("The center is where the two-page spread folds together - keep text away from this area.")
-        prompt_parts.append("Place text either on the left side or right side, but never spanning across the middle.")
-        prompt_parts.append("Integrate the text into the illustration using a font style that matches the storybook aesthetic.")
-        prompt_parts.append("The exact text to include will be provided at the end of this prompt.")
-
-    # Add reference images section
-    if references:
-        prompt_parts.append("\n--- REFERENCE IMAGES ---")
-        for i, ref in enumerate(references, start=1):
-            prompt_parts.append(f"Image {i} is {ref['description']}.")
-
-    # Add visual style
-    if visual_style:
-        prompt_parts.append("\n--- VISUAL STYLE ---")
-        prompt_parts.append(visual_style)
-
-    # Add character visual descriptions
-    if character_descriptions:
-        prompt_parts.append("\n--- CHARACTER VISUAL DESCRIPTIONS ---")
-        for char_name, desc_list in character_descriptions.items():
-            prompt_parts.append(f"\n{char_name}:")
-            for item in desc_list:
-                prompt_parts.append(f"- {item}")
-
-    # Add image content
-    prompt_parts.append("\n--- SCENE TO ILLUSTRATE ---")
-    prompt_parts.append(visual)
-
-    # Add actual text content at the bottom
-    if text:
-        prompt_parts.append("\n--- TEXT TO INCLUDE IN IMAGE ---")
-        prompt_parts.append(text.strip())
-
-    return "\n".join(prompt_parts)
-
-
-def generate_with_openai(prompt: str, page_id: str, references: list, add_guides: bool = False, raw: bool = False) -> str:
-    """Generate image using OpenAI gpt-image-1 with reference images."""
-    try:
-        from openai import OpenAI
-    except ImportError:
-        print("Error: openai package not installed. Run: uv pip install openai")
-        sys.exit(1)
-
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    """
+    Build the complete prompt with visual style and visual content, fitted to
+    max_chars by scripts/prompts.py.
+    With typeset_text, ask for text-free art with room for scripts/typeset.py to set the text.
+    """
+    sections = prompts.build_sections(page_data, visual_style, references, character_descriptions, typeset_text)
+    return prompts.compile_prompt(sections, max_chars).text
 
-    print(f"Generating image with OpenAI gpt-image-1...")
-    print(f"Prompt length: {len(prompt)} characters")
-    if references:
-        print(f"Using {len(references)} reference image(s)")
 
-    # Truncate prompt if too long
-    if len(prompt) > 10000:
-        print(f"Warning: Prompt truncated from {len(prompt)} to 10000 characters")
-        prompt = prompt[:10000]
+# Photobook canvas: the generated art is upscaled to the content size and
+# centred on a white border (the bleed). Other scripts crop the bleed off again.
+PHOTOBOOK_CONTENT_SIZE = (3507, 2334)
+BLEED = 36
+PHOTOBOOK_SIZE = (PHOTOBOOK_CONTENT_SIZE[0] + 2 * BLEED, PHOTOBOOK_CONTENT_SIZE[1] + 2 * BLEED)
 
-    try:
-        # If we have reference images, use images.edit()
-        # Otherwise fall back to images.generate()
-        if references:
-            # Open reference image files (max 10)
-            image_files = []
-            try:
-                for ref in references[:10]:  # Limit to 10 images
-                    image_files.append(open(ref['path'], 'rb'))
-
-                response = client.images.edit(
-                    model="gpt-image-1",
-                    image=image_files,
-                    prompt=prompt,
-                    size="1536x1024",  # Landscape 3:2 (closest to 2:1 available)
-                    quality="high",
-                    n=1,
-                )
-            finally:
-                # Close all opened files
-                for f in image_files:
-                    f.close()
-        else:
-            # No reference images, use regular generation
-            response = client.images.generate(
-                model="gpt-image-1",
-                prompt=prompt,
-                size="1536x1024",  # Landscape 3:2 (closest to 2:1 available)
-                quality="high",
-                n=1,
-            )
 
-        # Handle both URL and base64 responses
-        import base64
-        import io
-        from PIL import Image, ImageDraw
-
-        # Check if response has URL or base64 data
-        if hasattr(response.data[0], 'url') and response.data[0].url:
-            # Download from URL
-            import requests
-            image_data = requests.get(response.data[0].url).content
-        elif hasattr(response.data[0], 'b64_json') and response.data[0].b64_json:
-            # Decode base64 data
-            image_data = base64.b64decode(response.data[0].b64_json)
-        else:
-            print(f"Error: Unexpected response format from OpenAI API")
-            print(f"Response: {response}")
-            sys.exit(1)
+@profiling.threaded
+def finish_image(image_data: bytes, page_id: str, backend_name: str, add_guides: bool = False, raw: bool = False,
+                 metadata: Optional[dict] = None, typeset_page: Optional[dict] = None) -> str:
+    """
+    Post-process an image returned by a backend and save it to out-images/.
+    With typeset_page (the page's data), the image is saved as text-free
+    artwork and the page's text is typeset onto it locally.
+    Returns the output path.
+    """
+    import io
+    from PIL import Image, ImageDraw
 
-        # Load image from bytes
+    # Load image from bytes
+    with profiling.stage("decode"):
         img = Image.open(io.BytesIO(image_data))
 
         # Convert to RGB if needed (for JPG format)
         if img.mode != 'RGB':
             img = img.convert('RGB')
 
-        # Save to output directory
-        output_dir = Path("out-images")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        output_path = output_dir / f"{page_id}-openai.jpg"
-
-        if raw:
-            # Raw mode: save directly without any processing
-            print(f"Saving raw image ({img.size[0]}x{img.size[1]})...")
-            img.save(output_path, "JPEG", quality=95)
-        else:
-            # Photobook mode: upscale and add to canvas with optional guides
-            print("Processing image for photobook format...")
-
-            # Inner content dimensions (the actual generated image area)
-            CONTENT_WIDTH = 3507
-            CONTENT_HEIGHT = 2334
-
-            # Full output dimensions with bleed area
-            FULL_WIDTH = 3579
-            FULL_HEIGHT = 2406
-
-            # Upscale to content size using Lanczos resampling for quality
-            print(f"Upscaling from {img.size[0]}x{img.size[1]} to {CONTENT_WIDTH}x{CONTENT_HEIGHT}...")
-            img = img.resize((CONTENT_WIDTH, CONTENT_HEIGHT), Image.Resampling.LANCZOS)
-
-            # Create larger canvas with white background
-            print(f"Creating full canvas {FULL_WIDTH}x{FULL_HEIGHT}...")
-            canvas = Image.new('RGB', (FULL_WIDTH, FULL_HEIGHT), (255, 255, 255))
-
-            # Calculate centering offset (should be 36, 36)
-            offset_x = (FULL_WIDTH - CONTENT_WIDTH) // 2
-            offset_y = (FULL_HEIGHT - CONTENT_HEIGHT) // 2
+    # Save to output directory. Images are written atomically as a new
+    # version in the artifact store; the canonical name points at it.
+    output_dir = Path("out-images")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"{page_id}-{backend_name}.jpg"
+    final_path = output_path
+    if typeset_page is not None:
+        output_path = typeset.art_path(page_id, backend_name)
+    metadata = dict(metadata or {}, page_id=page_id, backend=backend_name, raw=raw, guides=add_guides)
+
+    if raw:
+        # Raw mode: save directly without any processing
+        print(f"[{backend_name}] Saving raw image ({img.size[0]}x{img.size[1]})...")
+        with profiling.stage("jpeg encode + save"):
+            artifacts.save_image(img, output_path, metadata, quality=95)
+        return _typeset(page_id, backend_name, typeset_page, final_path)
+
+    # Photobook mode: upscale and add to canvas with optional guides
+    print(f"[{backend_name}] Processing image for photobook format...")
+
+    # Inner content dimensions (the actual generated image area)
+    CONTENT_WIDTH, CONTENT_HEIGHT = PHOTOBOOK_CONTENT_SIZE
+
+    # Full output dimensions with bleed area
+    FULL_WIDTH, FULL_HEIGHT = PHOTOBOOK_SIZE
+
+    # Upscale to content size using Lanczos resampling for quality
+    print(f"[{backend_name}] Upscaling from {img.size[0]}x{img.size[1]} to {CONTENT_WIDTH}x{CONTENT_HEIGHT}...")
+    with profiling.stage("lanczos resize"):
+        img = img.resize((CONTENT_WIDTH, CONTENT_HEIGHT), Image.Resampling.LANCZOS)
+
+    # Create larger canvas with white background
+    canvas = Image.new('RGB', (FULL_WIDTH, FULL_HEIGHT), (255, 255, 255))
+
+    # Calculate centering offset (should be 36, 36)
+    offset_x = (FULL_WIDTH - CONTENT_WIDTH) // 2
+    offset_y = (FULL_HEIGHT - CONTENT_HEIGHT) // 2
+
+    # Paste the upscaled image centered on the canvas
+    canvas.paste(img, (offset_x, offset_y))
+
+    # Optionally add guide lines on the full canvas
+    if add_guides:
+        print(f"[{backend_name}] Adding photobook guide lines...")
+        draw = ImageDraw.Draw(canvas)
+
+        # Horizontal guide lines (spanning full width)
+        draw.line([(0, 36), (FULL_WIDTH, 36)], fill=(0, 0, 0), width=1)  # Top margin
+        draw.line([(0, 2370), (FULL_WIDTH, 2370)], fill=(0, 0, 0), width=1)  # Bottom margin
+
+        # Vertical guide lines (spanning full height)
+        draw.line([(36, 0), (36, FULL_HEIGHT)], fill=(0, 0, 0), width=1)  # Left margin
+        draw.line([(3543, 0), (3543, FULL_HEIGHT)], fill=(0, 0, 0), width=1)  # Right margin
+        draw.line([(1789, 0), (1789, FULL_HEIGHT)], fill=(0, 0, 0), width=1)  # Center gutter/spine
+
+    print(f"[{backend_name}] Saving photobook-ready image ({FULL_WIDTH}x{FULL_HEIGHT})...")
+    with profiling.stage("jpeg encode + save"):
+        artifacts.save_image(canvas, output_path, metadata, quality=95)
+    return _typeset(page_id, backend_name, typeset_page, final_path)
+
+
+def _typeset(page_id: str, backend_name: str, typeset_page: Optional[dict], final_path: Path) -> str:
+    """Typeset the page's text onto freshly saved artwork, if requested. Returns the output path."""
+    if typeset_page is not None:
+        print(f"[{backend_name}] Typesetting text...")
+        with profiling.stage("typeset"):
+            typeset.typeset_page(page_id, typeset_page, backend_name, force=True)
+    return str(final_path)
+
+
+async def run_backend(backend: Backend, page_id: str, sections: list, references: list, args,
+                      started_at: float, prompt_ms: float, typeset_page: Optional[dict] = None) -> Optional[str]:
+    """
+    Generate, post-process and record one page with one backend.
+    sections are the prompt's sections from prompts.build_sections().
+    typeset_page is the page's data when its text is typeset locally.
+    Returns the output path ("" for backends that produce no image), or None on failure.
+    """
+    # Fit the request to what the backend can do
+    compiled = prompts.compile_prompt(sections, backend.max_prompt_chars)
+    prompt = compiled.text
+    if compiled.trimmed:
+        print(f"[{backend.name}] Warning: Prompt trimmed to fit {backend.max_prompt_chars} characters: "
+              f"{', '.join(compiled.trimmed)}")
+    if backend.supports_references and len(references) > backend.max_references:
+        dropped = ", ".join(Path(ref['path']).name for ref in references[backend.max_references:])
+        print(f"[{backend.name}] Warning: Only {backend.max_references} reference image(s) allowed; dropping {dropped}")
+    references = references[:backend.max_references] if backend.supports_references else []
+    request = GenerationRequest(page_id, prompt, references, backend.sizes[0], backend.quality_for(args.quality))
+
+    if backend.produces_image:
+        print(f"[{backend.name}] Generating image with {backend.description}...")
+        print(f"[{backend.name}] Prompt: {compiled.summary()}")
+        if references:
+            print(f"[{backend.name}] Using {len(references)} reference image(s)")
+
+    if not backend.produces_image:
+        return await _generate(backend, request, args, started_at, prompt_ms, typeset_page, compiled.sections)
+
+    # One process at a time generates an output; the others wait and reuse it
+    output_path = Path("out-images") / f"{page_id}-{backend.name}.jpg"
+    async with single_flight(output_path.name, log=lambda message: print(f"[{backend.name}] {message}")) as lock:
+        if lock.waited_since is not None and inflight_result(output_path, backend, request, args, lock.waited_since):
+            print(f"[{backend.name}] Reusing {output_path}, generated from the same request while we waited")
+            return str(output_path)
+        return await _generate(backend, request, args, started_at, prompt_ms, typeset_page, compiled.sections)
+
+
+def inflight_result(output_path: Path, backend: Backend, request: GenerationRequest, args, since: float) -> bool:
+    """Return True if output_path was made from this exact request after `since`."""
+    conn = ledger.connect()
+    row = ledger.latest_success(conn, output_path.as_posix())
+    conn.close()
+    if row is None or row['started_at'] + (row['total_ms'] or 0) / 1000 < since:
+        return False
+    if not ledger.same_request(row, request.prompt, request.references, backend.model, request.size, request.quality):
+        return False
+    metadata = artifacts.selected_metadata(output_path)
+    return metadata.get('raw') == args.raw and metadata.get('guides') == args.add_guides
+
+
+async def _generate(backend: Backend, request: GenerationRequest, args, started_at: float, prompt_ms: float,
+                    typeset_page: Optional[dict], prompt_sections: Optional[list] = None) -> Optional[str]:
+    """Call the backend, post-process and record the result. Returns the output path, or None on failure."""
+    page_id, prompt, references = request.page_id, request.prompt, request.references
+    timings = {"prompt_ms": prompt_ms}
+    record = dict(page_id=page_id, backend=backend.name, prompt=prompt, references=references,
+                  started_at=started_at, timings=timings,
+                  model=backend.model, size=request.size, quality=request.quality,
+                  prompt_sections=prompt_sections)
+    try:
+        async with backend.limiter():
+            api_start = time.perf_counter()
+            with profiling.stage(f"api ({backend.name})"):
+                image_data = await backend.generate(request)
+            timings["api_ms"] = (time.perf_counter() - api_start) * 1000
+        if not backend.produces_image:
+            return ""
+
+        postprocess_start = time.perf_counter()
+        output_path = await run_blocking(
+            finish_image, image_data, page_id, backend.name, args.add_guides, args.raw,
+            {"quality": request.quality}, typeset_page,
+        )
+        timings["postprocess_ms"] = (time.perf_counter() - postprocess_start) * 1000
+    except Exception as e:
+        print(f"Error generating image with {backend.description}: {e}")
+        # Every request goes in the ledger, including failed ones
+        ledger.record(outcome="error", error=str(e), **record)
+        return None
 
-            # Paste the upscaled image centered on the canvas
-            canvas.paste(img, (offset_x, offset_y))
+    ledger.record(outcome="ok", output_path=output_path, **record)
+    return output_path
 
-            # Optionally add guide lines on the full canvas
-            if add_guides:
-                print("Adding photobook guide lines...")
-                draw = ImageDraw.Draw(canvas)
 
-                # Horizontal guide lines (spanning full width)
-                draw.line([(0, 36), (FULL_WIDTH, 36)], fill=(0, 0, 0), width=1)  # Top margin
-                draw.line([(0, 2370), (FULL_WIDTH, 2370)], fill=(0, 0, 0), width=1)  # Bottom margin
+def save_comparison(page_id: str, outputs: dict) -> Path:
+    """Write the backends' images side by side, labelled, to out-images/compare/."""
+    from PIL import Image, ImageDraw
 
-                # Vertical guide lines (spanning full height)
-                draw.line([(36, 0), (36, FULL_HEIGHT)], fill=(0, 0, 0), width=1)  # Left margin
-                draw.line([(3543, 0), (3543, FULL_HEIGHT)], fill=(0, 0, 0), width=1)  # Right margin
-                draw.line([(1789, 0), (1789, FULL_HEIGHT)], fill=(0, 0, 0), width=1)  # Center gutter/spine
+    tile_w, tile_h, label_h = 1200, 800, 40
+    sheet = Image.new("RGB", (tile_w * len(outputs), tile_h + label_h), (255, 255, 255))
+    draw = ImageDraw.Draw(sheet)
+    for i, (name, path) in enumerate(outputs.items()):
+        with Image.open(path) as img:
+            img.draft("RGB", (tile_w, tile_h))
+            img = img.convert("RGB")
+            img.thumbnail((tile_w, tile_h))
+            sheet.paste(img, (i * tile_w + (tile_w - img.width) // 2, label_h))
+        draw.text((i * tile_w + 10, 10), name, fill=(0, 0, 0))
 
-            # Use canvas for saving
-            print(f"Saving photobook-ready image ({FULL_WIDTH}x{FULL_HEIGHT})...")
-            canvas.save(output_path, "JPEG", quality=95)
+    compare_path = Path("out-images") / "compare" / f"{page_id}.jpg"
+    compare_path.parent.mkdir(parents=True, exist_ok=True)
+    sheet.save(compare_path, "JPEG", quality=90)
+    return compare_path
 
-        return str(output_path)
 
-    except Exception as e:
-        print(f"Error generating image with OpenAI: {e}")
-        sys.exit(1)
+def uses_reference_sheets(backend: Backend, args) -> bool:
+    """Whether a backend is sent composited reference sheets rather than the individual images."""
+    return backend.reference_sheets and not args.separate_references
 
 
-# DEPRECATED: Replicate backend - commented out for now
-# def generate_with_replicate(prompt: str, page_id: str) -> str:
-#     """Generate image using Replicate IPAdapter Style SDXL."""
-#     try:
-#         import replicate
-#     except ImportError:
-#         print("Error: replicate package not installed. Run: uv pip install replicate")
-#         sys.exit(1)
-#
-#     print(f"Generating image with Replicate IPAdapter Style SDXL...")
-#     print(f"Prompt length: {len(prompt)} characters")
-#
-#     try:
-#         # Use hardcoded style reference image
-#         style_image_path = Path("out-images/cu-01-openai.jpg")
-#         print(f"Using style reference: {style_image_path}")
-#
-#         # Open and use the style image (will fail if doesn't exist)
-#         with open(style_image_path, "rb") as f:
-#             output = replicate.run(
-#                 "lucataco/ipadapter-style-sdxl:9a89134b4c84c264c817645f1703db1e73f66a43c3f0bf2697ec2edce95f7d39",
-#                 input={
-#                     "prompt": prompt,
-#                     "style_image": f,
-#                     "width": 1536,
-#                     "height": 768,
-#                     "num_outputs": 1,
-#                     "guidance_scale": 7.5,
-#                     "num_inference_steps": 50,
-#                     "style_strength": 0.5,  # How much to apply the style (0-1)
-#                 },
-#             )
-#
-#         # Download the image
-#         import requests
-#
-#         image_url = output[0]
-#         image_data = requests.get(image_url).content
-#
-#         # Save to out-images directory
-#         output_dir = Path("out-images")
-#         output_dir.mkdir(parents=True, exist_ok=True)
-#
-#         output_path = output_dir / f"{page_id}-replicate.jpg"
-#
-#         with open(output_path, "wb") as f:
-#             f.write(image_data)
-#
-#         return str(output_path)
-#
-#     except Exception as e:
-#         print(f"Error generating image with Replicate: {e}")
-#         sys.exit(1)
-
-
-# DEPRECATED: Ideogram backend - commented out for now
-# def generate_with_ideogram(prompt: str, page_id: str) -> str:
-#     """Generate image using Ideogram v3."""
-#     import requests
-#
-#     api_key = os.getenv("IDEOGRAM_API_KEY")
-#     api_url = os.getenv(
-#         "IDEOGRAM_API_URL", "https://api.ideogram.ai/v1/ideogram-v3/generate"
-#     )
-#
-#     print(f"Generating image with Ideogram v3...")
-#     print(f"Prompt length: {len(prompt)} characters")
-#
-#     headers = {
-#         "Api-Key": api_key,
-#         "Content-Type": "application/json",
-#     }
-#
-#     # Use flat JSON structure (not nested under image_request)
-#     payload = {
-#         "prompt": prompt,
-#         "aspect_ratio": "3x1",  # Wide aspect ratio
-#         "magic_prompt": "OFF",
-#     }
-#
-#     try:
-#         response = requests.post(api_url, headers=headers, json=payload)
-#         response.raise_for_status()
-#
-#         result = response.json()
-#
-#         # Extract image URL from response
-#         if "data" in result and len(result["data"]) > 0:
-#             image_url = result["data"][0].get("url")
-#         else:
-#             print(f"Error: Unexpected API response structure: {result}")
-#             sys.exit(1)
-#
-#         # Download the image
-#         image_data = requests.get(image_url).content
-#
-#         # Save to out-images directory
-#         output_dir = Path("out-images")
-#         output_dir.mkdir(parents=True, exist_ok=True)
-#
-#         output_path = output_dir / f"{page_id}-ideogram.jpg"
-#
-#         with open(output_path, "wb") as f:
-#             f.write(image_data)
-#
-#         return str(output_path)
-#
-#     except requests.exceptions.RequestException as e:
-#         print(f"Error generating image with Ideogram: {e}")
-#         if hasattr(e, "response") and e.response is not None:
-#             print(f"Response: {e.response.text}")
-#         sys.exit(1)
-
-
-def generate_prompt(prompt: str, page_id: str) -> str:
-    """Display the prompt without generating an image."""
-    print(f"\n{'='*80}")
-    print("GENERATED PROMPT")
-    print(f"{'='*80}\n")
-    print(prompt)
-    print(f"\n{'='*80}")
-    print(f"Prompt length: {len(prompt)} characters")
-    print(f"Page ID: {page_id}")
-    print(f"{'='*80}\n")
-    return "N/A (prompt mode)"
+async def run_backends(backends: List[Backend], page_id: str, sections: dict, references: dict, args,
+                       started_at: float, prompt_ms: float, typeset_page: Optional[dict] = None) -> dict:
+    """
+    Run every backend on the page concurrently. Returns {backend name: output path or None}.
+    sections and references are keyed by uses_reference_sheets(backend, args).
+    """
+    results = await asyncio.gather(*(
+        run_backend(backend, page_id, sections[uses_reference_sheets(backend, args)],
+                    references[uses_reference_sheets(backend, args)], args, started_at, prompt_ms, typeset_page)
+        for backend in backends
+    ))
+    return {backend.name: result for backend, result in zip(backends, results)}
 
 
 def main():
     """Main entry point."""
     # Parse arguments
     args = parse_args()
-
-    backend = args.backend
+    profiling.enable("gen_image", args)
+    backends = args.backend
     page_path = args.page_path
-    add_guides = args.add_guides
-    raw = args.raw
 
     # Extract page ID from path for output filename (e.g., "pages/cu-ha-02.yaml" -> "cu-ha-02")
     page_id = Path(page_path).stem
+    started_at = time.time()
 
     # Check API keys before doing anything
-    print(f"Checking API keys for {backend}...")
-    check_api_keys(backend)
+    for backend in backends:
+        print(f"Checking API keys for {backend.name}...")
+        check_api_keys(backend)
+        if backend.deprecated and not args.allow_deprecated:
+            print(f"Error: The {backend.name} backend is currently deprecated")
+            print("Use 'openai' or 'prompt' backend instead, or pass --allow-deprecated")
+            sys.exit(1)
+        if backend.deprecated:
+            print(f"Warning: The {backend.name} backend is deprecated and may not work")
 
-    # Get reference images for this page
+    # Get reference images for this page, as sheets and/or individual images
+    # depending on which the selected backends take
     print(f"Loading reference images for {page_id}...")
-    references = get_reference_images(page_id)
-    if references:
-        print(f"  Found {len(references)} reference image(s)")
-        for ref in references:
-            print(f"    - {ref['path'].name}: {ref['description']}")
-    else:
-        print(f"  No reference images found")
+    with profiling.stage("reference images"):
+        references = {
+            sheets: get_reference_images(page_id, sheets=sheets)
+            for sheets in {uses_reference_sheets(backend, args) for backend in backends}
+        }
+    for sheets, refs in references.items():
+        if refs:
+            print(f"  Found {len(refs)} reference {'sheet' if sheets else 'image'}(s)")
+            for ref in refs:
+                print(f"    - {ref['path'].name}: {ref['description']}")
+        else:
+            print(f"  No reference images found")
 
     # Load visual style and page data
     print(f"Loading visual style...")
-    visual_style = load_visual_style()
+    with profiling.stage("yaml: book"):
+        visual_style = load_visual_style()
 
     # Load character descriptions
     print(f"Loading character descriptions for {page_id}...")
-    character_descriptions = load_character_descriptions(page_id)
+    with profiling.stage("yaml: characters"):
+        character_descriptions = load_character_descriptions(page_id)
     if character_descriptions:
         print(f"  Found descriptions for {len(character_descriptions)} character(s)")
         for char_name in character_descriptions:
@@ -644,28 +617,37 @@ def main():
         print(f"  No character descriptions found")
 
     print(f"Loading page: {page_path}")
-    page_data = load_page_data(page_path)
-
-    # Build complete prompt
-    prompt = build_full_prompt(page_data, visual_style, references, character_descriptions)
-
-    # Generate image with selected backend
-    if backend == "openai":
-        output_path = generate_with_openai(prompt, page_id, references, add_guides, raw)
-    elif backend == "replicate":
-        print("Error: Replicate backend is currently deprecated")
-        print("Use 'openai' or 'prompt' backend instead")
+    with profiling.stage("yaml: page"):
+        page_data = load_page_data(page_path)
+
+    # Text is typeset locally instead of painted by the model if book.yaml says so
+    typeset_text = typeset_enabled()
+    if typeset_text:
+        print("Typesetting text locally (typeset_text in book.yaml)")
+
+    # Build the prompt's sections; each backend compiles them to fit its own limit
+    with profiling.stage("prompt"):
+        sections = {
+            sheets: prompts.build_sections(page_data, visual_style, refs, character_descriptions, typeset_text)
+            for sheets, refs in references.items()
+        }
+    prompt_ms = (time.time() - started_at) * 1000
+
+    # Generate with every selected backend at once
+    outputs = asyncio.run(run_backends(backends, page_id, sections, references, args, started_at, prompt_ms,
+                                       page_data if typeset_text else None))
+
+    images = {name: path for name, path in outputs.items() if path}
+    failed = [name for name, path in outputs.items() if path is None]
+    if images:
+        print(f"\n✓ Image generated successfully!" if len(images) == 1 else f"\n✓ {len(images)} images generated")
+        for name, path in images.items():
+            print(f"  Saved to: {path}")
+    if len(images) > 1:
+        print(f"  Comparison: {save_comparison(page_id, images)}")
+    if failed:
+        print(f"\n✗ Failed: {', '.join(failed)}")
         sys.exit(1)
-    elif backend == "ideogram":
-        print("Error: Ideogram backend is currently deprecated")
-        print("Use 'openai' or 'prompt' backend instead")
-        sys.exit(1)
-    elif backend == "prompt":
-        output_path = generate_prompt(prompt, page_id)
-
-    if backend != "prompt":
-        print(f"\n✓ Image generated successfully!")
-        print(f"  Saved to: {output_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Render a character's book to a vendor-ready PDF using a print profile.
+
+Print profiles in print-profiles/*.yaml declare the physical book: page trim
+size, bleed, resolution, whether spreads stay whole or are split into single
+pages at the gutter, covers and colour conversion. See
+print-profiles/offset-8x8-cmyk.yaml for every option.
+
+Spreads are rendered in parallel worker processes, each writing its pages
+to temporary JPEGs. The PDF is written as pages complete, in story order,
+and the JPEGs are embedded as-is rather than decoded again. Memory use
+therefore stays flat however long the book is. Every PDF page gets a
+MediaBox/BleedBox covering the bleed and a TrimBox at the trim line.
+
+Images made by gen_image.py carry a white 36 px border that is not artwork.
+It is cropped before the art is scaled to cover the page(s) and
+centre-cropped to fit.
+
+--box-set writes several characters' books into one PDF, with a bookmark
+per book. A spread shared by several books (e.g. cu-ha-02) is rendered once
+and stored as one image object that every book's page refers to.
+
+Usage:
+    python3 scripts/impose.py <profile> <character-code> [--output PATH] [--workers N]
+    python3 scripts/impose.py <profile> --box-set [<character-code> ...] [--output PATH]
+    python3 scripts/impose.py --list
+
+Examples:
+    python3 scripts/impose.py photobook cu
+    python3 scripts/impose.py offset-8x8-cmyk em --workers 8
+    python3 scripts/impose.py print-profiles/screen-proof.yaml ha --output proof.pdf
+    python3 scripts/impose.py photobook --box-set          # every character
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import yaml
+
+from gen_image import BLEED, PHOTOBOOK_SIZE
+from project import load_project, page_id
+
+PROFILE_DIR = Path('print-profiles')
+OUT_DIR = Path('out-images')
+
+# field -> (allowed types, default); REQUIRED fields have no default
+REQUIRED = object()
+PROFILE_FIELDS = {
+    'name': (str, None),
+    'trim_mm': (list, REQUIRED),
+    'bleed_mm': ((int, float), 0),
+    'dpi': (int, 300),
+    'layout': (str, 'spreads'),
+    'gutter_mm': ((int, float), 0),
+    'colour': (str, 'rgb'),
+    'icc_profile': (str, None),
+    'jpeg_quality': (int, 95),
+    'covers': (dict, None),
+}
+LAYOUTS = ('spreads', 'pages')
+COLOURS = ('rgb', 'cmyk', 'gray')
+
+PDF_COLOURSPACES = {'RGB': b'/DeviceRGB', 'L': b'/DeviceGray', 'CMYK': b'/DeviceCMYK'}
+
+
+def mm_to_pt(mm: float) -> float:
+    return mm / 25.4 * 72
+
+
+def mm_to_px(mm: float, dpi: int) -> int:
+    return round(mm / 25.4 * dpi)
+
+
+def check_profile(profile: dict) -> List[str]:
+    """Return every problem with a print profile."""
+    errors = []
+    for field, value in profile.items():
+        if field not in PROFILE_FIELDS:
+            errors.append(f"unknown field '{field}'")
+        elif value is not None and not isinstance(value, PROFILE_FIELDS[field][0]):
+            errors.append(f"'{field}' has the wrong type ({type(value).__name__})")
+    for field, (_, default) in PROFILE_FIELDS.items():
+        if default is REQUIRED and field not in profile:
+            errors.append(f"missing required field '{field}'")
+    if errors:
+        return errors
+
+    trim = profile['trim_mm']
+    if len(trim) != 2 or not all(isinstance(v, (int, float)) and v > 0 for v in trim):
+        errors.append("'trim_mm' must be [width, height] in millimetres")
+    if profile.get('layout', 'spreads') not in LAYOUTS:
+        errors.append(f"'layout' must be one of {', '.join(LAYOUTS)}")
+    if profile.get('colour', 'rgb') not in COLOURS:
+        errors.append(f"'colour' must be one of {', '.join(COLOURS)}")
+    if profile.get('icc_profile') and profile.get('colour') != 'cmyk':
+        errors.append("'icc_profile' is only used with colour: cmyk")
+    if profile.get('icc_profile') and not Path(profile['icc_profile']).exists():
+        errors.append(f"ICC profile not found: {profile['icc_profile']}")
+    if not errors and profile.get('gutter_mm', 0) >= trim[0] / 2:
+        errors.append("'gutter_mm' must be less than half the trim width")
+    covers = profile.get('covers') or {}
+    if covers.get('placement', 'separate') not in ('separate', 'inline'):
+        errors.append("'covers.placement' must be separate or inline")
+    return errors
+
+
+def load_profile(name: str) -> dict:
+    """Load a print profile by name (print-profiles/<name>.yaml) or path, with defaults filled in."""
+    path = Path(name)
+    if not path.exists():
+        path = PROFILE_DIR / f"{name}.yaml"
+    if not path.exists():
+        raise ValueError(f"No print profile '{name}' (looked in {PROFILE_DIR}/)")
+    with open(path, 'r') as f:
+        profile = yaml.safe_load(f) or {}
+
+    errors = check_profile(profile)
+    if errors:
+        raise ValueError(f"{path}: " + "; ".join(errors))
+
+    for field, (_, default) in PROFILE_FIELDS.items():
+        if default is not REQUIRED:
+            profile.setdefault(field, default)
+    profile['id'] = path.stem
+    profile['name'] = profile['name'] or path.stem
+    return profile
+
+
+def _load_artwork(image_path: str):
+    from PIL import Image
+
+    img = Image.open(image_path)
+    # The photobook canvas's white bleed border is not artwork
+    if img.size == PHOTOBOOK_SIZE:
+        img = img.crop((BLEED, BLEED, img.size[0] - BLEED, img.size[1] - BLEED))
+    return img.convert('RGB')
+
+
+def _convert_colour(img, profile: dict):
+    if profile['colour'] == 'gray':
+        return img.convert('L')
+    if profile['colour'] == 'cmyk':
+        if profile['icc_profile']:
+            from PIL import ImageCms
+            return ImageCms.profileToProfile(
+                img, ImageCms.createProfile('sRGB'), profile['icc_profile'], outputMode='CMYK'
+            )
+        return img.convert('CMYK')
+    return img
+
+
+def render_item(job: dict) -> List[dict]:
+    """
+    Render one spread or cover to one or two page JPEGs (runs in a worker process).
+    Returns [{'path', 'mode', 'width_px', 'height_px', 'width_mm', 'height_mm'}].
+    """
+    from PIL import Image, ImageOps
+
+    profile = job['profile']
+    dpi = profile['dpi']
+    trim_w, trim_h = profile['trim_mm']
+    bleed = profile['bleed_mm']
+    art = _load_artwork(job['image'])
+
+    page_w_mm, page_h_mm = trim_w + 2 * bleed, trim_h + 2 * bleed
+    if job['kind'] == 'cover':
+        pages = [ImageOps.fit(art, (mm_to_px(page_w_mm, dpi), mm_to_px(page_h_mm, dpi)), Image.Resampling.LANCZOS)]
+        sizes = [(page_w_mm, page_h_mm)]
+    elif profile['layout'] == 'spreads':
+        spread_w_mm = 2 * trim_w + 2 * bleed
+        pages = [ImageOps.fit(art, (mm_to_px(spread_w_mm, dpi), mm_to_px(page_h_mm, dpi)), Image.Resampling.LANCZOS)]
+        sizes = [(spread_w_mm, page_h_mm)]
+    else:
+        # Art spans both pages; each page repeats bleed + gutter past the spine
+        art_w = mm_to_px(2 * trim_w + 2 * bleed - 2 * profile['gutter_mm'], dpi)
+        page_w, page_h = mm_to_px(page_w_mm, dpi), mm_to_px(page_h_mm, dpi)
+        spread = ImageOps.fit(art, (art_w, page_h), Image.Resampling.LANCZOS)
+        pages = [spread.crop((0, 0, page_w, page_h)), spread.crop((art_w - page_w, 0, art_w, page_h))]
+        sizes = [(page_w_mm, page_h_mm)] * 2
+
+    rendered = []
+    for n, (page, (width_mm, height_mm)) in enumerate(zip(pages, sizes)):
+        page = _convert_colour(page, profile)
+        path = Path(job['tmp_dir']) / f"{job['index']:04d}-{n}.jpg"
+        page.save(path, "JPEG", quality=profile['jpeg_quality'], dpi=(dpi, dpi))
+        rendered.append({
+            'path': str(path),
+            'mode': page.mode,
+            'width_px': page.size[0],
+            'height_px': page.size[1],
+            'width_mm': width_mm,
+            'height_mm': height_mm,
+        })
+    return rendered
+
+
+class PdfWriter:
+    """Minimal PDF writer that streams JPEG pages to disk without re-encoding them."""
+
+    def __init__(self, path: Path, bleed_mm: float):
+        self.path = path
+        self.bleed_pt = mm_to_pt(bleed_mm)
+        self.tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+        self.f = open(self.tmp_path, 'wb')
+        self.offsets = {}
+        self.page_ids = []
+        # Shared image key -> (object id, JPEG bytes), so repeated pages embed their image once
+        self.images = {}
+        self.shared_bytes = 0
+        # (title, index of the first page) for the document outline
+        self.bookmarks = []
+        # 1 = catalog, 2 = page tree; both written at the end
+        self.next_id = 3
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, obj_id: int, body: bytes, stream: Optional[bytes] = None):
+        self.offsets[obj_id] = self.f.tell()
+        self.f.write(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self.f.write(b"\nstream\n" + stream + b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+    def _allocate(self, count: int) -> List[int]:
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        return ids
+
+    def _add_image(self, page: dict, image_key: Optional[str]) -> int:
+        """Write a page's JPEG as an image object, or reuse the one stored under image_key."""
+        if image_key in self.images:
+            image_id, size = self.images[image_key]
+            self.shared_bytes += size
+            return image_id
+
+        image_id = self._allocate(1)[0]
+        with open(page['path'], 'rb') as f:
+            jpeg = f.read()
+
+        # Adobe CMYK JPEGs (as Pillow writes them) store inverted values
+        decode = b" /Decode [1 0 1 0 1 0 1 0]" if page['mode'] == 'CMYK' else b""
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {page['width_px']} /Height {page['height_px']} "
+            f"/BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} /ColorSpace "
+        ).encode() + PDF_COLOURSPACES[page['mode']] + decode + b" >>", jpeg)
+        if image_key is not None:
+            self.images[image_key] = (image_id, len(jpeg))
+        return image_id
+
+    def add_page(self, page: dict, image_key: Optional[str] = None):
+        """
+        Append a rendered page: its JPEG fills the MediaBox. Pages added with
+        the same image_key share one image object (page['path'] is only read
+        the first time).
+        """
+        image_id = self._add_image(page, image_key)
+        content_id, page_id_ = self._allocate(2)
+
+        width, height = mm_to_pt(page['width_mm']), mm_to_pt(page['height_mm'])
+        content = zlib.compress(f"q {width:.3f} 0 0 {height:.3f} 0 0 cm /Im0 Do Q".encode())
+        self._write_object(content_id, f"<< /Length {len(content)} /Filter /FlateDecode >>".encode(), content)
+
+        b = self.bleed_pt
+        self._write_object(page_id_, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.3f} {height:.3f}] "
+            f"/BleedBox [0 0 {width:.3f} {height:.3f}] "
+            f"/TrimBox [{b:.3f} {b:.3f} {width - b:.3f} {height - b:.3f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self.page_ids.append(page_id_)
+
+    def add_bookmark(self, title: str):
+        """Add an outline entry pointing at the next page added."""
+        self.bookmarks.append((title, len(self.page_ids)))
+
+    def _write_outline(self) -> int:
+        outline_id = self._allocate(1)[0]
+        item_ids = self._allocate(len(self.bookmarks))
+        for n, (title, page_index) in enumerate(self.bookmarks):
+            # UTF-16 hex string, so any character name survives
+            entry = (f"<< /Title <FEFF{title.encode('utf-16-be').hex()}> /Parent {outline_id} 0 R "
+                     f"/Dest [{self.page_ids[min(page_index, len(self.page_ids) - 1)]} 0 R /Fit]")
+            if n > 0:
+                entry += f" /Prev {item_ids[n - 1]} 0 R"
+            if n < len(item_ids) - 1:
+                entry += f" /Next {item_ids[n + 1]} 0 R"
+            self._write_object(item_ids[n], (entry + " >>").encode())
+        self._write_object(outline_id, (
+            f"<< /Type /Outlines /First {item_ids[0]} 0 R /Last {item_ids[-1]} 0 R /Count {len(item_ids)} >>"
+        ).encode())
+        return outline_id
+
+    def close(self):
+        """Write the page tree, outline, catalog and cross-reference table, then move the PDF into place."""
+        kids = " ".join(f"{i} 0 R" for i in self.page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        if self.bookmarks and self.page_ids:
+            outline_id = self._write_outline()
+            self._write_object(1, f"<< /Type /Catalog /Pages 2 0 R /Outlines {outline_id} 0 R /PageMode /UseOutlines >>".encode())
+        else:
+            self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self.f.tell()
+        self.f.write(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, self.next_id):
+            self.f.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.f.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def write_pdf(jobs: List[dict], output_path: Path, profile: dict, workers: int) -> int:
+    """Render jobs in parallel and stream their pages into a PDF. Returns the page count."""
+    writer = PdfWriter(output_path, profile['bleed_mm'])
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() yields in submission order, so pages land in story order
+            for pages in executor.map(render_item, jobs):
+                for page in pages:
+                    writer.add_page(page)
+                    os.unlink(page['path'])
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return len(writer.page_ids)
+
+
+def cover_images(profile: dict, char_code: str) -> dict:
+    """Return {'front': path, 'back': path} for the cover images that exist."""
+    covers = profile['covers'] or {}
+    found = {}
+    for side in ('front', 'back'):
+        pattern = covers.get(side)
+        if not pattern:
+            continue
+        path = Path(pattern.format(code=char_code))
+        if path.exists():
+            found[side] = str(path)
+        elif covers.get('required'):
+            raise ValueError(f"{side} cover image not found: {path}")
+        else:
+            print(f"Warning: No {side} cover image ({path}), skipping it")
+    return found
+
+
+def plan_jobs(profile: dict, images: List[Path], covers: dict, tmp_dir: str) -> Tuple[List[dict], List[dict]]:
+    """
+    Return (book jobs, separate cover jobs) for render_item, each in page
+    order. Inline covers go at the start and end of the book jobs.
+    """
+    def job(index, image, kind):
+        return {'index': index, 'image': str(image), 'kind': kind, 'profile': profile, 'tmp_dir': tmp_dir}
+
+    book = [job(i, image, 'spread') for i, image in enumerate(images, start=1)]
+    front = [job(0, covers['front'], 'cover')] if 'front' in covers else []
+    back = [job(len(images) + 1, covers['back'], 'cover')] if 'back' in covers else []
+    if (profile['covers'] or {}).get('placement', 'separate') == 'inline':
+        return front + book + back, []
+    return book, front + back
+
+
+def impose(profile: dict, char_code: str, output_path: Optional[Path] = None, workers: Optional[int] = None) -> List[Path]:
+    """Render a character's book with a print profile. Returns the PDFs written."""
+    project = load_project()
+    story = project.story(char_code)
+    if not story:
+        raise ValueError(f"No story found for character '{char_code}'")
+
+    images = [OUT_DIR / f"{page_id(page)}-openai.jpg" for page in story]
+    missing = [str(path) for path in images if not path.exists()]
+    if missing:
+        raise ValueError(f"{len(missing)} missing image(s): {', '.join(missing)}")
+
+    covers = cover_images(profile, char_code)
+    output_path = output_path or OUT_DIR / f"{char_code}-{profile['id']}.pdf"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_dir = tempfile.mkdtemp(prefix='impose-')
+    try:
+        book_jobs, cover_jobs = plan_jobs(profile, images, covers, tmp_dir)
+        written = []
+        pages = write_pdf(book_jobs, output_path, profile, workers or os.cpu_count())
+        print(f"✓ {output_path}: {pages} page(s)")
+        written.append(output_path)
+
+        if cover_jobs:
+            cover_path = output_path.with_name(f"{output_path.stem}-cover.pdf")
+            pages = write_pdf(cover_jobs, cover_path, profile, workers or os.cpu_count())
+            print(f"✓ {cover_path}: {pages} page(s)")
+            written.append(cover_path)
+        return written
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def write_box_set_pdf(books: List[Tuple[str, List[dict]]], output_path: Path, profile: dict,
+                      executor_results) -> PdfWriter:
+    """
+    Write [(bookmark title, jobs)] into one PDF. executor_results yields
+    (job key, rendered pages) in first-use order; each key is rendered once
+    and its images are shared by every page that uses it.
+    """
+    writer = PdfWriter(output_path, profile['bleed_mm'])
+    rendered = {}
+    try:
+        for title, jobs in books:
+            writer.add_bookmark(title)
+            for job in jobs:
+                while job['key'] not in rendered:
+                    key, pages = next(executor_results)
+                    rendered[key] = pages
+                for n, page in enumerate(rendered[job['key']]):
+                    image_key = f"{job['key']}#{n}"
+                    first_use = image_key not in writer.images
+                    writer.add_page(page, image_key)
+                    if first_use:
+                        os.unlink(page['path'])
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return writer
+
+
+def box_set(profile: dict, char_codes: List[str], output_path: Optional[Path] = None,
+            workers: Optional[int] = None) -> List[Path]:
+    """
+    Render several characters' books into one PDF, with a bookmark per book.
+    A spread shared by several books is rendered once and its image stored
+    once. Returns the PDFs written.
+    """
+    project = load_project()
+    codes = char_codes or project.codes()
+    unknown = [code for code in codes if code not in project.characters]
+    if unknown:
+        raise ValueError(f"Unknown character code(s): {', '.join(unknown)}")
+
+    stories = {code: [OUT_DIR / f"{page_id(page)}-openai.jpg" for page in project.story(code)] for code in codes}
+    missing = sorted({str(path) for images in stories.values() for path in images if not path.exists()})
+    if missing:
+        raise ValueError(f"{len(missing)} missing image(s): {', '.join(missing)}")
+
+    output_path = output_path or OUT_DIR / f"box-set-{profile['id']}.pdf"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count()
+
+    tmp_dir = tempfile.mkdtemp(prefix='impose-')
+    try:
+        interiors, cover_sets = [], []
+        for code in codes:
+            book_jobs, cover_jobs = plan_jobs(profile, stories[code], cover_images(profile, code), tmp_dir)
+            title = f"{project.character_name(code)} ({code.upper()})"
+            interiors.append((title, book_jobs))
+            if cover_jobs:
+                cover_sets.append((title, cover_jobs))
+
+        # One render per distinct image, in the order the PDFs first need them
+        unique = {}
+        for _, jobs in interiors + cover_sets:
+            for job in jobs:
+                job['key'] = f"{job['kind']}:{job['image']}"
+                if job['key'] not in unique:
+                    unique[job['key']] = dict(job, index=len(unique))
+        keys = list(unique)
+
+        written = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = zip(keys, executor.map(render_item, unique.values()))
+            writer = write_box_set_pdf(interiors, output_path, profile, results)
+            written.append(output_path)
+            summary = [(output_path, writer)]
+            if cover_sets:
+                cover_path = output_path.with_name(f"{output_path.stem}-cover.pdf")
+                summary.append((cover_path, write_box_set_pdf(cover_sets, cover_path, profile, results)))
+                written.append(cover_path)
+
+        for path, writer in summary:
+            print(f"✓ {path}: {len(writer.page_ids)} page(s), {len(writer.images)} image(s) stored, "
+                  f"{writer.shared_bytes / 1e6:.1f} MB of repeats not stored")
+        return written
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def describe(profile: dict) -> str:
+    trim_w, trim_h = profile['trim_mm']
+    return (f"{profile['name']}: {trim_w:g}x{trim_h:g} mm trim, {profile['bleed_mm']:g} mm bleed, "
+            f"{profile['dpi']} dpi, {profile['layout']}, {profile['colour']}")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Render a character's book to a print-ready PDF",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/impose.py photobook cu
+    python3 scripts/impose.py offset-8x8-cmyk em --workers 8
+    python3 scripts/impose.py photobook --box-set cu ha
+    python3 scripts/impose.py --list
+        """
+    )
+    parser.add_argument("profile", nargs="?", help="Profile name in print-profiles/ or a path to a profile")
+    parser.add_argument("char_codes", nargs="*", help="Two-letter character code(s) (e.g., cu, em, ha)")
+    parser.add_argument("--box-set", action="store_true",
+                        help="Write the characters' books (default: all) into one PDF, storing shared spreads once")
+    parser.add_argument("--output", type=Path,
+                        help="Output PDF (default: out-images/<code>-<profile>.pdf or box-set-<profile>.pdf)")
+    parser.add_argument("--workers", type=int, help="Render processes (default: CPU count)")
+    parser.add_argument("--list", action="store_true", help="List the available print profiles")
+    # Intermixed, so character codes may follow --box-set
+    args = parser.parse_intermixed_args()
+
+    if args.list:
+        for path in sorted(PROFILE_DIR.glob('*.yaml')):
+            try:
+                print(f"  {path.stem:20} {describe(load_profile(str(path)))}")
+            except ValueError as e:
+                print(f"  {path.stem:20} ✗ {e}")
+        return 0
+
+    if not args.profile or (not args.box_set and len(args.char_codes) != 1):
+        parser.error("a profile and one character code are required (or use --box-set or --list)")
+
+    try:
+        profile = load_profile(args.profile)
+        print(describe(profile))
+        if args.box_set:
+            box_set(profile, args.char_codes, args.output, args.workers)
+        else:
+            impose(profile, args.char_codes[0], args.output, args.workers)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
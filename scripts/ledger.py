@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Ledger of every image generation request.
+
+gen_image.py appends one row per request to out-images/ledger.db (SQLite)
+recording what produced the image and how long it took:
+- Page, backend, model, size and quality
+- SHA-256 of the prompt and of each reference image
+- Attempt number (requests for the page and backend since its last success)
+- Prompt build, API and post-processing times
+- Output bytes, outcome and output path
+- Size of each prompt section, in characters and estimated tokens, and how
+  much of it was trimmed to fit the backend's limit (scripts/prompts.py)
+
+The ledger lives next to the images it describes (out-images/ is git-ignored)
+and is never cleared by deleting .katha-cache/.
+
+Usage:
+    python3 scripts/ledger.py slowest [--limit N] [--since HOURS]
+    python3 scripts/ledger.py stale [<char-code>] [--quality Q]
+    python3 scripts/ledger.py throughput [--since HOURS]
+    python3 scripts/ledger.py history <page-id> [--limit N]
+    python3 scripts/ledger.py prompts [--since HOURS]
+
+`stale` rebuilds each page's prompt from the current YAML and reference
+images and lists images whose latest successful generation used a different
+prompt or different references (or that have no ledger entry at all). With
+--quality, images made at another quality, model or size are stale too.
+
+`prompts` shows the mean size of each prompt section and how often it had
+to be trimmed, to spot the sections that make prompts long and slow.
+
+Examples:
+    python3 scripts/ledger.py slowest --limit 10
+    python3 scripts/ledger.py stale cu
+    python3 scripts/ledger.py throughput --since 24
+    python3 scripts/ledger.py prompts --since 168
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from project import load_yaml
+
+LEDGER_FILE = Path('out-images') / 'ledger.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    page_id TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    model TEXT,
+    size TEXT,
+    quality TEXT,
+    prompt_hash TEXT NOT NULL,
+    reference_hashes TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    prompt_ms REAL,
+    api_ms REAL,
+    postprocess_ms REAL,
+    total_ms REAL,
+    bytes INTEGER,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    output_path TEXT
+);
+CREATE INDEX IF NOT EXISTS generations_page ON generations (page_id, started_at);
+CREATE INDEX IF NOT EXISTS generations_started ON generations (started_at, outcome);
+CREATE INDEX IF NOT EXISTS generations_slowest ON generations (outcome, total_ms);
+CREATE INDEX IF NOT EXISTS generations_output ON generations (output_path, outcome, started_at);
+CREATE TABLE IF NOT EXISTS prompt_sections (
+    generation_id INTEGER NOT NULL REFERENCES generations (id),
+    section TEXT NOT NULL,
+    chars INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    trimmed_chars INTEGER NOT NULL,
+    deduplicated INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prompt_sections_generation ON prompt_sections (generation_id);
+"""
+
+
+def connect(path: Path = LEDGER_FILE) -> sqlite3.Connection:
+    """Open the ledger, creating it if needed."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL lets parallel gen_image.py processes append while queries run
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reference_hashes(references: list) -> Dict[str, str]:
+    """Return {reference file name: SHA-256} for gen_image reference dicts."""
+    return {Path(ref['path']).name: hash_file(Path(ref['path'])) for ref in references}
+
+
+def record(page_id: str, backend: str, prompt: str, references: list, started_at: float,
+           outcome: str, timings: Optional[dict] = None, output_path: Optional[str] = None,
+           error: Optional[str] = None, model: Optional[str] = None, size: Optional[str] = None,
+           quality: Optional[str] = None, prompt_sections: Optional[List[dict]] = None):
+    """
+    Append one generation to the ledger (best effort: never fails the generation).
+    prompt_sections are the per-section metrics of prompts.compile_prompt().
+    """
+    timings = timings or {}
+    try:
+        size_bytes = Path(output_path).stat().st_size if output_path and outcome == 'ok' else None
+        conn = connect()
+        with conn:
+            last_ok = conn.execute(
+                "SELECT MAX(started_at) FROM generations WHERE page_id = ? AND backend = ? AND outcome = 'ok'",
+                (page_id, backend),
+            ).fetchone()[0]
+            previous = conn.execute(
+                "SELECT COUNT(*) FROM generations WHERE page_id = ? AND backend = ? AND started_at > ?",
+                (page_id, backend, last_ok or 0),
+            ).fetchone()[0]
+            cursor = conn.execute(
+                "INSERT INTO generations (page_id, backend, model, size, quality, prompt_hash, "
+                "reference_hashes, attempt, started_at, prompt_ms, api_ms, postprocess_ms, total_ms, "
+                "bytes, outcome, error, output_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    page_id, backend, model, size, quality, hash_text(prompt),
+                    json.dumps(reference_hashes(references), sort_keys=True),
+                    previous + 1, started_at,
+                    timings.get('prompt_ms'), timings.get('api_ms'), timings.get('postprocess_ms'),
+                    (time.time() - started_at) * 1000,
+                    size_bytes, outcome, (error or '')[:500] or None, output_path,
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO prompt_sections (generation_id, section, chars, tokens, trimmed_chars, deduplicated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, m['section'], m['chars'], m['tokens'], m['trimmed_chars'], m['deduplicated'])
+                 for m in prompt_sections or []],
+            )
+        conn.close()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: Failed to write generation ledger: {e}")
+
+
+def slowest(conn, limit: int, since: Optional[float]) -> List[sqlite3.Row]:
+    """Return the slowest successful generations."""
+    return conn.execute(
+        "SELECT page_id, total_ms, api_ms, attempt, started_at, output_path FROM generations "
+        "WHERE outcome = 'ok' AND started_at >= ? ORDER BY total_ms DESC LIMIT ?",
+        (since or 0, limit),
+    ).fetchall()
+
+
+def throughput(conn, since: Optional[float]) -> List[sqlite3.Row]:
+    """Return per-hour request counts, successes, bytes and mean latency."""
+    return conn.execute(
+        "SELECT strftime('%Y-%m-%d %H:00', started_at, 'unixepoch', 'localtime') AS hour, "
+        "COUNT(*) AS requests, SUM(outcome = 'ok') AS ok, COALESCE(SUM(bytes), 0) AS bytes, "
+        "AVG(total_ms) AS mean_ms FROM generations WHERE started_at >= ? GROUP BY hour ORDER BY hour",
+        (since or 0,),
+    ).fetchall()
+
+
+def prompt_sizes(conn, since: Optional[float]) -> List[sqlite3.Row]:
+    """Return each prompt section's mean and largest size, and how often it was trimmed."""
+    # Character sections are grouped together; their names vary by book
+    return conn.execute(
+        "SELECT CASE WHEN section LIKE 'character:%' THEN 'character:*' ELSE section END AS name, "
+        "COUNT(*) AS uses, AVG(chars) AS mean_chars, MAX(chars) AS max_chars, AVG(tokens) AS mean_tokens, "
+        "SUM(trimmed_chars > 0) AS trimmed, SUM(deduplicated) AS deduplicated "
+        "FROM prompt_sections JOIN generations ON generations.id = prompt_sections.generation_id "
+        "WHERE started_at >= ? GROUP BY name ORDER BY mean_chars DESC",
+        (since or 0,),
+    ).fetchall()
+
+
+def latest_success(conn, output_path: str) -> Optional[sqlite3.Row]:
+    """
+    Return the most recent successful generation of an output path.
+    Masked edits (backend '<name>-edit') refine an image without replacing
+    its prompt, so they are not counted.
+    """
+    return conn.execute(
+        "SELECT * FROM generations WHERE output_path = ? AND outcome = 'ok' AND backend NOT LIKE '%-edit' "
+        "ORDER BY started_at DESC LIMIT 1",
+        (output_path,),
+    ).fetchone()
+
+
+def same_request(row: sqlite3.Row, prompt: str, references: list, model: Optional[str],
+                 size: Optional[str], quality: Optional[str]) -> bool:
+    """Return True if a ledger row was made from exactly this request."""
+    return (
+        row['prompt_hash'] == hash_text(prompt)
+        and json.loads(row['reference_hashes']) == reference_hashes(references)
+        and (row['model'], row['size'], row['quality']) == (model, size, quality)
+    )
+
+
+def same_references(recorded: Dict[str, str], references: list) -> bool:
+    """
+    Return True if a ledger row's reference hashes match these references.
+    A reference sheet that hasn't been composed yet matches by name, which
+    embeds a digest of the images it is made from.
+    """
+    if set(recorded) != {Path(ref['path']).name for ref in references}:
+        return False
+    return all(
+        recorded[Path(ref['path']).name] == hash_file(Path(ref['path']))
+        for ref in references if Path(ref['path']).exists()
+    )
+
+
+def stale(conn, page_filenames: List[str], quality: Optional[str] = None) -> List[dict]:
+    """
+    Compare each page's current prompt and references with its latest generation.
+    With quality, an image is only current if it was also generated at that
+    quality tier, with the same model and size.
+
+    Returns [{'page_id', 'status', 'reason', 'prompt_chars', 'references'}];
+    the last two are the size of the compiled request, so callers such as
+    budget.plan() can price it without building the prompt again. They are
+    missing for 'invalid' pages.
+    """
+    # Imported here so the other queries don't need gen_image's dependencies
+    import gen_image
+
+    visual_style = gen_image.load_visual_style()
+    typeset_text = gen_image.typeset_enabled()
+    backend = gen_image.get_backend('openai')
+    max_chars = backend.max_prompt_chars
+    wanted = (backend.model, backend.sizes[0], backend.quality_for(quality)) if quality else None
+    results = []
+    for page_filename in page_filenames:
+        page_id = Path(page_filename).stem
+        output_path = (Path('out-images') / f"{page_id}-openai.jpg").as_posix()
+        row = latest_success(conn, output_path)
+
+        try:
+            page_data = load_yaml(Path('pages') / page_filename)
+        except Exception as e:
+            results.append({'page_id': page_id, 'status': 'invalid', 'reason': ' '.join(str(e).split())})
+            continue
+        references = gen_image.get_reference_images(page_id, build=False)
+        prompt = gen_image.build_full_prompt(
+            page_data, visual_style, references, gen_image.load_character_descriptions(page_id), typeset_text,
+            max_chars,
+        )
+
+        if row is None:
+            status, reason = 'unknown', 'no successful generation in the ledger'
+        elif not Path(output_path).exists():
+            status, reason = 'missing', 'image was generated but the file is gone'
+        elif row['prompt_hash'] != hash_text(prompt):
+            status, reason = 'stale', 'prompt changed (page, book or character YAML)'
+        elif not same_references(json.loads(row['reference_hashes']), references):
+            status, reason = 'stale', 'reference images changed'
+        elif wanted and (row['model'], row['size'], row['quality']) != wanted:
+            status, reason = 'stale', (f"generated with {row['model']} at {row['size']}, quality {row['quality']} "
+                                       f"(wanted {wanted[2]})")
+        else:
+            status, reason = 'current', ''
+        results.append({'page_id': page_id, 'status': status, 'reason': reason,
+                        'prompt_chars': len(prompt), 'references': len(references)})
+    return results
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Query the image generation ledger",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/ledger.py slowest --limit 10
+    python3 scripts/ledger.py stale cu
+    python3 scripts/ledger.py throughput --since 24
+        """
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("slowest", help="Slowest successful generations")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--since", type=float, help="Only the last N hours")
+
+    p = sub.add_parser("stale", help="Images out of date with the current YAML or references")
+    p.add_argument("char_code", nargs="?", help="Only pages in this character's story (default: all pages)")
+    p.add_argument("--quality", choices=["low", "medium", "high"],
+                   help="Also count images generated at another quality, model or size as stale")
+
+    p = sub.add_parser("throughput", help="Requests per hour")
+    p.add_argument("--since", type=float, help="Only the last N hours")
+
+    p = sub.add_parser("history", help="Every generation of one page")
+    p.add_argument("page_id")
+    p.add_argument("--limit", type=int, default=20)
+
+    p = sub.add_parser("prompts", help="Prompt size per section, and how often each was trimmed")
+    p.add_argument("--since", type=float, help="Only the last N hours")
+
+    args = parser.parse_args()
+    if not LEDGER_FILE.exists():
+        print(f"No ledger yet ({LEDGER_FILE} is created by the first gen_image.py run)")
+        return 1
+    conn = connect()
+    since = time.time() - args.since * 3600 if getattr(args, 'since', None) else None
+
+    if args.command == "slowest":
+        for row in slowest(conn, args.limit, since):
+            api = f"{row['api_ms'] / 1000:.1f}s API" if row['api_ms'] else "-"
+            print(f"{row['total_ms'] / 1000:7.1f}s  {row['page_id']:12} {api:>12}  "
+                  f"attempt {row['attempt']}  {_format_time(row['started_at'])}")
+
+    elif args.command == "throughput":
+        for row in throughput(conn, since):
+            print(f"{row['hour']}  {row['requests']:5} request(s)  {row['ok']:5} ok  "
+                  f"{row['bytes'] / 1e6:8.1f} MB  mean {(row['mean_ms'] or 0) / 1000:.1f}s")
+
+    elif args.command == "history":
+        rows = conn.execute(
+            "SELECT * FROM generations WHERE page_id = ? ORDER BY started_at DESC LIMIT ?",
+            (args.page_id, args.limit),
+        ).fetchall()
+        for row in rows:
+            detail = row['error'] or f"{row['bytes'] or 0} bytes"
+            print(f"{_format_time(row['started_at'])}  {row['backend']:10} {row['outcome']:7} attempt {row['attempt']}  "
+                  f"{(row['total_ms'] or 0) / 1000:6.1f}s  prompt {row['prompt_hash'][:12]}  {detail}")
+
+    elif args.command == "prompts":
+        rows = prompt_sizes(conn, since)
+        if not rows:
+            print("No prompt sizes recorded yet")
+        for row in rows:
+            print(f"{row['name']:24} {row['uses']:5} use(s)  mean {row['mean_chars']:6.0f} chars "
+                  f"(~{row['mean_tokens']:.0f} tokens)  max {row['max_chars']:6}  "
+                  f"trimmed {row['trimmed']}x  {row['deduplicated']} duplicate line(s) dropped")
+
+    elif args.command == "stale":
+        if args.char_code:
+            from gen_all_images import load_character_story
+            page_filenames = load_character_story(args.char_code)
+        else:
+            page_filenames = sorted(p.name for p in Path('pages').glob('*.yaml'))
+        results = stale(conn, page_filenames, args.quality)
+        for result in results:
+            if result['status'] != 'current':
+                print(f"{result['status']:8} {result['page_id']:12} {result['reason']}")
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        print(f"\n{len(results)} page(s): " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+        return 1 if counts.keys() - {'current'} else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Load-test the image pipeline against the fake images API.
+
+For each scenario in scripts/fake_images_api.py, starts the fake API, runs
+gen_all_images.py for one character against it and reports:
+- Pages generated and failed (by each page's last attempt), page retries,
+  wall-clock time and throughput (pages/min)
+- p50/p95/p99 per-page latency, from the generation ledger
+- What the API saw: requests, 429s and 500s, so client retries are visible
+
+Each run works in a scratch copy of the project (YAML, templates,
+reference images and scripts), so real images in out-images/ and their
+ledger are never touched and every scenario starts from a cold cache.
+No API key is used and nothing is billed.
+
+Usage:
+    python3 scripts/load_test.py <character-code> [--scenario NAME ...]
+                                 [--workers N ...] [--time-scale X] [--json]
+
+Examples:
+    python3 scripts/load_test.py cu
+    python3 scripts/load_test.py cu --scenario baseline rate-limited --workers 5 10
+    python3 scripts/load_test.py ha --time-scale 0.25 --json > load.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import ledger
+from fake_images_api import SCENARIOS, FakeImagesServer
+from project import load_project
+
+# Everything gen_all_images.py reads
+PROJECT_FILES = ['book.yaml', 'pyproject.toml', 'uv.lock', '.python-version']
+PROJECT_DIRS = ['characters', 'pages', 'templates', 'ref-images', 'scripts', 'print-profiles']
+
+
+def make_sandbox() -> Path:
+    """Copy the project inputs into a scratch directory."""
+    sandbox = Path(tempfile.mkdtemp(prefix='katha-load-'))
+    for name in PROJECT_FILES:
+        if Path(name).exists():
+            shutil.copy2(name, sandbox / name)
+    for name in PROJECT_DIRS:
+        if Path(name).is_dir():
+            shutil.copytree(name, sandbox / name, ignore=shutil.ignore_patterns('__pycache__'))
+    (sandbox / 'out-images').mkdir()
+    return sandbox
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def run_scenario(char_code: str, name: str, workers: int, time_scale: float, seed: int,
+                 verbose: bool) -> dict:
+    """Run gen_all_images.py once against a fresh fake API and sandbox."""
+    sandbox = make_sandbox()
+    server = FakeImagesServer(SCENARIOS[name], seed=seed, time_scale=time_scale).start()
+    env = dict(os.environ, OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY='fake-load-test')
+    # Reuse the project's environment instead of letting uv build one per sandbox
+    if Path('.venv').is_dir():
+        env['UV_PROJECT_ENVIRONMENT'] = str(Path('.venv').resolve())
+    try:
+        started = time.time()
+        result = subprocess.run(
+            ['uv', 'run', 'scripts/gen_all_images.py', char_code, '--workers', str(workers)],
+            cwd=sandbox, env=env,
+            stdout=None if verbose else subprocess.DEVNULL,
+            stderr=None if verbose else subprocess.DEVNULL,
+        )
+        wall = time.time() - started
+        api = server.stats()
+    finally:
+        server.stop()
+
+    conn = ledger.connect(sandbox / ledger.LEDGER_FILE)
+    rows = conn.execute("SELECT page_id, outcome, total_ms FROM generations ORDER BY started_at").fetchall()
+    conn.close()
+    shutil.rmtree(sandbox, ignore_errors=True)
+
+    ok = [row['total_ms'] for row in rows if row['outcome'] == 'ok']
+    # A page's final outcome is its last attempt; earlier attempts were retried
+    final = {row['page_id']: row['outcome'] for row in rows}
+    pages_ok = sum(1 for outcome in final.values() if outcome == 'ok')
+    statuses = {}
+    for key, count in api['responses'].items():
+        status = key.split()[-1]
+        statuses[status] = statuses.get(status, 0) + count
+    return {
+        'scenario': name,
+        'workers': workers,
+        'exit_code': result.returncode,
+        'wall_s': round(wall, 2),
+        'pages_ok': pages_ok,
+        'pages_failed': len(final) - pages_ok,
+        'page_retries': len(rows) - len(final),
+        'pages_per_min': round(pages_ok / wall * 60, 1) if wall else 0.0,
+        'p50_ms': percentile(ok, 50),
+        'p95_ms': percentile(ok, 95),
+        'p99_ms': percentile(ok, 99),
+        'api_requests': api['requests'],
+        'api_statuses': statuses,
+    }
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value / 1000:.1f}s" if value is not None else "-"
+
+
+def print_report(results: List[dict]):
+    print(f"\n{'Scenario':14} {'Workers':>7} {'OK':>4} {'Fail':>4} {'Retry':>5} {'Wall':>7} {'Pages/min':>9} "
+          f"{'p50':>6} {'p95':>6} {'p99':>6} {'Requests':>8} {'429':>4} {'5xx':>4}")
+    for r in results:
+        statuses = r['api_statuses']
+        server_errors = sum(count for status, count in statuses.items() if status.startswith('5'))
+        print(f"{r['scenario']:14} {r['workers']:>7} {r['pages_ok']:>4} {r['pages_failed']:>4} {r['page_retries']:>5} "
+              f"{r['wall_s']:>6.1f}s {r['pages_per_min']:>9.1f} {_ms(r['p50_ms']):>6} {_ms(r['p95_ms']):>6} "
+              f"{_ms(r['p99_ms']):>6} {r['api_requests']:>8} {statuses.get('429', 0):>4} {server_errors:>4}")
+    print("\nFail counts pages whose last attempt failed; Retry counts extra page attempts in the ledger.\n"
+          "Requests above OK + Fail + Retry are client retries inside a single attempt.")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Load-test gen_all_images.py against the fake images API",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/load_test.py cu
+    python3 scripts/load_test.py cu --scenario baseline rate-limited --workers 5 10
+    python3 scripts/load_test.py ha --time-scale 0.25 --json > load.json
+        """
+    )
+    parser.add_argument("char_code", help="Character whose story to build")
+    parser.add_argument("--scenario", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS),
+                        help="Scenarios to run (default: all)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[5],
+                        help="gen_all_images.py --workers values to try (default: 5)")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiply the fake API's delays by this (e.g. 0.25 for a quick run)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for injected faults (default: 0)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show gen_all_images.py output")
+    args = parser.parse_args()
+
+    if args.char_code not in load_project().characters:
+        print(f"Error: Unknown character code: {args.char_code}")
+        return 1
+
+    results = []
+    for name in args.scenario:
+        for workers in args.workers:
+            if not args.json:
+                print(f"Running {name} with {workers} worker(s)...", flush=True)
+            results.append(run_scenario(args.char_code, name, workers, args.time_scale, args.seed, args.verbose))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Run items through a chain of stages, overlapping work across items.
+
+A Pipeline is a DAG of per-item stages (e.g. generate -> qa -> render) plus
+an ordered sink (e.g. appending pages to a PDF). Each item moves to its
+next stage as soon as its current one finishes, so one item's QA runs
+while other items are still being generated. The sink is called in item
+order the moment the next item is ready. The last step therefore finishes
+shortly after the slowest item, instead of after the sum of the phases.
+
+Each thread stage gets its own thread pool (I/O: API calls, subprocesses),
+so cheap downstream work never queues behind slow generations. Process
+stages share one process pool (CPU: decoding, resampling, encoding).
+
+A stage that raises fails its item; that item's later stages are skipped
+and the sink stops there, but other items keep going so every problem is
+reported in one run.
+
+Example:
+    stages = [
+        Stage("generate", generate, pool="thread"),
+        Stage("qa", check_image, pool="process"),
+    ]
+    results = Pipeline(stages, threads=5).run(pages, sink=add_to_pdf)
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, List, NamedTuple, Optional
+
+
+class Stage(NamedTuple):
+    """One step applied to every item: func(item, previous result) -> result."""
+    name: str
+    func: Callable[[Any, Any], Any]
+    # 'thread' for I/O-bound work, 'process' for CPU-bound work (func must be picklable)
+    pool: str = 'thread'
+    # Predicate on the item; skipped stages pass the previous result through
+    when: Optional[Callable[[Any], bool]] = None
+    # Thread pool size for thread stages (default: the pipeline's threads)
+    workers: Optional[int] = None
+
+
+def _timed(func, item, previous):
+    """Run a stage function, returning (start time, result)."""
+    return time.time(), func(item, previous)
+
+
+class ItemResult:
+    """What happened to one item."""
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error: Optional[str] = None
+        self.failed_stage: Optional[str] = None
+        self.done = False
+        self.sunk = False
+        # stage name -> (start, end), in seconds since the pipeline started,
+        # excluding time spent queued for a worker
+        self.timings = {}
+
+    @property
+    def ok(self) -> bool:
+        return self.done and self.error is None
+
+
+class Pipeline:
+    """Schedules stages per item as soon as their inputs are ready."""
+
+    def __init__(self, stages: List[Stage], threads: int = 4, processes: Optional[int] = None):
+        self.stages = stages
+        self.threads = max(1, threads)
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        self.started = 0.0
+        self.finished = 0.0
+
+    def _next_stage(self, item, index: int) -> Optional[int]:
+        """Return the index of the first stage at or after `index` that applies to the item."""
+        while index < len(self.stages):
+            when = self.stages[index].when
+            if when is None or when(item):
+                return index
+            index += 1
+        return None
+
+    def run(self, items: list, sink: Optional[Callable[[Any, Any], None]] = None,
+            on_stage_done: Optional[Callable[[ItemResult, str], None]] = None) -> List[ItemResult]:
+        """
+        Run every item through the stages. `sink(item, result)` is called in
+        item order, in this thread, for each item that finishes every stage.
+        `on_stage_done(result, stage)` is called after each stage (or failure).
+        """
+        results = [ItemResult(item) for item in items]
+        need_processes = any(stage.pool == 'process' for stage in self.stages)
+        self.started = time.time()
+
+        thread_pools = {
+            stage.name: ThreadPoolExecutor(max_workers=stage.workers or self.threads)
+            for stage in self.stages if stage.pool != 'process'
+        }
+        # Spawn rather than fork: the thread pools may already be running
+        process_pool = ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=multiprocessing.get_context('spawn')
+        ) if need_processes else None
+        pending = {}
+        next_sink = 0
+
+        def submit(n: int, stage_index: Optional[int], previous):
+            if stage_index is None:
+                results[n].result = previous
+                results[n].done = True
+                return
+            stage = self.stages[stage_index]
+            pool = process_pool if stage.pool == 'process' else thread_pools[stage.name]
+            future = pool.submit(_timed, stage.func, items[n], previous)
+            pending[future] = (n, stage_index)
+
+        try:
+            for n, item in enumerate(items):
+                submit(n, self._next_stage(item, 0), None)
+
+            while True:
+                # Feed the sink every item that is ready, in order
+                while sink and next_sink < len(results) and results[next_sink].ok:
+                    sink(items[next_sink], results[next_sink].result)
+                    results[next_sink].sunk = True
+                    next_sink += 1
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    n, stage_index = pending.pop(future)
+                    stage = self.stages[stage_index]
+                    try:
+                        start, value = future.result()
+                    except Exception as e:
+                        results[n].error = str(e) or type(e).__name__
+                        results[n].failed_stage = stage.name
+                        results[n].done = True
+                    else:
+                        results[n].timings[stage.name] = (start - self.started, time.time() - self.started)
+                        submit(n, self._next_stage(items[n], stage_index + 1), value)
+                    if on_stage_done:
+                        on_stage_done(results[n], stage.name)
+        finally:
+            for future in pending:
+                future.cancel()
+            for pool in thread_pools.values():
+                pool.shutdown(wait=True)
+            if process_pool:
+                process_pool.shutdown(wait=True)
+            self.finished = time.time() - self.started
+        return results
+
+
+def print_timeline(pipeline: Pipeline, results: List[ItemResult]):
+    """Print busy time per stage and how long the tail after the slowest item took."""
+    print("\nPipeline stages:")
+    for stage in pipeline.stages:
+        spans = [r.timings[stage.name] for r in results if stage.name in r.timings]
+        if not spans:
+            continue
+        busy = sum(end - start for start, end in spans)
+        last = max(end for _, end in spans)
+        print(f"  {stage.name:10} {len(spans):4} item(s)  {busy:8.1f} s busy  last finished at {last:7.1f} s")
+    print(f"  {'total':10} {'':13} {'':15} {pipeline.finished:7.1f} s")
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Profiling hooks shared by the scripts.
+
+Scripts that take --profile call `profiling.enable(script, args)` after
+parsing their arguments. That starts cProfile (and, with --profile-memory,
+tracemalloc) for the rest of the process and writes, on exit:
+- <script>-<pid>.prof   cProfile stats (open with `python3 -m pstats`)
+- <script>-<pid>.json   wall-clock time per stage and peak memory
+
+Stages are marked in the code with `with profiling.stage("resize"):`, which
+costs nothing when profiling is off. Functions that run in worker threads
+are wrapped with @profiling.threaded so their time is profiled too.
+
+The run directory is passed to child processes through KATHA_PROFILE_DIR,
+so `gen_all_images.py --profile` also profiles every gen_image.py it
+starts. When the top-level script exits, every process's stats are merged
+into combined.prof and a summary is printed to stderr: the hottest
+functions, stage times summed across processes and the peak allocations.
+
+Usage:
+    python3 scripts/profiling.py <run-dir> [--limit N]   # re-print a run's summary
+
+Examples:
+    uv run scripts/gen_all_images.py cu --profile
+    python3 scripts/validate_structure.py --profile /tmp/validate --profile-memory
+    python3 -m pstats .katha-cache/profiles/gen_all_images-20250101-120000/combined.prof
+"""
+
+import argparse
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+PROFILE_DIR = Path('.katha-cache') / 'profiles'
+ENV_DIR = 'KATHA_PROFILE_DIR'
+ENV_MEMORY = 'KATHA_PROFILE_MEMORY'
+
+# Frames kept per allocation in memory snapshots
+MEMORY_FRAMES = 10
+
+# Snapshots are slow, so only take one when live memory grows by this factor
+SNAPSHOT_GROWTH = 1.25
+
+
+class Session:
+    """Profiling state for one process."""
+
+    def __init__(self, script: str, directory: Path, memory: bool, root: bool):
+        self.script = script
+        self.directory = directory
+        self.memory = memory
+        self.root = root
+        self.profiler = cProfile.Profile()
+        self.thread_profilers = []
+        self.stages = defaultdict(lambda: [0.0, 0])
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.peak_bytes = 0
+        self.peak_stage = None
+        self.peak_snapshot = None
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.memory:
+            tracemalloc.start(MEMORY_FRAMES)
+        self.profiler.enable()
+
+    def add_stage(self, name: str, seconds: float):
+        with self.lock:
+            self.stages[name][0] += seconds
+            self.stages[name][1] += 1
+            if self.memory:
+                # Keep the snapshot taken where the most memory was live
+                current = tracemalloc.get_traced_memory()[0]
+                if current > self.peak_bytes * SNAPSHOT_GROWTH:
+                    self.peak_bytes = current
+                    self.peak_stage = name
+                    self.peak_snapshot = tracemalloc.take_snapshot()
+
+    def finish(self):
+        self.profiler.disable()
+        stem = self.directory / f"{self.script}-{os.getpid()}"
+        stats = pstats.Stats(self.profiler)
+        for profiler in self.thread_profilers:
+            stats.add(profiler)
+        stats.dump_stats(f"{stem}.prof")
+
+        summary = {
+            'script': self.script,
+            'pid': os.getpid(),
+            'wall_s': time.perf_counter() - self.started,
+            'stages': {name: {'seconds': s, 'calls': n} for name, (s, n) in self.stages.items()},
+        }
+        if self.memory:
+            summary['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if self.peak_snapshot is not None:
+                self.peak_snapshot.dump(f"{stem}.tracemalloc")
+                summary['snapshot_stage'] = self.peak_stage
+                summary['snapshot_bytes'] = self.peak_bytes
+                summary['top_allocations'] = [
+                    {'where': str(stat.traceback[0]), 'bytes': stat.size, 'blocks': stat.count}
+                    for stat in self.peak_snapshot.statistics('lineno')[:10]
+                ]
+        with open(f"{stem}.json", 'w') as f:
+            json.dump(summary, f, indent=2)
+
+        if self.root:
+            report(self.directory)
+
+
+_session: Optional[Session] = None
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add --profile and --profile-memory to a script's parser."""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help=f"Profile the run and write stats to DIR (default: {PROFILE_DIR}/<script>-<time>)",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="With --profile, also snapshot memory allocations with tracemalloc (slower)",
+    )
+
+
+def enable(script: str, args=None):
+    """
+    Start profiling this process if --profile was given, or if a parent
+    process is profiling (KATHA_PROFILE_DIR is set). Stats are written at exit.
+    """
+    global _session
+    requested = getattr(args, 'profile', None)
+    if requested is not None:
+        directory = Path(requested) if requested else PROFILE_DIR / f"{script}-{time.strftime('%Y%m%d-%H%M%S')}"
+        memory = bool(getattr(args, 'profile_memory', False))
+        root = True
+        # Child processes inherit these and profile into the same directory
+        os.environ[ENV_DIR] = str(directory.resolve())
+        os.environ[ENV_MEMORY] = '1' if memory else ''
+    elif os.environ.get(ENV_DIR):
+        directory = Path(os.environ[ENV_DIR])
+        memory = bool(os.environ.get(ENV_MEMORY))
+        root = False
+    else:
+        return
+
+    _session = Session(script, directory, memory, root)
+    _session.start()
+    atexit.register(_session.finish)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a named stage of the run (no-op unless profiling)."""
+    session = _session
+    if session is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.add_stage(name, time.perf_counter() - start)
+
+
+def threaded(func):
+    """Decorator: profile calls that run in worker threads as well."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _session
+        if session is None or threading.current_thread() is threading.main_thread():
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread with the one active profiler
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with session.lock:
+                session.thread_profilers.append(profiler)
+    return wrapper
+
+
+def report(directory: Path, limit: int = 15, out=None):
+    """Merge every process's stats in a run directory and print a summary."""
+    out = out or sys.stderr
+    prof_files = sorted(str(path) for path in directory.glob('*-*.prof'))
+    summaries = []
+    for path in sorted(directory.glob('*-*.json')):
+        try:
+            with open(path) as f:
+                summaries.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    if not prof_files:
+        print(f"No profiles found in {directory}", file=out)
+        return
+
+    combined = directory / 'combined.prof'
+    stats = pstats.Stats(*prof_files, stream=out)
+    stats.dump_stats(str(combined))
+
+    processes = defaultdict(int)
+    for summary in summaries:
+        processes[summary['script']] += 1
+    print(f"\n{'=' * 80}", file=out)
+    print(f"PROFILE: {directory}", file=out)
+    print(f"  {', '.join(f'{n} x {script}' for script, n in processes.items())}", file=out)
+    print(f"{'=' * 80}", file=out)
+
+    stages = defaultdict(lambda: [0.0, 0])
+    for summary in summaries:
+        for name, stage_stats in summary['stages'].items():
+            stages[name][0] += stage_stats['seconds']
+            stages[name][1] += stage_stats['calls']
+    if stages:
+        print("\nWall-clock time by stage (summed across processes and threads):", file=out)
+        for name, (seconds, calls) in sorted(stages.items(), key=lambda item: -item[1][0]):
+            print(f"  {name:28} {seconds:9.3f} s  {calls:5} call(s)", file=out)
+
+    with_memory = [summary for summary in summaries if 'peak_traced_bytes' in summary]
+    if with_memory:
+        peak = max(with_memory, key=lambda summary: summary['peak_traced_bytes'])
+        print(f"\nPeak traced memory: {peak['peak_traced_bytes'] / 1e6:.1f} MB "
+              f"({peak['script']}, pid {peak['pid']})", file=out)
+        if peak.get('top_allocations'):
+            print(f"  Largest live allocations after stage '{peak['snapshot_stage']}':", file=out)
+            for allocation in peak['top_allocations']:
+                print(f"    {allocation['bytes'] / 1e6:8.2f} MB  {allocation['where']}", file=out)
+
+    print(f"\nHottest functions (own time, all processes):", file=out)
+    stats.files = []  # don't list every input file
+    stats.sort_stats('tottime').print_stats(limit)
+    print(f"Full stats: python3 -m pstats {combined}", file=out)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Print the summary of a profiled run",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/profiling.py .katha-cache/profiles/gen_all_images-20250101-120000
+    python3 scripts/profiling.py /tmp/validate --limit 30
+        """
+    )
+    parser.add_argument("directory", type=Path, help="Run directory written by --profile")
+    parser.add_argument("--limit", type=int, default=15, help="Functions to list (default: 15)")
+    args = parser.parse_args()
+
+    if not args.directory.is_dir():
+        print(f"Error: Not a directory: {args.directory}")
+        return 1
+    report(args.directory, args.limit, sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Load a whole project (book, characters and pages) in a single pass.
+
+Scripts that need more than one character's story should load the project
+once with load_project() and work from the in-memory model, instead of
+re-opening character and page files for every lookup.
+
+Usage:
+    from project import load_project
+
+    project = load_project()
+    for code in project.codes():
+        for page_filename in project.story(code):
+            page_data = project.page(page_filename)
+
+Every script that discovers characters goes through load_characters(), so
+they all agree on which files are characters and on their codes.
+"""
+
+import yaml
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Use the libyaml parser when it is available (several times faster)
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def load_yaml(path):
+    """Load a YAML file with the fastest available safe loader."""
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=YAML_LOADER)
+
+
+def page_id(page_filename: str) -> str:
+    """Return the page ID for a page filename (e.g., "cu-ha-02.yaml" -> "cu-ha-02")."""
+    return Path(page_filename).stem
+
+
+def codes_in_page_id(pid: str) -> List[str]:
+    """Return the character codes in a page ID (e.g., "cu-ha-02" -> ["cu", "ha"])."""
+    return [p for p in pid.split('-') if len(p) == 2 and p.isalpha()]
+
+
+def load_characters(char_dir='characters', errors: Optional[list] = None) -> Dict[str, dict]:
+    """
+    Load characters/*.yaml into {code: {'file': Path, 'data': dict, 'name': str}}.
+
+    A character's code is its `id`, falling back to the filename prefix
+    (cu-cullan.yaml -> cu). Template and example files are skipped. A file
+    that fails to load raises, unless errors is given: then (path, exception)
+    is appended to it and the file is skipped.
+    """
+    characters = {}
+    for char_file in sorted(Path(char_dir).glob('*.yaml')):
+        # Filter out template files
+        if 'template' in char_file.name or 'example' in char_file.name:
+            continue
+        try:
+            char_data = load_yaml(char_file) or {}
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append((char_file, e))
+            continue
+        code = char_data.get('id') or char_file.name.split('-')[0]
+        characters[code] = {
+            'file': char_file,
+            'data': char_data,
+            'name': (char_data.get('attributes') or {}).get('name', code.upper()),
+        }
+    return characters
+
+
+class Project:
+    """In-memory model of a project directory."""
+
+    def __init__(self, root: Path, book: dict, characters: Dict[str, dict], pages: Dict[str, dict]):
+        self.root = root
+        self.book = book
+        # code -> {'file': Path, 'data': dict, 'name': str}
+        self.characters = characters
+        # page filename -> page data
+        self.pages = pages
+        # (code, page filename) -> 0-based index in that character's story
+        self._positions = {
+            (code, page): idx
+            for code, char_info in characters.items()
+            for idx, page in enumerate(char_info['data'].get('story') or [])
+        }
+
+    def codes(self) -> List[str]:
+        """Return all character codes in sorted order."""
+        return sorted(self.characters)
+
+    def character_name(self, code: str) -> str:
+        """Return a character's name, falling back to the upper-cased code."""
+        char_info = self.characters.get(code)
+        return char_info['name'] if char_info else code.upper()
+
+    def story(self, code: str) -> List[str]:
+        """Return a character's ordered list of page filenames."""
+        char_info = self.characters.get(code)
+        return list(char_info['data'].get('story') or []) if char_info else []
+
+    def page(self, page_filename: str) -> Optional[dict]:
+        """Return a page's data, or None if the page file does not exist."""
+        return self.pages.get(page_filename)
+
+    def participants(self, page_filename: str) -> List[str]:
+        """Return the codes of the characters a page's ID says appear on it."""
+        return codes_in_page_id(page_id(page_filename))
+
+    def position(self, code: str, page_filename: str) -> Optional[int]:
+        """Return the 0-based index of a page in a character's story, or None."""
+        return self._positions.get((code, page_filename))
+
+    def neighbours(self, code: str, page_filename: str):
+        """Return the (preceding, succeeding) pages around a page in a character's story."""
+        idx = self.position(code, page_filename)
+        if idx is None:
+            return None, None
+        story = self.characters[code]['data'].get('story') or []
+        preceding = story[idx - 1] if idx > 0 else None
+        succeeding = story[idx + 1] if idx < len(story) - 1 else None
+        return preceding, succeeding
+
+
+def load_project(root='.') -> Project:
+    """Load book.yaml, characters/*.yaml and pages/*.yaml under root."""
+    root = Path(root)
+
+    book_path = root / 'book.yaml'
+    book = load_yaml(book_path) if book_path.exists() else {}
+
+    characters = load_characters(root / 'characters')
+
+    pages = {}
+    for page_path in sorted((root / 'pages').glob('*.yaml')):
+        pages[page_path.name] = load_yaml(page_path) or {}
+
+    return Project(root, book or {}, characters, pages)
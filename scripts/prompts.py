@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Compile image prompts from prioritised sections, fitted to a size budget.
+
+A page's prompt is made of sections: the preamble, visual style, character
+descriptions, reference image captions, text instructions, the scene and
+the story text. Backends cap the prompt length (gpt-image-1 at 10,000
+characters). Cutting the end off the prompt loses the scene and the text,
+which are the parts that matter most. Instead, when a prompt is over
+budget, the compiler removes whole lines from the least important sections
+first:
+
+    priority 0  scene, story text       kept whole unless they alone are over
+                                        budget; then cut at a word boundary,
+                                        the scene first, and never emptied
+    priority 1  preamble, text instructions
+                                        the first line is always kept
+    priority 2  character descriptions, reference captions
+    priority 3  visual style
+
+With an absurdly small budget the prompt may still be over: the first line
+of each instruction section and some of the scene are always sent.
+
+Shared sections (preamble, style, characters in name order) come first and
+are identical for every page with the same characters, so they form a
+stable prefix. A bullet that appears in several sections, for example a
+style point repeated in a character's description, is emitted once.
+
+Every compile reports each section's size in characters and estimated
+tokens, and what was trimmed. gen_image.py prints the summary and stores
+it in the ledger (`python3 scripts/ledger.py prompts`).
+
+Usage:
+    python3 scripts/prompts.py <page-path> [--max-chars N]
+
+Examples:
+    python3 scripts/prompts.py pages/cu-ha-02.yaml
+    python3 scripts/prompts.py pages/cu-01.yaml --max-chars 2000
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+# Rough size of an English BPE token, for reporting only; budgets are in characters
+CHARS_PER_TOKEN = 4
+
+# The scene is only cut below this once the story text has been shortened too
+MIN_SCENE_CHARS = 200
+
+
+class Section(NamedTuple):
+    """One part of a prompt. Lines after the heading are trimmed from the end."""
+    name: str
+    heading: Optional[str]
+    lines: List[str]
+    priority: int
+    # Shared sections go first, in a fixed order, as the prompt's stable prefix
+    shared: bool = False
+
+
+class CompiledPrompt(NamedTuple):
+    text: str
+    # [{'section', 'chars', 'tokens', 'trimmed_chars', 'deduplicated'}] in prompt order
+    sections: List[dict]
+    prefix_chars: int
+
+    @property
+    def trimmed(self) -> List[str]:
+        return [s['section'] for s in self.sections if s['trimmed_chars']]
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{s['section']} {s['chars']}" + (f" (-{s['trimmed_chars']})" if s['trimmed_chars'] else "")
+                          for s in self.sections)
+        return (f"{len(self.text)} characters (~{estimate_tokens(self.text)} tokens, "
+                f"{self.prefix_chars} shared prefix): {parts}")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def build_sections(page_data: dict, visual_style: str, references: list, character_descriptions: dict,
+                   typeset_text: bool = False) -> List[Section]:
+    """
+    Split a page's prompt into sections.
+    With typeset_text, ask for text-free art with room for scripts/typeset.py to set the text.
+    """
+    visual = (page_data.get("visual") or "").strip()
+    text = (page_data.get("text") or "").strip()
+
+    sections = [Section("preamble", None, [
+        "Create a beautiful illustration for a children's storybook page.",
+        "Output a single wide image for a two-page spread.",
+        "Do not multiple images or panels, just one cohesive scene.",
+    ], priority=1, shared=True)]
+
+    if visual_style:
+        sections.append(Section("style", "--- VISUAL STYLE ---", visual_style.splitlines(), priority=3, shared=True))
+
+    # Sorted so pages with the same characters share the same prefix
+    for char_name, desc_list in sorted(character_descriptions.items()):
+        sections.append(Section(f"character:{char_name}", f"--- CHARACTER: {char_name} ---",
+                                [f"- {item}" for item in desc_list], priority=2, shared=True))
+
+    if typeset_text:
+        side = page_data.get("text_side") or "left"
+        lines = ["IMPORTANT: Do NOT include any text, letters, words, signs or captions in the image."]
+        if text:
+            lines.append(f"Story text will be added later in the upper part of the {side} half of the image.")
+            lines.append("Keep that area calm and uncluttered (sky, foliage or a soft wash), with no faces or key action there.")
+        sections.append(Section("text instructions", None, lines, priority=1))
+    elif text:
+        sections.append(Section("text instructions", None, [
+            "IMPORTANT: You MUST include story text as readable typography in the image.",
+            "The text should be clearly legible, using 16pt font size.",
+            "CRITICAL: Do NOT place any text across the 50% vertical centerline of the image.",
+            "The center is where the two-page spread folds together - keep text away from this area.",
+            "Place text either on the left side or right side, but never spanning across the middle.",
+            "Integrate the text into the illustration using a font style that matches the storybook aesthetic.",
+            "The exact text to include is provided at the end of this prompt.",
+        ], priority=1))
+
+    if references:
+        sections.append(Section("references", "--- REFERENCE IMAGES ---",
+                                [f"Image {i} is {ref['description']}." for i, ref in enumerate(references, start=1)],
+                                priority=2))
+
+    sections.append(Section("scene", "--- SCENE TO ILLUSTRATE ---", [visual], priority=0))
+
+    if text and not typeset_text:
+        sections.append(Section("text", "--- TEXT TO INCLUDE IN IMAGE ---", [text], priority=0))
+    return sections
+
+
+def _normalise(line: str) -> str:
+    return " ".join(line.lstrip("- ").split()).casefold()
+
+
+def _order(sections: List[Section]) -> List[Section]:
+    return [s for s in sections if s.shared] + [s for s in sections if not s.shared]
+
+
+def _deduplicate(sections: List[Section]) -> Dict[str, int]:
+    """
+    Drop repeated bullets, in place, keeping the copy in the most important
+    section so trimming can't remove the only one. Returns {section: lines removed}.
+    """
+    seen = set()
+    removed = {}
+    for section in sorted(sections, key=lambda s: s.priority):
+        kept = []
+        for line in section.lines:
+            key = _normalise(line)
+            if line.startswith("- ") and key in seen:
+                removed[section.name] = removed.get(section.name, 0) + 1
+                continue
+            seen.add(key)
+            kept.append(line)
+        section.lines[:] = kept
+    return removed
+
+
+def _render(section: Section) -> str:
+    if not section.lines:
+        return ""
+    return "\n".join(([section.heading] if section.heading else []) + section.lines)
+
+
+def _join(sections: List[Section]) -> str:
+    return "\n\n".join(block for block in map(_render, sections) if block)
+
+
+def _truncate_words(text: str, limit: int) -> str:
+    """Cut text at a word boundary to at most limit characters, but never below its first word."""
+    if len(text) <= limit:
+        return text
+    words = text[:max(0, limit) + 1].split()
+    if not text[limit:limit + 1].isspace():
+        words = words[:-1]  # The last word was cut
+    return " ".join(words).rstrip(",;:") or text.split()[0]
+
+
+def compile_prompt(sections: List[Section], max_chars: Optional[int] = None) -> CompiledPrompt:
+    """Deduplicate, order and render sections, trimming by priority to fit max_chars."""
+    sections = _order([s._replace(lines=list(s.lines)) for s in sections])
+    deduplicated = _deduplicate(sections)
+    untrimmed = {s.name: len(_render(s)) for s in sections}
+
+    def shorten(name: str, floor: int):
+        """Cut a priority 0 section at a word boundary, keeping at least floor characters."""
+        over = len(_join(sections)) - max_chars
+        section = next((s for s in sections if s.name == name and s.lines), None)
+        if over > 0 and section is not None:
+            section.lines[0] = _truncate_words(section.lines[0], max(floor, len(section.lines[0]) - over))
+
+    if max_chars:
+        # Remove lines from the end of the least important, then largest, section.
+        # Priority 1 sections keep their first line: it carries the instruction.
+        while len(_join(sections)) > max_chars:
+            candidates = [s for s in sections if s.priority > 1 and s.lines or s.priority == 1 and len(s.lines) > 1]
+            if not candidates:
+                break
+            victim = max(candidates, key=lambda s: (s.priority, len(_render(s))))
+            victim.lines.pop()
+        # Only the essentials are left and they are still too long: shorten the
+        # scene to a summary, then the text, then the scene again. The scene is never emptied.
+        shorten("scene", MIN_SCENE_CHARS)
+        shorten("text", 1)
+        shorten("scene", 1)
+
+    metrics = []
+    for section in sections:
+        rendered = _render(section)
+        metrics.append({
+            'section': section.name,
+            'chars': len(rendered),
+            'tokens': estimate_tokens(rendered),
+            'trimmed_chars': untrimmed[section.name] - len(rendered),
+            'deduplicated': deduplicated.get(section.name, 0),
+        })
+    prefix = _join([s for s in sections if s.shared])
+    return CompiledPrompt(_join(sections), metrics, len(prefix))
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Show a page's compiled prompt and its per-section sizes",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/prompts.py pages/cu-ha-02.yaml
+    python3 scripts/prompts.py pages/cu-01.yaml --max-chars 2000
+        """
+    )
+    parser.add_argument("page_path", help="Path to the page YAML file (e.g. pages/cu-01.yaml)")
+    parser.add_argument("--max-chars", type=int, help="Budget in characters (default: the openai backend's limit)")
+    args = parser.parse_args()
+
+    # Imported here so the compiler itself has no dependencies
+    import gen_image
+
+    page_id = Path(args.page_path).stem
+    page_data = gen_image.load_page_data(args.page_path)
+    sections = build_sections(page_data, gen_image.load_visual_style(), gen_image.get_reference_images(page_id),
+                              gen_image.load_character_descriptions(page_id), gen_image.typeset_enabled())
+    max_chars = args.max_chars or gen_image.get_backend("openai").max_prompt_chars
+    compiled = compile_prompt(sections, max_chars)
+
+    print(compiled.text)
+    print(f"\n{'section':28} {'chars':>7} {'tokens':>7} {'trimmed':>8} {'dedup':>6}")
+    for metric in compiled.sections:
+        print(f"{metric['section']:28} {metric['chars']:7} {metric['tokens']:7} {metric['trimmed_chars']:8} "
+              f"{metric['deduplicated']:6}")
+    print(f"\n{compiled.summary()}")
+    if compiled.trimmed:
+        print(f"⚠️  Trimmed to fit {max_chars} characters: {', '.join(compiled.trimmed)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Composite reference images into one labelled sheet per character.
+
+gpt-image-1 accepts at most 10 input images, and each one is another file
+to upload. A spread with three characters who each have several
+ref-images/<code>-N.jpg files could exceed that, so the later characters'
+references were dropped. Instead, every character's references are laid
+out side by side, each cell labelled with the character's name, on one
+sheet. The style images get one sheet too. A request therefore carries one
+image for the style plus one per character on the spread, however many
+reference files there are. Cells are downscaled, so the upload is smaller.
+
+Sheets are cached in .katha-cache/ref-sheets/ under a hash of their title,
+the layout and the bytes of every input image. Editing or adding a
+reference image produces a new sheet, and unchanged inputs reuse the cached
+one (including across the parallel gen_image.py processes of a build).
+
+Usage:
+    python3 scripts/reference_sheets.py            # build every character's sheet
+    python3 scripts/reference_sheets.py --prune    # also delete sheets no longer used
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+from registry import get_registry
+from typeset import load_font
+
+SHEET_DIR = Path('.katha-cache') / 'ref-sheets'
+# Bump when the layout changes so cached sheets are rebuilt
+SHEET_VERSION = 1
+
+CELL = 768          # longest side of each reference image on the sheet
+COLUMNS = 3
+TITLE_HEIGHT = 56
+LABEL_HEIGHT = 36
+PADDING = 16
+JPEG_QUALITY = 90
+
+
+def sheet_path(title: str, images: List[Path]) -> Path:
+    """Return the cache path for a sheet of these images (it may not exist yet)."""
+    digest = hashlib.sha256(f"{SHEET_VERSION}|{CELL}|{COLUMNS}|{title}".encode('utf-8'))
+    for image in images:
+        with open(image, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    slug = "".join(c if c.isalnum() else "-" for c in title.lower()).strip("-")
+    return SHEET_DIR / f"{slug}-{digest.hexdigest()[:16]}.jpg"
+
+
+def _thumbnail(path: Path):
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.draft('RGB', (CELL, CELL))
+        img = img.convert('RGB')
+        img.thumbnail((CELL, CELL), Image.Resampling.LANCZOS)
+    return img
+
+
+def compose_sheet(title: str, images: List[Path]):
+    """Lay the images out in a labelled grid under a title."""
+    from PIL import Image, ImageDraw
+
+    thumbs = [_thumbnail(path) for path in images]
+    columns = min(COLUMNS, len(thumbs))
+    rows = [thumbs[i:i + columns] for i in range(0, len(thumbs), columns)]
+    # Each row is as tall as its tallest image, so landscape references don't waste space
+    row_heights = [max(thumb.height for thumb in row) + LABEL_HEIGHT for row in rows]
+    width = PADDING + columns * (CELL + PADDING)
+    height = TITLE_HEIGHT + sum(h + PADDING for h in row_heights)
+    sheet = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(sheet)
+    draw.text((PADDING, PADDING), title, fill=(0, 0, 0), font=load_font(32))
+
+    label_font = load_font(22)
+    y = TITLE_HEIGHT
+    n = 0
+    for row, row_height in zip(rows, row_heights):
+        for column, thumb in enumerate(row):
+            x = PADDING + column * (CELL + PADDING)
+            sheet.paste(thumb, (x + (CELL - thumb.width) // 2, y))
+            n += 1
+            draw.text((x, y + row_height - LABEL_HEIGHT + 6), f"{title} ({n}/{len(thumbs)})",
+                      fill=(0, 0, 0), font=label_font)
+        y += row_height + PADDING
+    return sheet
+
+
+def build_sheet(title: str, images: List[Path]) -> Path:
+    """Return the path of a cached sheet for the images, building it if needed."""
+    path = sheet_path(title, images)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Parallel builds may race to write the same sheet; the rename is atomic
+    tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    compose_sheet(title, images).save(tmp_path, "JPEG", quality=JPEG_QUALITY)
+    os.replace(tmp_path, path)
+    return path
+
+
+def prune(keep: List[Path]) -> int:
+    """Delete cached sheets not in keep. Returns the number deleted."""
+    keep = {path.resolve() for path in keep}
+    removed = 0
+    for path in SHEET_DIR.glob('*.jpg'):
+        if path.resolve() not in keep:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Build the cached reference sheets for every character",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/reference_sheets.py
+    python3 scripts/reference_sheets.py --prune
+        """
+    )
+    parser.add_argument("--prune", action="store_true", help="Delete cached sheets that are no longer used")
+    args = parser.parse_args()
+
+    registry = get_registry()
+    groups = [("Style", registry.style_images())]
+    groups += [(registry.name(code), registry.reference_images(code)) for code in registry.codes()]
+
+    built = []
+    for title, images in groups:
+        if not images:
+            continue
+        path = build_sheet(title, images)
+        built.append(path)
+        size_kb = path.stat().st_size / 1024
+        source_kb = sum(image.stat().st_size for image in images) / 1024
+        print(f"✓ {title}: {len(images)} image(s) -> {path} ({size_kb:.0f} KB, from {source_kb:.0f} KB)")
+
+    if args.prune:
+        print(f"Removed {prune(built)} unused sheet(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Registry of characters and their reference images.
+
+Discovers characters/*.yaml and ref-images/{style,<code>}-*.jpg once and
+keeps the mapping in memory, so resolving the characters on a page is a dict
+lookup per code instead of a directory scan. The registry is also cached on
+disk in .katha-cache/registry.json, so separate processes (such as one
+gen_image.py per page) don't re-parse every character file. The cache is
+reused while the directory mtimes and every cached character file's mtime
+and size are unchanged.
+
+Adding a character needs no code changes: drop characters/<code>-<name>.yaml
+and, optionally, ref-images/<code>-N.jpg files in place.
+
+Usage:
+    python3 scripts/registry.py [<page-id> ...]
+
+Lists every registered character, or resolves the given page IDs.
+"""
+
+import json
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from project import load_characters
+
+CACHE_FILE = Path('.katha-cache') / 'registry.json'
+CACHE_VERSION = 2
+
+
+def _stamp(path: Path) -> Optional[List[int]]:
+    """Return [mtime_ns, size] for a path, or None if it does not exist."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _scan_characters(char_dir: Path) -> Dict[str, dict]:
+    """Parse every character file into {code: {...}}."""
+    errors = []
+    characters = {}
+    for code, char_info in load_characters(char_dir, errors).items():
+        characters[code] = {
+            'file': char_info['file'].as_posix(),
+            'stamp': _stamp(char_info['file']),
+            'name': char_info['name'],
+            'visual_description': (char_info['data'].get('attributes') or {}).get('visual_description') or [],
+            'story': list(char_info['data'].get('story') or []),
+        }
+    for path, e in errors:
+        print(f"Warning: Failed to load {path}: {e}")
+    return characters
+
+
+def _scan_references(ref_dir: Path) -> Dict[str, List[str]]:
+    """Group ref-images/*.jpg by prefix: {'style': [...], 'cu': [...], ...}."""
+    references = {}
+    if not ref_dir.exists():
+        return references
+    for entry in os.scandir(ref_dir):
+        if not entry.name.endswith('.jpg') or '-' not in entry.name:
+            continue
+        prefix = entry.name.split('-')[0]
+        references.setdefault(prefix, []).append(Path(entry.path).as_posix())
+    for paths in references.values():
+        paths.sort()
+    return references
+
+
+class CharacterRegistry:
+    """Maps character codes to their files, names, descriptions, stories and reference images."""
+
+    def __init__(self, characters: Dict[str, dict], references: Dict[str, List[str]]):
+        self.characters = characters
+        self.references = references
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.characters
+
+    def __len__(self) -> int:
+        return len(self.characters)
+
+    def codes(self) -> List[str]:
+        """Return every registered code in sorted order."""
+        return sorted(self.characters)
+
+    def get(self, code: str) -> Optional[dict]:
+        """Return a character's record, or None."""
+        return self.characters.get(code)
+
+    def name(self, code: str) -> str:
+        """Return a character's name, falling back to the upper-cased code."""
+        char = self.characters.get(code)
+        return char['name'] if char else code.upper()
+
+    def resolve(self, page_id: str) -> List[str]:
+        """
+        Return the registered characters appearing in a page ID, in ID order.
+        Examples: cu-01 -> [cu], cu-ha-02 -> [cu, ha], em-06 -> [em]
+        """
+        return [
+            part for part in page_id.split('-')
+            if len(part) == 2 and part.isalpha() and part in self.characters
+        ]
+
+    def style_images(self) -> List[Path]:
+        """Return every style reference image."""
+        return [Path(p) for p in self.references.get('style', [])]
+
+    def reference_images(self, code: str) -> List[Path]:
+        """Return a character's reference images."""
+        return [Path(p) for p in self.references.get(code, [])]
+
+
+def _load_cache(char_dir: Path, ref_dir: Path) -> Optional[CharacterRegistry]:
+    """Return the cached registry if nothing it was built from has changed."""
+    try:
+        with open(CACHE_FILE, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cache.get('version') != CACHE_VERSION:
+        return None
+    if cache.get('characters_dir') != _stamp(char_dir) or cache.get('ref_dir') != _stamp(ref_dir):
+        return None
+    # Editing a file in place doesn't touch the directory mtime
+    for char in cache['characters'].values():
+        if _stamp(Path(char['file'])) != char['stamp']:
+            return None
+    return CharacterRegistry(cache['characters'], cache['references'])
+
+
+def _save_cache(registry: CharacterRegistry, char_dir: Path, ref_dir: Path):
+    """Write the registry to the on-disk cache (best effort)."""
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_FILE.with_suffix(f'.tmp-{os.getpid()}')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': CACHE_VERSION,
+                'characters_dir': _stamp(char_dir),
+                'ref_dir': _stamp(ref_dir),
+                'characters': registry.characters,
+                'references': registry.references,
+            }, f)
+        os.replace(tmp_path, CACHE_FILE)
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_registry(char_dir: str = 'characters', ref_dir: str = 'ref-images') -> CharacterRegistry:
+    """Return the character registry, discovering it at most once per process."""
+    char_path, ref_path = Path(char_dir), Path(ref_dir)
+    registry = _load_cache(char_path, ref_path)
+    if registry is None:
+        registry = CharacterRegistry(_scan_characters(char_path), _scan_references(ref_path))
+        _save_cache(registry, char_path, ref_path)
+    return registry
+
+
+def main():
+    """List the registry, or resolve page IDs given on the command line."""
+    registry = get_registry()
+
+    if len(sys.argv) > 1:
+        for page_id in sys.argv[1:]:
+            codes = registry.resolve(Path(page_id).stem)
+            print(f"{page_id}: {', '.join(f'{c} ({registry.name(c)})' for c in codes) or 'no registered characters'}")
+        return 0
+
+    print(f"{len(registry)} character(s), {len(registry.style_images())} style image(s)")
+    for code in registry.codes():
+        char = registry.get(code)
+        print(f"  {code}  {char['name']:20} {char['file']}  ({len(registry.reference_images(code))} reference image(s))")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Schema validation for book, character and page documents.
+
+The templates in templates/ serve as both examples and schemas. This module
+compiles each template once into a list of field checks (presence, type, list
+item type and nested fields), then validates every document in the repository
+in a single pass and reports every violation rather than stopping at the first.
+
+On top of the per-document schema it also checks the cross-document rules:
+- A page's `id` matches its filename
+- A character's `id` matches the two-letter code in its filename
+- A page's `spread` matches its position in every story that lists it
+
+Usage:
+    python3 scripts/schemas.py [<path> ...]
+
+With no paths, validates book.yaml, characters/*.yaml and pages/*.yaml.
+
+Exit codes:
+- 0: No violations
+- 1: One or more violations
+"""
+
+import sys
+from pathlib import Path
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from project import load_yaml
+
+TEMPLATES = {
+    "book": Path("templates/book-example.yaml"),
+    "character": Path("templates/character-example.yaml"),
+    "page": Path("templates/page-example.yaml"),
+}
+
+# Template fields that documents may leave out. Everything else in a template
+# is required. book.yaml predates the cover fields, so they stay optional.
+OPTIONAL_FIELDS = {
+    "book": {"title", "front_cover_visual", "back_cover_visual", "typeset_text"},
+    "character": set(),
+    "page": {"text_side"},
+}
+
+TYPE_NAMES = {
+    str: "a string",
+    int: "an integer",
+    list: "a list",
+    dict: "a mapping",
+}
+
+
+class Violation(NamedTuple):
+    """A single schema violation in a document."""
+    path: str
+    message: str
+
+    def __str__(self):
+        return f"{self.path}: {self.message}"
+
+
+def _type_of(value) -> type:
+    """Return the schema type for an example value."""
+    # bool is a subclass of int, but a `true` is never a valid spread or age
+    if isinstance(value, bool):
+        return bool
+    for t in (str, int, list, dict):
+        if isinstance(value, t):
+            return t
+    return type(value)
+
+
+def _is_instance(value, expected: type) -> bool:
+    """Check a value against a schema type."""
+    if expected is int and isinstance(value, bool):
+        return False
+    return isinstance(value, expected)
+
+
+def _compile_fields(example: dict, optional: Iterable[str], prefix: str = "") -> List[Callable]:
+    """Compile the fields of an example mapping into a list of check functions."""
+    checks = []
+    optional = set(optional)
+    for key, value in example.items():
+        checks.append(_compile_field(f"{prefix}{key}", key, value, key not in optional))
+    return checks
+
+
+def _compile_field(label: str, key: str, example, required: bool) -> Callable:
+    """Compile a single field into a function that appends its violations."""
+    expected = _type_of(example)
+    type_name = TYPE_NAMES.get(expected, expected.__name__)
+
+    item_type = None
+    if expected is list and example:
+        item_type = _type_of(example[0])
+    nested = _compile_fields(example, (), f"{label}.") if expected is dict else []
+
+    def check(doc: dict, errors: List[str]):
+        if key not in doc or doc[key] is None:
+            if required:
+                errors.append(f"missing required field '{label}'")
+            return
+
+        value = doc[key]
+        if not _is_instance(value, expected):
+            errors.append(f"'{label}' should be {type_name}, got {type(value).__name__}")
+            return
+
+        if required and expected is str and not value.strip():
+            errors.append(f"'{label}' is empty")
+        elif expected is list:
+            if required and not value:
+                errors.append(f"'{label}' is empty")
+            if item_type is not None:
+                for i, item in enumerate(value):
+                    if not _is_instance(item, item_type):
+                        errors.append(
+                            f"'{label}[{i}]' should be {TYPE_NAMES.get(item_type, item_type.__name__)}, "
+                            f"got {type(item).__name__}"
+                        )
+        elif expected is dict:
+            for nested_check in nested:
+                nested_check(value, errors)
+
+    return check
+
+
+class Schema:
+    """A compiled document schema."""
+
+    def __init__(self, kind: str, checks: List[Callable]):
+        self.kind = kind
+        self.checks = checks
+
+    def validate(self, doc) -> List[str]:
+        """Return every violation in a loaded document."""
+        if not isinstance(doc, dict):
+            return [f"{self.kind} document should be a mapping, got {type(doc).__name__}"]
+        errors = []
+        for check in self.checks:
+            check(doc, errors)
+        return errors
+
+
+@lru_cache(maxsize=None)
+def load_schemas() -> Dict[str, Schema]:
+    """Compile the book, character and page templates (once per process)."""
+    schemas = {}
+    for kind, template_path in TEMPLATES.items():
+        example = load_yaml(template_path)
+        schemas[kind] = Schema(kind, _compile_fields(example, OPTIONAL_FIELDS[kind]))
+    return schemas
+
+
+def validate_page(page_data, page_path) -> List[str]:
+    """Validate a single page document, including its id against its filename."""
+    errors = load_schemas()["page"].validate(page_data)
+    page_id = Path(page_path).stem
+    if isinstance(page_data, dict) and page_data.get("id") not in (None, page_id):
+        errors.append(f"'id' is '{page_data['id']}' but the filename implies '{page_id}'")
+    return errors
+
+
+def validate_documents(paths: Optional[Iterable[str]] = None) -> List[Violation]:
+    """
+    Validate every book, character and page document in a single pass.
+
+    If paths is given, only violations in those files are reported, though
+    every character is still read so spreads can be checked against stories.
+    """
+    schemas = load_schemas()
+    violations = []
+    documents = {}
+
+    def load(path: Path):
+        try:
+            documents[path.as_posix()] = load_yaml(path)
+        except Exception as e:
+            violations.append(Violation(path.as_posix(), f"not valid YAML: {e}"))
+
+    book_path = Path("book.yaml")
+    if book_path.exists():
+        load(book_path)
+    char_paths = sorted(Path("characters").glob("*.yaml"))
+    page_paths = sorted(Path("pages").glob("*.yaml"))
+    for path in char_paths + page_paths:
+        load(path)
+
+    def report(path: str, errors: List[str]):
+        violations.extend(Violation(path, message) for message in errors)
+
+    if book_path.as_posix() in documents:
+        report(book_path.as_posix(), schemas["book"].validate(documents[book_path.as_posix()]))
+
+    pages = {}
+    for path in page_paths:
+        key = path.as_posix()
+        if key in documents:
+            report(key, validate_page(documents[key], path))
+            pages[path.name] = (key, documents[key])
+
+    for path in char_paths:
+        key = path.as_posix()
+        if key not in documents:
+            continue
+        char_data = documents[key]
+        report(key, schemas["character"].validate(char_data))
+        if not isinstance(char_data, dict):
+            continue
+
+        char_id = char_data.get("id")
+        code = path.stem.split("-")[0]
+        if char_id is not None and char_id != code:
+            report(key, [f"'id' is '{char_id}' but the filename implies '{code}'"])
+
+        story = char_data.get("story") or []
+        for position, page in enumerate(story, start=1):
+            if page not in pages:
+                continue
+            page_key, page_data = pages[page]
+            spread = page_data.get("spread") if isinstance(page_data, dict) else None
+            if _is_instance(spread, int) and spread != position:
+                report(page_key, [
+                    f"'spread' is {spread} but the page is at position {position} "
+                    f"in {char_id}'s story ({path.name})"
+                ])
+
+    if paths is not None:
+        wanted = {Path(p).as_posix() for p in paths}
+        violations = [v for v in violations if v.path in wanted]
+    return violations
+
+
+def main():
+    """Validate the documents given on the command line, or all of them."""
+    paths = sys.argv[1:] or None
+    violations = validate_documents(paths)
+
+    for violation in violations:
+        print(f"✗ {violation}")
+
+    if violations:
+        print(f"\n{len(violations)} schema violation(s) found")
+        return 1
+
+    print("✓ All documents match their template schemas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Full-text search over story pages, for checking continuity across books.
+
+Usage:
+    python3 scripts/search_pages.py <query> [<query> ...] [--any]
+                                    [--character CODE] [--spread N]
+                                    [--field FIELD] [--sort spread|score]
+                                    [--limit N] [--json] [--rebuild]
+
+Each query is a word or a quoted phrase (e.g. "blue pyramid toy"). By
+default a page must match every query; --any matches pages with at least one.
+
+Only the description, visual, text, beat, hook and payoff fields are indexed,
+so YAML keys and comments never show up as hits. Every hit is tagged with the
+characters whose books contain the page and the page's spread. Hits are
+scored (term frequency x inverse document frequency, weighted by field) and
+listed in spread order, or by score with --sort score.
+
+The inverted index is kept in .katha-cache/search-index.json and updated
+incrementally: only pages whose mtime or size changed since the last query
+are re-read. Characters and their stories come from the registry
+(scripts/registry.py), which does the same for character files.
+
+Examples:
+    python3 scripts/search_pages.py butterfly
+    python3 scripts/search_pages.py "blue pyramid toy" --character ha
+    python3 scripts/search_pages.py camera --field visual --sort score
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from project import codes_in_page_id, load_yaml, page_id
+from registry import get_registry
+
+INDEX_FILE = Path('.katha-cache') / 'search-index.json'
+INDEX_VERSION = 2
+
+# Indexed fields and their ranking weights
+FIELD_WEIGHTS = {
+    'text': 3.0,
+    'description': 2.0,
+    'visual': 1.0,
+    'beat': 1.0,
+    'hook': 1.0,
+    'payoff': 1.0,
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def _stamp(path: Path) -> Optional[List[int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class PageIndex:
+    """Inverted index of page fields, tagged by character and spread."""
+
+    def __init__(self, data: Optional[dict] = None):
+        data = data or {}
+        # page filename -> {'stamp', 'spread', 'fields': {field: text}, 'terms': [...]}
+        self.pages = data.get('pages', {})
+        # character code -> story (page filenames)
+        self.characters = data.get('characters', {})
+        # term -> {page filename: {field: [token positions]}}
+        self.postings = data.get('postings', {})
+
+    def to_dict(self) -> dict:
+        return {
+            'version': INDEX_VERSION,
+            'pages': self.pages,
+            'characters': self.characters,
+            'postings': self.postings,
+        }
+
+    def _remove_page(self, page: str):
+        entry = self.pages.pop(page, None)
+        if not entry:
+            return
+        for term in entry['terms']:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(page, None)
+                if not postings:
+                    del self.postings[term]
+
+    def _add_page(self, page: str, stamp, page_data: dict):
+        fields = {}
+        terms = set()
+        for field in FIELD_WEIGHTS:
+            value = page_data.get(field)
+            if value is None:
+                continue
+            text = str(value).strip()
+            fields[field] = text
+            for position, term in enumerate(tokenize(text)):
+                self.postings.setdefault(term, {}).setdefault(page, {}).setdefault(field, []).append(position)
+                terms.add(term)
+
+        spread = page_data.get('spread')
+        self.pages[page] = {
+            'stamp': stamp,
+            'spread': spread if isinstance(spread, int) and not isinstance(spread, bool) else None,
+            'fields': fields,
+            'terms': sorted(terms),
+        }
+
+    def update(self, pages_dir: Path = Path('pages'), char_dir: Path = Path('characters')) -> int:
+        """Re-index pages and characters that changed on disk. Returns the number re-read."""
+        updated = 0
+
+        seen = set()
+        if pages_dir.exists():
+            for entry in os.scandir(pages_dir):
+                if not entry.name.endswith('.yaml'):
+                    continue
+                seen.add(entry.name)
+                stamp = _stamp(Path(entry.path))
+                cached = self.pages.get(entry.name)
+                if cached and cached['stamp'] == stamp:
+                    continue
+                self._remove_page(entry.name)
+                try:
+                    self._add_page(entry.name, stamp, load_yaml(entry.path) or {})
+                except Exception as e:
+                    print(f"Warning: Failed to index {entry.path}: {e}", file=sys.stderr)
+                updated += 1
+        for page in set(self.pages) - seen:
+            self._remove_page(page)
+            updated += 1
+
+        registry = get_registry(char_dir.as_posix())
+        characters = {code: registry.get(code)['story'] for code in registry.codes()}
+        updated += sum(1 for code in set(characters) | set(self.characters)
+                       if characters.get(code) != self.characters.get(code))
+        self.characters = characters
+
+        return updated
+
+    def tags(self) -> Dict[str, dict]:
+        """Return {page: {'characters': [...], 'spread': int}} for every indexed page."""
+        books = {}
+        for code, story in self.characters.items():
+            for position, page in enumerate(story, start=1):
+                entry = books.setdefault(page, {'characters': set(), 'position': position})
+                entry['characters'].add(code)
+
+        tags = {}
+        for page, entry in self.pages.items():
+            book = books.get(page, {'characters': set(), 'position': None})
+            characters = book['characters'] | set(codes_in_page_id(page_id(page)))
+            spread = entry['spread'] if entry['spread'] is not None else book['position']
+            tags[page] = {'characters': sorted(characters), 'spread': spread}
+        return tags
+
+    def _match(self, query: str, fields) -> Dict[str, Dict[str, int]]:
+        """Return {page: {field: occurrences}} for a word or phrase query."""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+        first = self.postings.get(terms[0], {})
+        matches = {}
+        for page, by_field in first.items():
+            for field, positions in by_field.items():
+                if fields and field not in fields:
+                    continue
+                # Phrase: every following term must be at the next position
+                following = [
+                    set(self.postings.get(term, {}).get(page, {}).get(field, ()))
+                    for term in terms[1:]
+                ]
+                count = sum(
+                    1 for start in positions
+                    if all(start + offset in found for offset, found in enumerate(following, start=1))
+                )
+                if count:
+                    matches.setdefault(page, {})[field] = count
+        return matches
+
+    def search(self, queries: List[str], match_all: bool = True, character: Optional[str] = None,
+               spread: Optional[int] = None, fields=None) -> List[dict]:
+        """Return scored hits for the queries, filtered by character, spread and field."""
+        tags = self.tags()
+        total = max(len(self.pages), 1)
+        scores = {}
+        matched = {}
+        survivors = None
+
+        for query in queries:
+            matches = self._match(query, fields)
+            idf = math.log(1 + total / (1 + len(matches)))
+            for page, by_field in matches.items():
+                score = sum(FIELD_WEIGHTS[field] * (1 + math.log(count)) for field, count in by_field.items())
+                scores[page] = scores.get(page, 0.0) + score * idf
+                matched.setdefault(page, {}).update(by_field)
+            survivors = set(matches) if survivors is None else survivors & set(matches)
+
+        if match_all:
+            scores = {page: score for page, score in scores.items() if page in survivors}
+
+        hits = []
+        for page, score in scores.items():
+            tag = tags.get(page, {'characters': [], 'spread': None})
+            if character and character not in tag['characters']:
+                continue
+            if spread is not None and tag['spread'] != spread:
+                continue
+            hits.append({
+                'page': page,
+                'score': round(score, 3),
+                'spread': tag['spread'],
+                'characters': tag['characters'],
+                'fields': sorted(matched[page]),
+                'snippet': self.snippet(page, queries, matched[page]),
+            })
+        return hits
+
+    def snippet(self, page: str, queries: List[str], fields, width: int = 60) -> str:
+        """Return a short excerpt around the first match on a page."""
+        for field in sorted(fields, key=lambda f: -FIELD_WEIGHTS[f]):
+            text = " ".join(self.pages[page]['fields'].get(field, "").split())
+            for query in queries:
+                words = tokenize(query)
+                if not words:
+                    continue
+                pattern = r"\b" + r"\W+".join(re.escape(w) for w in words) + r"\b"
+                m = re.search(pattern, text, re.IGNORECASE)
+                if m:
+                    start, end = max(0, m.start() - width), min(len(text), m.end() + width)
+                    prefix = "…" if start > 0 else ""
+                    suffix = "…" if end < len(text) else ""
+                    return f"{field}: {prefix}{text[start:m.start()]}[{m.group(0)}]{text[m.end():end]}{suffix}"
+        return ""
+
+
+def load_index(rebuild: bool = False) -> PageIndex:
+    """Load the cached index and bring it up to date with the files on disk."""
+    index = None
+    if not rebuild:
+        try:
+            with open(INDEX_FILE, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                index = PageIndex(data)
+        except (OSError, ValueError):
+            pass
+    index = index or PageIndex()
+
+    if index.update() or rebuild:
+        INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = INDEX_FILE.with_suffix(f'.tmp-{os.getpid()}')
+        with open(tmp_path, 'w') as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, INDEX_FILE)
+    return index
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Search page descriptions, visuals, text, beats, hooks and payoffs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/search_pages.py butterfly
+    python3 scripts/search_pages.py "blue pyramid toy" --character ha
+    python3 scripts/search_pages.py camera --field visual --sort score
+        """
+    )
+    parser.add_argument("queries", nargs="+", help="Words or quoted phrases to search for")
+    parser.add_argument("--any", action="store_true", help="Match pages containing any query (default: all)")
+    parser.add_argument("--character", type=str, help="Only pages in this character's book")
+    parser.add_argument("--spread", type=int, help="Only pages at this spread")
+    parser.add_argument("--field", action="append", choices=FIELD_WEIGHTS.keys(),
+                        help="Only search this field (repeatable)")
+    parser.add_argument("--sort", choices=["spread", "score"], default="spread",
+                        help="Order hits by spread (default) or by score")
+    parser.add_argument("--limit", type=int, default=0, help="Show at most N hits")
+    parser.add_argument("--json", action="store_true", help="Print hits as JSON")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from scratch")
+    args = parser.parse_intermixed_args()
+
+    start = time.perf_counter()
+    index = load_index(args.rebuild)
+    hits = index.search(
+        args.queries,
+        match_all=not args.any,
+        character=args.character.lower() if args.character else None,
+        spread=args.spread,
+        fields=set(args.field) if args.field else None,
+    )
+
+    if args.sort == "score":
+        hits.sort(key=lambda h: (-h['score'], h['spread'] or 0, h['page']))
+    else:
+        hits.sort(key=lambda h: (h['spread'] or 0, -h['score'], h['page']))
+    if args.limit:
+        hits = hits[:args.limit]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        print(json.dumps(hits, indent=2))
+        return 0
+
+    for hit in hits:
+        characters = ", ".join(hit['characters']).upper()
+        print(f"spread {hit['spread'] or '?':>2}  {page_id(hit['page']):12} [{characters}]  score {hit['score']:.2f}")
+        print(f"    {hit['snippet']}")
+    print(f"\n{len(hits)} hit(s) in {elapsed_ms:.1f} ms")
+    return 0 if hits else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
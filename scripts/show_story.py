@@ -1,17 +1,65 @@
 #!/usr/bin/env python3
 """
-Show the full story for a character given their two-letter code.
+Show the full story for one or more characters given their two-letter codes.
 
 Usage:
-    python3 scripts/show_story.py <character-code>
+    python3 scripts/show_story.py <character-code> [<character-code> ...]
+    python3 scripts/show_story.py --all [--format FORMAT] [--output-dir DIR]
+
+Options:
+    --all               Render every character's story
+    --format FORMAT     Output format: markdown (default), html or json
+    --output-dir DIR    Write one file per character (e.g. DIR/cu-story.md)
+                        instead of streaming everything to stdout
+    --profile [DIR]     Write cProfile stats and stage timings (see
+                        scripts/profiling.py); the summary goes to stderr
+
+The project is loaded once and every requested story is rendered in a single
+pass. Page fragments are memoized, so a page shared between characters is
+formatted only once, and output is written as it is produced.
+
+With several characters on stdout, markdown stories are concatenated, html
+stories become articles in one document, and json is written one story per
+line (JSON Lines).
 
 Example:
     python3 scripts/show_story.py cu
+    python3 scripts/show_story.py --all --format html --output-dir out-stories
 """
 
+import argparse
+import html
+import json
 import sys
-import yaml
 from pathlib import Path
+from typing import Iterator, List, Optional
+
+import profiling
+from project import load_project, page_id
+
+FORMATS = {
+    "markdown": ".md",
+    "html": ".html",
+    "json": ".json",
+}
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: Georgia, serif; max-width: 50em; margin: 2em auto; padding: 0 1em; line-height: 1.5; }}
+article {{ margin-bottom: 4em; }}
+section.page {{ border-left: 3px solid #ccc; padding-left: 1em; margin: 1.5em 0; }}
+</style>
+</head>
+<body>
+"""
+
+HTML_FOOT = """</body>
+</html>
+"""
 
 
 def get_other_characters(page_id, main_char_code):
@@ -22,149 +70,259 @@ def get_other_characters(page_id, main_char_code):
     return chars
 
 
-def load_character(char_code):
-    """Load character data from the YAML file."""
-    char_file = Path('characters') / f'{char_code}-*.yaml'
-    matches = list(Path('characters').glob(f'{char_code}-*.yaml'))
-
-    if not matches:
-        print(f"Error: No character file found for code '{char_code}'")
-        sys.exit(1)
-
-    with open(matches[0], 'r') as f:
-        return yaml.safe_load(f)
-
-
-def load_page(page_filename):
-    """Load page data from the YAML file."""
-    page_path = Path('pages') / page_filename
-
-    if not page_path.exists():
-        print(f"Warning: Page file not found: {page_filename}")
-        return None
-
-    with open(page_path, 'r') as f:
-        return yaml.safe_load(f)
-
-
-def show_page(page_filename, char_code, level=3):
-    """Display a single page with the specified heading level."""
-    page_data = load_page(page_filename)
-    if not page_data:
-        return None
-
-    # Extract page ID (filename without .yaml)
-    page_id = page_filename.replace('.yaml', '')
-
-    # Check if this is a joint page
-    other_chars = get_other_characters(page_id, char_code)
-    joint_note = f" (joint with {', '.join(other_chars).upper()})" if other_chars else ""
-
-    # Determine heading symbols based on level
-    page_heading = '#' * level
-    content_heading = '#' * (level + 1)
-
-    # Display page information
-    print(f"{page_heading} Page {page_filename}{joint_note}\n")
-
-    # Description
-    description = page_data.get('description', 'No description available')
-    print(f"{content_heading} Description\n")
-    print(f"{description}\n")
-
-    # Visual
-    visual = page_data.get('visual', 'No visual description available')
-    print(f"{content_heading} Visual\n")
-    if isinstance(visual, str):
-        print(f"{visual.strip()}\n")
-    else:
-        print(f"{visual}\n")
-
-    # Text
-    text = page_data.get('text', 'No text available')
-    print(f"{content_heading} Text\n")
-    if isinstance(text, str):
-        print(f"{text.strip()}\n")
-    else:
-        print(f"{text}\n")
-
-    return other_chars
-
-
-def get_surrounding_pages(page_filename, other_char_code):
-    """Get the preceding and succeeding pages from another character's story."""
-    other_char_data = load_character(other_char_code)
-    other_pages = other_char_data.get('story', [])
-
-    try:
-        idx = other_pages.index(page_filename)
-        preceding = other_pages[idx - 1] if idx > 0 else None
-        succeeding = other_pages[idx + 1] if idx < len(other_pages) - 1 else None
-        return preceding, succeeding
-    except ValueError:
-        # Page not found in other character's story
-        return None, None
-
-
-def show_story(char_code):
-    """Display the full story for a character."""
-    # Load character data
-    char_data = load_character(char_code)
-    char_name = char_data['attributes']['name']
-    pages = char_data.get('story', [])
-
-    print(f"# {char_name}'s Story\n")
-    print(f"## Story\n")
-
-    # Track overlapping pages
-    overlaps = []
-
-    for page_filename in pages:
-        other_chars = show_page(page_filename, char_code, level=3)
-        if other_chars:
-            overlaps.append((page_filename, other_chars))
-
-    # Show overlaps section
-    if overlaps:
-        print(f"## Overlaps\n")
-        for page_filename, other_chars in overlaps:
+def field_text(page_data, field, default):
+    """Return a page field as stripped text."""
+    value = page_data.get(field, default)
+    if isinstance(value, str):
+        return value.strip()
+    return f"{value}"
+
+
+class StoryRenderer:
+    """Renders character stories from a loaded project, memoizing page fragments."""
+
+    def __init__(self, project, fmt="markdown"):
+        self.project = project
+        self.fmt = fmt
+        # (page filename, level) -> rendered page body, shared by every viewer
+        self._bodies = {}
+        self._warned = set()
+
+    def _page_data(self, page_filename):
+        page_data = self.project.page(page_filename)
+        if page_data is None and page_filename not in self._warned:
+            print(f"Warning: Page file not found: {page_filename}", file=sys.stderr)
+            self._warned.add(page_filename)
+        return page_data
+
+    def _body(self, page_filename, level):
+        """Render the description/visual/text of a page once per heading level."""
+        key = (page_filename, level)
+        if key not in self._bodies:
+            page_data = self.project.page(page_filename)
+            description = field_text(page_data, 'description', 'No description available')
+            visual = field_text(page_data, 'visual', 'No visual description available')
+            text = field_text(page_data, 'text', 'No text available')
+
+            if self.fmt == "json":
+                body = {'description': description, 'visual': visual, 'text': text}
+            elif self.fmt == "html":
+                h = f"h{min(level + 1, 6)}"
+                body = "".join(
+                    f"<{h}>{label}</{h}>\n<p>{html.escape(value)}</p>\n"
+                    for label, value in (("Description", description), ("Visual", visual), ("Text", text))
+                )
+            else:
+                content_heading = '#' * (level + 1)
+                body = (
+                    f"{content_heading} Description\n\n{description}\n\n"
+                    f"{content_heading} Visual\n\n{visual}\n\n"
+                    f"{content_heading} Text\n\n{text}\n\n"
+                )
+            self._bodies[key] = body
+        return self._bodies[key]
+
+    def _page(self, page_filename, char_code, level):
+        """Render a page heading for one viewer plus its memoized body."""
+        other_chars = get_other_characters(page_id(page_filename), char_code)
+        joint_note = f" (joint with {', '.join(other_chars).upper()})" if other_chars else ""
+
+        if self.fmt == "html":
+            h = f"h{min(level, 6)}"
+            return (
+                f'<section class="page">\n<{h}>Page {html.escape(page_filename)}{html.escape(joint_note)}</{h}>\n'
+                f"{self._body(page_filename, level)}</section>\n"
+            )
+        return f"{'#' * level} Page {page_filename}{joint_note}\n\n{self._body(page_filename, level)}"
+
+    def _heading(self, level, title):
+        if self.fmt == "html":
+            return f"<h{level}>{html.escape(title)}</h{level}>\n"
+        return f"{'#' * level} {title}\n\n"
+
+    def _overlaps(self, char_code):
+        """Return [(page filename, [other codes])] for a character's joint pages."""
+        overlaps = []
+        for page_filename in self.project.story(char_code):
+            if self._page_data(page_filename) is None:
+                continue
+            other_chars = get_other_characters(page_id(page_filename), char_code)
+            if other_chars:
+                overlaps.append((page_filename, other_chars))
+        return overlaps
+
+    def render(self, char_code) -> Iterator[str]:
+        """Yield a character's story as chunks of text."""
+        if self.fmt == "json":
+            yield json.dumps(self.story_dict(char_code))
+            return
+
+        char_name = self.project.character_name(char_code)
+        if self.fmt == "html":
+            yield f'<article id="{html.escape(char_code)}">\n'
+
+        yield self._heading(1, f"{char_name}'s Story")
+        yield self._heading(2, "Story")
+
+        for page_filename in self.project.story(char_code):
+            if self._page_data(page_filename) is not None:
+                yield self._page(page_filename, char_code, 3)
+
+        overlaps = self._overlaps(char_code)
+        if overlaps:
+            yield self._heading(2, "Overlaps")
+            for page_filename, other_chars in overlaps:
+                for other_char_code in other_chars:
+                    # Get surrounding pages from the other character's story
+                    preceding, succeeding = self.project.neighbours(other_char_code, page_filename)
+                    other_char_name = self.project.character_name(other_char_code)
+
+                    yield self._heading(3, f"Overlap with {other_char_name} ({other_char_code.upper()})")
+
+                    if preceding and self._page_data(preceding) is not None:
+                        yield self._heading(4, f"Before (from {other_char_name}'s story)")
+                        yield self._page(preceding, other_char_code, 5)
+
+                    yield self._heading(4, "Overlap page")
+                    yield self._page(page_filename, char_code, 5)
+
+                    if succeeding and self._page_data(succeeding) is not None:
+                        yield self._heading(4, f"After (from {other_char_name}'s story)")
+                        yield self._page(succeeding, other_char_code, 5)
+
+        if self.fmt == "html":
+            yield "</article>\n"
+
+    def _page_dict(self, page_filename, char_code):
+        if page_filename is None or self._page_data(page_filename) is None:
+            return None
+        page = {
+            'page': page_filename,
+            'joint_with': get_other_characters(page_id(page_filename), char_code),
+        }
+        page.update(self._body(page_filename, 3))
+        return page
+
+    def story_dict(self, char_code):
+        """Return a character's story as a JSON-serializable dict."""
+        pages = [
+            self._page_dict(page_filename, char_code)
+            for page_filename in self.project.story(char_code)
+        ]
+        overlaps = []
+        for page_filename, other_chars in self._overlaps(char_code):
             for other_char_code in other_chars:
-                # Get surrounding pages from the other character's story
-                preceding, succeeding = get_surrounding_pages(page_filename, other_char_code)
-
-                other_char_data = load_character(other_char_code)
-                other_char_name = other_char_data['attributes']['name']
-
-                print(f"### Overlap with {other_char_name} ({other_char_code.upper()})\n")
-
-                # Show preceding page
-                if preceding:
-                    print(f"#### Before (from {other_char_name}'s story)\n")
-                    show_page(preceding, other_char_code, level=5)
-
-                # Show the overlap page
-                print(f"#### Overlap page\n")
-                show_page(page_filename, char_code, level=5)
-
-                # Show succeeding page
-                if succeeding:
-                    print(f"#### After (from {other_char_name}'s story)\n")
-                    show_page(succeeding, other_char_code, level=5)
+                preceding, succeeding = self.project.neighbours(other_char_code, page_filename)
+                overlaps.append({
+                    'page': page_filename,
+                    'with': other_char_code,
+                    'with_name': self.project.character_name(other_char_code),
+                    'before': self._page_dict(preceding, other_char_code),
+                    'after': self._page_dict(succeeding, other_char_code),
+                })
+        return {
+            'character': char_code,
+            'name': self.project.character_name(char_code),
+            'pages': [page for page in pages if page is not None],
+            'overlaps': overlaps,
+        }
+
+
+def write_stories(renderer, char_codes: List[str], output_dir: Optional[str] = None):
+    """Stream every story to stdout, or to one file per character."""
+    fmt = renderer.fmt
+
+    if output_dir:
+        out_dir = Path(output_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for char_code in char_codes:
+            out_path = out_dir / f"{char_code}-story{FORMATS[fmt]}"
+            with open(out_path, 'w') as out:
+                if fmt == "html":
+                    out.write(HTML_HEAD.format(title=html.escape(f"{renderer.project.character_name(char_code)}'s Story")))
+                for chunk in renderer.render(char_code):
+                    out.write(chunk)
+                out.write(HTML_FOOT if fmt == "html" else "\n" if fmt == "json" else "")
+            print(f"✓ {out_path}", file=sys.stderr)
+        return
+
+    out = sys.stdout
+    if fmt == "html":
+        out.write(HTML_HEAD.format(title="Stories"))
+    for char_code in char_codes:
+        for chunk in renderer.render(char_code):
+            out.write(chunk)
+        if fmt == "json":
+            out.write("\n")
+    if fmt == "html":
+        out.write(HTML_FOOT)
+
+
+def show_story(char_code, project=None):
+    """Display the full story for a character."""
+    project = project or load_project()
+    write_stories(StoryRenderer(project), [char_code])
 
 
 def main():
-    if len(sys.argv) != 2:
+    parser = argparse.ArgumentParser(
+        description="Show the full story for one or more characters",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/show_story.py cu
+    python3 scripts/show_story.py cu ha --format json
+    python3 scripts/show_story.py --all --format html --output-dir out-stories
+        """
+    )
+    parser.add_argument(
+        "char_codes",
+        nargs="*",
+        help="Two-letter character code(s) (e.g., cu, em, ha)"
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Render every character's story"
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS.keys(),
+        default="markdown",
+        help="Output format (default: markdown)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        help="Write one file per character to this directory instead of stdout"
+    )
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.enable("show_story", args)
+
+    if not args.char_codes and not args.all:
         print("Usage: python show_story.py <character-code>")
         print("Example: python show_story.py cu")
         sys.exit(1)
 
-    char_code = sys.argv[1].lower()
+    char_codes = [code.lower() for code in args.char_codes]
+    for char_code in char_codes:
+        if len(char_code) != 2:
+            print("Error: Character code must be exactly 2 characters")
+            sys.exit(1)
 
-    if len(char_code) != 2:
-        print("Error: Character code must be exactly 2 characters")
-        sys.exit(1)
+    with profiling.stage("load project"):
+        project = load_project()
+    if args.all:
+        char_codes = project.codes()
+
+    for char_code in char_codes:
+        if char_code not in project.characters:
+            print(f"Error: No character file found for code '{char_code}'")
+            sys.exit(1)
 
-    show_story(char_code)
+    with profiling.stage("render"):
+        write_stories(StoryRenderer(project, args.format), char_codes, args.output_dir)
 
 
 if __name__ == '__main__':
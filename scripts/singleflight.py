@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Cross-process single-flight locks for page generation.
+
+Two people, or two gen_all_images.py runs for characters who share a page,
+can ask for the same image at the same moment. That pays for it twice and
+races on out-images/<page-id>-<backend>.jpg. Before calling the API,
+gen_image.py takes a lock named after the output file. A second requester
+waits for the lock instead of sending its own request. When the lock is
+released, the waiter checks whether the holder produced exactly what it was
+about to ask for, and reuses that image if so.
+
+A lock is a file in out-images/.locks/. Its owner record (the holder's pid,
+host and start time) is written to a temporary file and hard-linked into
+place, so only one process can create the lock and it never exists without
+its contents. The holder touches it every HEARTBEAT seconds. A lock is
+stale, and is broken, when its holder's pid no longer exists on this host,
+or when it hasn't been touched for STALE_AFTER seconds (a crashed run, or a
+holder on another machine). A lock file that can't be read is stale once it
+is that old. This works on local and network filesystems and on Windows,
+where fcntl locks are unavailable or unreliable.
+
+Usage:
+    python3 scripts/singleflight.py            # list held locks
+    python3 scripts/singleflight.py --break-stale
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Optional
+
+LOCK_DIR = Path('out-images') / '.locks'
+
+# How often a holder touches its lock, and how long without a touch makes it stale
+HEARTBEAT = 10
+STALE_AFTER = 120
+POLL_INTERVAL = 0.5
+
+
+class Lock:
+    """A held (or waited-for) lock on one output."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = LOCK_DIR / f"{name}.lock"
+        self.token = uuid.uuid4().hex
+        # When this process started waiting for another holder, or None
+        self.waited_since: Optional[float] = None
+        self.broke: Optional[dict] = None
+
+    def _owner(self) -> dict:
+        return {'token': self.token, 'pid': os.getpid(), 'host': socket.gethostname(), 'started_at': time.time()}
+
+    def try_acquire(self) -> bool:
+        """Create the lock file if nobody holds it. Returns True if we now hold it."""
+        LOCK_DIR.mkdir(parents=True, exist_ok=True)
+        # Write the owner record first and link it into place, so the lock
+        # never exists without its contents (a crash can't leave it empty)
+        tmp_path = self.path.with_name(f"{self.path.name}.{self.token}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._owner(), f)
+        try:
+            os.link(tmp_path, self.path)
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+        return True
+
+    def held(self) -> bool:
+        """Return True if the lock file is still ours."""
+        holder = read_holder(self.path)
+        return holder is not None and holder.get('token') == self.token
+
+    def heartbeat(self):
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            pass
+
+    def release(self):
+        # Only remove our own lock; a broken-and-retaken lock belongs to someone else
+        if self.held():
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def read_holder(path: Path) -> Optional[dict]:
+    """Return a lock file's owner record, or None if it's gone or unreadable."""
+    try:
+        with open(path, 'r') as f:
+            holder = json.load(f)
+        holder['touched_at'] = os.stat(path).st_mtime
+        return holder
+    except (OSError, ValueError):
+        return None
+
+
+def pid_alive(pid: int) -> bool:
+    if os.name != 'posix':
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+
+def unreadable_stale_reason(path: Path) -> Optional[str]:
+    """
+    Return why a lock file with no readable owner record is stale, or None.
+    Locks written by older versions could be left empty by a crash.
+    """
+    try:
+        idle = time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+    if idle > STALE_AFTER:
+        return f"unreadable and untouched for {idle:.0f} s"
+    return None
+
+
+def stale_reason(holder: dict) -> Optional[str]:
+    """Return why a lock is stale, or None if its holder looks alive."""
+    if holder.get('host') == socket.gethostname() and not pid_alive(holder.get('pid', 0)):
+        return f"pid {holder.get('pid')} is gone"
+    idle = time.time() - holder['touched_at']
+    if idle > STALE_AFTER:
+        return f"no heartbeat for {idle:.0f} s"
+    return None
+
+
+def break_lock(path: Path, holder: dict) -> bool:
+    """
+    Remove a stale lock, but only if it still belongs to the holder we judged
+    stale. Returns True if it was removed.
+    """
+    # Renaming is atomic, so only one process can take the file away. If it
+    # turns out to be a fresh lock someone took in the meantime, put it back.
+    aside = path.with_name(f"{path.name}.breaking-{uuid.uuid4().hex}")
+    try:
+        os.rename(path, aside)
+    except FileNotFoundError:
+        return False
+    taken = read_holder(aside)
+    if taken is None or taken.get('token') == holder.get('token'):
+        os.unlink(aside)
+        return True
+    try:
+        os.link(aside, path)
+    except OSError:
+        pass
+    os.unlink(aside)
+    return False
+
+
+async def _heartbeat(lock: Lock):
+    while True:
+        await asyncio.sleep(HEARTBEAT)
+        lock.heartbeat()
+
+
+@asynccontextmanager
+async def single_flight(name: str, log=print):
+    """
+    Hold the lock for an output for the duration of the block, waiting (and
+    breaking stale locks) as needed. lock.waited_since is set if another
+    process held it first, so the caller can look for that process's result.
+    """
+    lock = Lock(name)
+    while not lock.try_acquire():
+        holder = read_holder(lock.path)
+        if holder is None:
+            # Released between our attempt and the read, or an unreadable lock
+            reason = unreadable_stale_reason(lock.path)
+            if reason and break_lock(lock.path, {}):
+                log(f"Broke stale lock on {name} ({reason})")
+            elif lock.path.exists():
+                await asyncio.sleep(POLL_INTERVAL)
+            continue
+        reason = stale_reason(holder)
+        if reason:
+            if break_lock(lock.path, holder):
+                log(f"Broke stale lock on {name} held by pid {holder.get('pid')} on {holder.get('host')} ({reason})")
+                lock.broke = holder
+            continue
+        if lock.waited_since is None:
+            lock.waited_since = time.time()
+            log(f"{name} is being generated by pid {holder.get('pid')} on {holder.get('host')}; waiting for it...")
+        await asyncio.sleep(POLL_INTERVAL)
+
+    beat = asyncio.ensure_future(_heartbeat(lock))
+    try:
+        yield lock
+    finally:
+        beat.cancel()
+        lock.release()
+
+
+def held_locks() -> List[dict]:
+    """Return every lock file's holder, with its path and whether it's stale."""
+    locks = []
+    for path in sorted(LOCK_DIR.glob('*.lock')) if LOCK_DIR.exists() else []:
+        holder = read_holder(path)
+        if holder is not None:
+            locks.append(dict(holder, path=path, stale=stale_reason(holder)))
+        elif path.exists():
+            try:
+                touched_at = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            locks.append({'pid': '?', 'host': '?', 'started_at': touched_at, 'touched_at': touched_at,
+                          'path': path, 'stale': unreadable_stale_reason(path)})
+    return locks
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="List page generation locks and break stale ones",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/singleflight.py
+    python3 scripts/singleflight.py --break-stale
+        """
+    )
+    parser.add_argument("--break-stale", action="store_true", help="Remove locks whose holder is gone")
+    args = parser.parse_args()
+
+    locks = held_locks()
+    if not locks:
+        print("No locks held")
+        return 0
+    for holder in locks:
+        age = time.time() - holder['started_at']
+        status = f"⚠️  stale: {holder['stale']}" if holder['stale'] else "✓ active"
+        print(f"  {holder['path'].name[:-len('.lock')]:28} pid {holder['pid']} on {holder['host']}, "
+              f"{age:.0f} s  {status}")
+        if args.break_stale and holder['stale'] and break_lock(holder['path'], holder):
+            print(f"    removed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
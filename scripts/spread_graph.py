@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check that shared pages sit at the same spread in every participant's book.
+
+The check builds a participation graph once from every character's story:
+nodes are pages and characters, and each edge records the position at which a
+character's story lists a page. A page is shared when more than one character
+lists it or when its ID names more than one character code. For every shared
+page it verifies that:
+- Every participant lists it at the same position
+- That position matches the page's own `spread` field
+- The characters listing it are exactly the participants its ID implies
+- No story lists it more than once
+
+Building the graph and checking it are both linear in the total number of
+story entries, so the check scales to classrooms with dozens of characters.
+
+Usage:
+    python3 scripts/spread_graph.py
+
+Exit codes:
+- 0: All shared pages are synchronized
+- 1: One or more shared pages are out of sync
+"""
+
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from project import codes_in_page_id, load_project, page_id
+
+
+class SpreadGraph:
+    """Participation graph between characters and the pages in their stories."""
+
+    def __init__(self, stories: Dict[str, List[str]], spreads: Dict[str, Optional[int]]):
+        # page filename -> [(character code, 1-based position)]
+        self.edges = defaultdict(list)
+        for code, story in stories.items():
+            for position, page in enumerate(story, start=1):
+                self.edges[page].append((code, position))
+        self.codes = set(stories)
+        self.spreads = spreads
+
+    def participants(self, page: str) -> List[str]:
+        """Return every character that lists a page or is named in its ID."""
+        listed = [code for code, _ in self.edges.get(page, [])]
+        implied = codes_in_page_id(page_id(page))
+        return sorted(set(listed) | set(implied))
+
+    def is_shared(self, page: str) -> bool:
+        """Return True if more than one character takes part in a page."""
+        return len(self.participants(page)) > 1
+
+    def shared_pages(self) -> List[str]:
+        """Return every shared page referenced by at least one story."""
+        return sorted(page for page in self.edges if self.is_shared(page))
+
+    def check(self) -> List[str]:
+        """Return every synchronization error across all shared pages."""
+        errors = []
+        for page in self.shared_pages():
+            edges = self.edges[page]
+            listed = defaultdict(list)
+            for code, position in edges:
+                listed[code].append(position)
+
+            for code, positions in sorted(listed.items()):
+                if len(positions) > 1:
+                    errors.append(f"{page}: listed {len(positions)} times in {code}'s story (positions {positions})")
+
+            positions = sorted({position for _, position in edges})
+            if len(positions) > 1:
+                where = ", ".join(f"{code} at {position}" for code, position in sorted(edges))
+                errors.append(f"{page}: participants list it at different spreads ({where})")
+
+            spread = self.spreads.get(page)
+            if spread is not None and positions and positions != [spread]:
+                errors.append(f"{page}: 'spread' is {spread} but participants list it at {positions}")
+
+            implied = codes_in_page_id(page_id(page))
+            for code in implied:
+                if code not in self.codes:
+                    errors.append(f"{page}: ID implies participant '{code}' but there is no character with that code")
+                elif code not in listed:
+                    errors.append(f"{page}: ID implies participant '{code}' but {code}'s story does not list it")
+            for code in sorted(listed):
+                if code not in implied:
+                    errors.append(f"{page}: listed in {code}'s story but '{code}' is not in the page ID")
+        return errors
+
+
+def build_spread_graph(characters, load_page) -> SpreadGraph:
+    """
+    Build the graph from {code: {'data': {...}}} character records.
+
+    load_page(page_filename) returns the page's data or None. It is only
+    called for shared pages, to read their `spread` field.
+    """
+    stories = {
+        code: list(char_info['data'].get('story') or [])
+        for code, char_info in characters.items()
+    }
+    graph = SpreadGraph(stories, {})
+    for page in graph.shared_pages():
+        page_data = load_page(page)
+        spread = page_data.get('spread') if isinstance(page_data, dict) else None
+        if isinstance(spread, int) and not isinstance(spread, bool):
+            graph.spreads[page] = spread
+    return graph
+
+
+def main():
+    """Check every shared page in the project."""
+    project = load_project()
+    graph = build_spread_graph(project.characters, project.page)
+    errors = graph.check()
+
+    shared = graph.shared_pages()
+    print(f"{len(project.characters)} character(s), {len(graph.edges)} page(s), {len(shared)} shared")
+    for error in errors:
+        print(f"✗ {error}")
+
+    if errors:
+        print(f"\n{len(errors)} synchronization error(s) found")
+        return 1
+
+    print("✓ All shared pages are at the same spread in every participant's book")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
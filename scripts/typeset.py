@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Typeset story text onto text-free artwork locally.
+
+By default gen_image.py asks the model to paint a page's `text` into the
+illustration, so every wording change needs a new, slow, paid request, and
+the lettering may still come out garbled. With `typeset_text: true` in
+book.yaml, the model is asked for artwork with no lettering and a calm area
+on one side of the gutter instead. gen_image.py stores that artwork as
+out-images/<page-id>-<backend>-art.jpg, and this module sets the text into
+the calm area with Pillow to produce the usual out-images/<page-id>-<backend>.jpg.
+
+The text goes at the top of the left page unless the page sets
+`text_side: right`, and never crosses the gutter. It sits on a soft
+translucent panel so it stays legible over any artwork. The font is the
+first .ttf/.otf in fonts/, else DejaVu Serif, else Pillow's built-in font.
+
+Typesetting takes a fraction of a second per page and needs no API call,
+so after editing text, re-run this script to update the book from the
+cached art. Each typeset image records a hash of its art, text, side and
+layout; pages where none of them changed are skipped.
+
+Usage:
+    python3 scripts/typeset.py <character-code|page-id> [...] [--workers N] [--force]
+
+Examples:
+    python3 scripts/typeset.py cu
+    python3 scripts/typeset.py cu-01 cu-ha-02 --force
+    python3 scripts/typeset.py cu em ha --workers 8
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import artifacts
+from project import load_project
+
+# Bump when the layout changes so every page is typeset again
+LAYOUT_VERSION = 1
+
+FONT_DIR = Path('fonts')
+SYSTEM_FONTS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf',
+    '/usr/share/fonts/truetype/DejaVuSerif.ttf',
+    '/Library/Fonts/Georgia.ttf',
+    'C:/Windows/Fonts/georgia.ttf',
+]
+
+# Layout, as fractions of one page (half the spread) or of the spread height.
+# On the 3579x2406 photobook canvas the font is 67 px, 16 pt at 300 dpi.
+OUTER_MARGIN = 0.10      # of the page width, from the outside edge
+GUTTER_MARGIN = 0.18     # of the page width, kept clear either side of the gutter
+TOP_MARGIN = 0.08        # of the spread height
+MAX_HEIGHT = 0.40        # of the spread height
+FONT_SIZE = 0.028        # of the spread height
+MIN_FONT_SCALE = 0.6     # shrink long text down to this before giving up
+LINE_SPACING = 1.35
+PANEL_PADDING = 0.6      # of the font size
+PANEL_COLOUR = (255, 252, 242, 190)
+TEXT_COLOUR = (40, 32, 24)
+
+SIDES = ('left', 'right')
+
+
+def art_path(page_id: str, backend: str = 'openai') -> Path:
+    """Return where gen_image.py keeps a page's text-free artwork."""
+    return artifacts.OUT_DIR / f"{page_id}-{backend}-art.jpg"
+
+
+def output_path(page_id: str, backend: str = 'openai') -> Path:
+    return artifacts.OUT_DIR / f"{page_id}-{backend}.jpg"
+
+
+def find_font() -> Optional[str]:
+    """Return the font file to typeset with, or None for Pillow's built-in font."""
+    if FONT_DIR.is_dir():
+        for pattern in ('*.ttf', '*.otf'):
+            fonts = sorted(FONT_DIR.glob(pattern))
+            if fonts:
+                return str(fonts[0])
+    for path in SYSTEM_FONTS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_font(size: int, font_path: Optional[str] = None):
+    """Load a font at size px; without font_path, Pillow's built-in font."""
+    from PIL import ImageFont
+
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single fixed-size default font
+        return ImageFont.load_default()
+
+
+def _wrap(text: str, font, width: float, draw) -> List[str]:
+    """Greedy word wrap; blank lines in the text start new paragraphs."""
+    lines = []
+    for paragraph in text.strip().split("\n\n"):
+        if lines:
+            lines.append("")
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}".strip()
+            if line and draw.textlength(candidate, font=font) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        if line:
+            lines.append(line)
+    return lines
+
+
+def typeset(art, text: str, side: str = 'left', font_path: Optional[str] = None):
+    """Return a copy of the artwork with the text set on one side of the gutter."""
+    from PIL import Image, ImageDraw
+
+    if side not in SIDES:
+        raise ValueError(f"text_side must be one of {', '.join(SIDES)}, not '{side}'")
+    width, height = art.size
+    page_w = width / 2
+    if side == 'left':
+        box_left = page_w * OUTER_MARGIN
+        box_right = page_w * (1 - GUTTER_MARGIN)
+    else:
+        box_left = page_w + page_w * GUTTER_MARGIN
+        box_right = width - page_w * OUTER_MARGIN
+    box_width = box_right - box_left
+    max_height = height * MAX_HEIGHT
+
+    measure = ImageDraw.Draw(art)
+    size = height * FONT_SIZE
+    while True:
+        font = load_font(max(1, round(size)), font_path)
+        padding = size * PANEL_PADDING
+        lines = _wrap(text, font, box_width - 2 * padding, measure)
+        line_height = size * LINE_SPACING
+        text_height = line_height * len(lines)
+        if text_height + 2 * padding <= max_height or size <= height * FONT_SIZE * MIN_FONT_SCALE:
+            break
+        size *= 0.9
+
+    text_width = max((measure.textlength(line, font=font) for line in lines), default=0)
+    panel_width = text_width + 2 * padding
+    # Keep the panel against the outside edge, away from the gutter
+    panel_left = box_left if side == 'left' else box_right - panel_width
+    panel_top = height * TOP_MARGIN
+    panel = (panel_left, panel_top, panel_left + panel_width, panel_top + text_height + 2 * padding)
+
+    page = art.convert('RGBA')
+    overlay = Image.new('RGBA', page.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    draw.rounded_rectangle(panel, radius=padding, fill=PANEL_COLOUR)
+    for n, line in enumerate(lines):
+        draw.text((panel_left + padding, panel_top + padding + n * line_height), line,
+                  font=font, fill=TEXT_COLOUR + (255,))
+    return Image.alpha_composite(page, overlay).convert('RGB')
+
+
+def typeset_key(art_sha: str, text: str, side: str, font_path: Optional[str]) -> str:
+    """Hash of everything that determines a typeset page."""
+    font = Path(font_path).name if font_path else 'default'
+    return hashlib.sha256(f"{LAYOUT_VERSION}|{art_sha}|{side}|{font}|{text}".encode('utf-8')).hexdigest()
+
+
+def typeset_page(page_id: str, page_data: dict, backend: str = 'openai', force: bool = False) -> str:
+    """
+    Typeset a page from its stored artwork. Returns 'typeset' or 'unchanged'.
+    Raises ValueError if the page has no text-free artwork yet.
+    """
+    from PIL import Image
+
+    art = art_path(page_id, backend)
+    art_sha = artifacts.load_index(art)['selected']
+    if not art.exists() or not art_sha:
+        raise ValueError(f"No text-free artwork for {page_id} ({art}); generate it with typeset_text: true")
+
+    text = (page_data.get('text') or '').strip()
+    side = page_data.get('text_side') or 'left'
+    font_path = find_font()
+    key = typeset_key(art_sha, text, side, font_path)
+    canonical = output_path(page_id, backend)
+    if not force and canonical.exists() and artifacts.selected_metadata(canonical).get('typeset_key') == key:
+        return 'unchanged'
+
+    metadata = dict(artifacts.selected_metadata(art), typeset_key=key, art_sha=art_sha, text_side=side)
+    with Image.open(art) as img:
+        img = img.convert('RGB')
+        page = typeset(img, text, side, font_path) if text else img
+    artifacts.save_image(page, canonical, metadata, quality=95)
+    return 'typeset'
+
+
+def _typeset_job(job: tuple) -> tuple:
+    """Worker process: typeset one page. Returns (page id, status or error, ok)."""
+    page_id, page_data, force = job
+    try:
+        return page_id, typeset_page(page_id, page_data, force=force), True
+    except Exception as e:
+        return page_id, str(e), False
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Typeset story text onto cached text-free artwork",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/typeset.py cu
+    python3 scripts/typeset.py cu-01 cu-ha-02 --force
+    python3 scripts/typeset.py cu em ha --workers 8
+        """
+    )
+    parser.add_argument("targets", nargs="+", help="Character codes (whole story) or page IDs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Pages to typeset in parallel (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Typeset pages even if nothing changed")
+    args = parser.parse_args()
+
+    project = load_project()
+    filenames = []
+    for target in args.targets:
+        if target in project.characters:
+            filenames.extend(project.story(target))
+        elif project.page(f"{target}.yaml") is not None:
+            filenames.append(f"{target}.yaml")
+        else:
+            print(f"Error: Not a character code or page ID: {target}")
+            return 1
+    filenames = [name for name in dict.fromkeys(filenames) if project.page(name) is not None]
+
+    jobs = [(Path(name).stem, project.page(name), args.force) for name in filenames]
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for page_id, status, ok in pool.map(_typeset_job, jobs):
+            if ok:
+                print(f"✓ {page_id}: {status}")
+            else:
+                failed += 1
+                print(f"✗ {page_id}: {status}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
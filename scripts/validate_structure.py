@@ -2,6 +2,10 @@
 """
 Validation script to check structural integrity of the repository.
 
+Usage:
+    python3 scripts/validate_structure.py [--changed [REV]] [--format FORMAT]
+                                          [--output PATH]
+
 Checks:
 - Pages are well formatted
 - All referenced pages exist
@@ -11,16 +15,44 @@ Checks:
 - No missing/stray pages in the pages directory
 - At least one character exists
 - All YAML files are valid
+- Book, character and page documents match their template schemas
+  (required fields, types, ids matching filenames, spreads matching story
+  positions; see scripts/schemas.py)
+- Shared pages sit at the same spread in every participant's book, and are
+  listed by exactly the characters their ID names (see scripts/spread_graph.py)
+
+Each check records its messages and wall-clock time, and the results are
+printed in a fixed order once all of them have finished. The checks that
+need the spread graph share one copy of it.
+
+Options:
+    --changed [REV] Only re-check files changed since the last successful run
+                    (tracked in .katha-cache/validate-state.json), or since the
+                    given git revision (e.g. --changed HEAD~1)
+    --format F      Output format: text (default), json or junit
+    --output PATH   Write the report to PATH instead of stdout
+    --profile [DIR] Write cProfile stats and per-check timings (see
+                    scripts/profiling.py)
 
 Exit codes:
 - 0: All tests passed
 - 1: One or more tests failed
 """
 
+import argparse
+import json
+import subprocess
 import sys
-import yaml
+import time
+import xml.etree.ElementTree as ET
 from pathlib import Path
 from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+import profiling
+from project import load_characters, load_yaml
+from schemas import validate_documents
+from spread_graph import build_spread_graph
 
 # ANSI color codes
 RED = '\033[91m'
@@ -28,6 +60,10 @@ GREEN = '\033[92m'
 YELLOW = '\033[93m'
 RESET = '\033[0m'
 
+# Remembers the files seen by the last successful run for --changed
+STATE_FILE = Path('.katha-cache') / 'validate-state.json'
+TRACKED_DIRS = ('characters', 'pages')
+
 def error(message):
     """Print error message in red."""
     print(f"{RED}✗ ERROR: {message}{RESET}")
@@ -45,136 +81,240 @@ def info(message):
     print(f"  {message}")
 
 
-def load_all_characters():
-    """Load all character files."""
+PRINTERS = {
+    'error': error,
+    'warning': warning,
+    'success': success,
+    'info': info,
+}
+
+
+class Report:
+    """Collects the messages emitted by a single check."""
+
+    def __init__(self):
+        self.messages = []
+
+    def error(self, message):
+        self.messages.append(('error', message))
+
+    def warning(self, message):
+        self.messages.append(('warning', message))
+
+    def success(self, message):
+        self.messages.append(('success', message))
+
+    def info(self, message):
+        self.messages.append(('info', message))
+
+
+def load_page(page):
+    """Load a page by filename, or return None if it is missing or invalid."""
+    try:
+        return load_yaml(Path('pages') / page)
+    except Exception:
+        return None
+
+
+def load_all_characters(report):
+    """Load all character files, or record why they can't be loaded and return None."""
     characters_dir = Path('characters')
     if not characters_dir.exists():
-        error("Characters directory not found")
-        sys.exit(1)
-
-    char_files = list(characters_dir.glob('*.yaml'))
-    # Filter out template files
-    char_files = [f for f in char_files if 'template' not in f.name and 'example' not in f.name]
-
-    if not char_files:
-        error("No character files found in characters directory")
-        sys.exit(1)
-
-    characters = {}
-    for char_file in char_files:
-        try:
-            with open(char_file, 'r') as f:
-                char_data = yaml.safe_load(f)
-                char_id = char_data.get('id')
-                if char_id:
-                    characters[char_id] = {
-                        'file': char_file,
-                        'data': char_data,
-                        'name': char_data.get('attributes', {}).get('name', 'Unknown')
-                    }
-        except Exception as e:
-            error(f"Failed to load character file {char_file}: {e}")
-            sys.exit(1)
+        report.error("Characters directory not found")
+        return None
+
+    errors = []
+    characters = load_characters(characters_dir, errors)
+    for char_file, e in errors:
+        report.error(f"Failed to load character file {char_file}: {e}")
+    if errors:
+        return None
+
+    if not characters:
+        report.error("No character files found in characters directory")
+        return None
 
     return characters
 
 
-def test_at_least_one_character(characters):
+def snapshot_files() -> Dict[str, List[int]]:
+    """Return {path: [mtime_ns, size]} for every tracked YAML file."""
+    snapshot = {}
+    for dirname in TRACKED_DIRS:
+        for path in Path(dirname).glob('*.yaml'):
+            stat = path.stat()
+            snapshot[path.as_posix()] = [stat.st_mtime_ns, stat.st_size]
+    return snapshot
+
+
+def changed_since_last_run(snapshot: Dict[str, List[int]]) -> Set[str]:
+    """Return the files added, modified or deleted since the last successful run."""
+    try:
+        with open(STATE_FILE, 'r') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        # No usable state: treat everything as changed
+        return set(snapshot)
+    changed = {path for path, stamp in snapshot.items() if previous.get(path) != stamp}
+    return changed | (set(previous) - set(snapshot))
+
+
+def changed_since_revision(revision: str, report) -> Optional[Set[str]]:
+    """
+    Return the files changed since a git revision, including untracked files,
+    or record the git error and return None.
+    """
+    commands = [
+        ['git', 'diff', '--name-only', revision, '--'],
+        ['git', 'ls-files', '--others', '--exclude-standard'],
+    ]
+    changed = set()
+    for command in commands:
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            report.error(f"Failed to list changes since '{revision}': {result.stderr.strip()}")
+            return None
+        changed.update(line for line in result.stdout.splitlines() if line)
+    return changed
+
+
+def save_state(snapshot: Dict[str, List[int]]):
+    """Record the files seen by a successful run."""
+    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(STATE_FILE, 'w') as f:
+        json.dump(snapshot, f)
+
+
+def characters_in_scope(characters, changed: Optional[Set[str]]):
+    """
+    Return the characters a check needs to look at.
+
+    With no change set this is every character. Otherwise it is the characters
+    whose own file changed or whose story references a changed page.
+    """
+    if changed is None:
+        return characters
+
+    changed_pages = {Path(p).name for p in changed if p.startswith('pages/')}
+    return {
+        char_id: char_info
+        for char_id, char_info in characters.items()
+        if Path(char_info['file']).as_posix() in changed
+        or changed_pages.intersection(char_info['data'].get('story', []))
+    }
+
+
+def test_at_least_one_character(characters, report, changed=None):
     """Test that at least one character exists."""
     if len(characters) == 0:
-        error("No characters found")
+        report.error("No characters found")
         return False
-    success(f"Found {len(characters)} character(s)")
+    report.success(f"Found {len(characters)} character(s)")
     return True
 
 
-def test_page_formatting(characters):
+def test_page_formatting(characters, report, changed=None):
     """Test that all page references are properly formatted."""
     errors_found = False
 
-    for char_id, char_info in characters.items():
+    for char_id, char_info in characters_in_scope(characters, changed).items():
         pages = char_info['data'].get('story', [])
         char_name = char_info['name']
 
         for page in pages:
             # Check for pages/ prefix
             if page.startswith('pages/'):
-                error(f"{char_name} ({char_id}): Page '{page}' includes 'pages/' prefix - should be just filename")
+                report.error(f"{char_name} ({char_id}): Page '{page}' includes 'pages/' prefix - should be just filename")
                 errors_found = True
 
             # Check for .yaml extension
             if not page.endswith('.yaml'):
-                error(f"{char_name} ({char_id}): Page '{page}' missing '.yaml' extension")
+                report.error(f"{char_name} ({char_id}): Page '{page}' missing '.yaml' extension")
                 errors_found = True
 
             # Check for path separators
             if '/' in page or '\\' in page:
-                error(f"{char_name} ({char_id}): Page '{page}' contains path separator - should be just filename")
+                report.error(f"{char_name} ({char_id}): Page '{page}' contains path separator - should be just filename")
                 errors_found = True
 
     if not errors_found:
-        success("All page references are properly formatted")
+        report.success("All page references are properly formatted")
     return not errors_found
 
 
-def test_pages_exist(characters):
+def test_pages_exist(characters, report, changed=None):
     """Test that all referenced pages exist."""
     errors_found = False
     pages_dir = Path('pages')
 
     if not pages_dir.exists():
-        error("Pages directory not found")
+        report.error("Pages directory not found")
         return False
 
-    for char_id, char_info in characters.items():
+    # Deleted pages show up in the change set, so the characters referencing
+    # them are always in scope here
+    for char_id, char_info in characters_in_scope(characters, changed).items():
         pages = char_info['data'].get('story', [])
         char_name = char_info['name']
 
         for page in pages:
             page_path = pages_dir / page
             if not page_path.exists():
-                error(f"{char_name} ({char_id}): Referenced page '{page}' does not exist")
+                report.error(f"{char_name} ({char_id}): Referenced page '{page}' does not exist")
                 errors_found = True
 
     if not errors_found:
-        success("All referenced pages exist")
+        report.success("All referenced pages exist")
     return not errors_found
 
 
-def test_no_overlaps_on_required_solo_spreads(characters):
+def test_no_overlaps_on_required_solo_spreads(characters, report, changed=None, graph=None):
     """Test that spreads 1, 11, and 12 have no overlaps (are character-specific)."""
     errors_found = False
     required_solo_positions = [1, 11, 12]
+    # Participants come from both the page ID and the stories that list it
+    if graph is None:
+        graph = build_spread_graph(characters, load_page)
 
-    for char_id, char_info in characters.items():
+    for char_id, char_info in characters_in_scope(characters, changed).items():
         pages = char_info['data'].get('story', [])
         char_name = char_info['name']
 
         for pos in required_solo_positions:
             if pos - 1 < len(pages):  # Check if this position exists
                 page = pages[pos - 1]
-                # Extract page ID (filename without .yaml)
-                page_id = page.replace('.yaml', '')
-
-                # Check if page contains multiple character codes
-                parts = page_id.split('-')
-                char_codes = [p for p in parts if len(p) == 2 and p.isalpha()]
+                char_codes = graph.participants(page)
 
                 if len(char_codes) > 1:
-                    error(f"{char_name} ({char_id}): Spread {pos} ('{page}') is a joint page with {char_codes} - spreads 1, 11, 12 must be character-specific")
+                    report.error(f"{char_name} ({char_id}): Spread {pos} ('{page}') is a joint page with {char_codes} - spreads 1, 11, 12 must be character-specific")
                     errors_found = True
 
     if not errors_found:
-        success("Spreads 1, 11, and 12 are all character-specific (no overlaps)")
+        report.success("Spreads 1, 11, and 12 are all character-specific (no overlaps)")
     return not errors_found
 
 
-def test_no_stray_pages(characters):
+def test_shared_spreads_synchronized(characters, report, changed=None, graph=None):
+    """Test that shared pages sit at the same spread in every participant's book."""
+    # Linear in the number of story entries, so it always runs over everything
+    if graph is None:
+        graph = build_spread_graph(characters, load_page)
+    errors = graph.check()
+
+    for message in errors:
+        report.error(message)
+
+    if not errors:
+        report.success(f"All {len(graph.shared_pages())} shared page(s) are at the same spread in every participant's book")
+    return not errors
+
+
+def test_no_stray_pages(characters, report, changed=None):
     """Test that all pages in the pages directory are referenced by at least one character."""
     pages_dir = Path('pages')
 
     if not pages_dir.exists():
-        error("Pages directory not found")
+        report.error("Pages directory not found")
         return False
 
     # Collect all referenced pages
@@ -190,26 +330,26 @@ def test_no_stray_pages(characters):
     stray_pages = all_page_files - referenced_pages
 
     if stray_pages:
-        error(f"Found {len(stray_pages)} stray page(s) not referenced by any character:")
+        report.error(f"Found {len(stray_pages)} stray page(s) not referenced by any character:")
         for page in sorted(stray_pages):
-            info(f"  - {page}")
+            report.info(f"  - {page}")
         return False
 
-    success("No stray pages found - all pages are referenced")
+    report.success("No stray pages found - all pages are referenced")
     return True
 
 
-def test_missing_pages(characters):
+def test_missing_pages(characters, report, changed=None):
     """Test for any missing pages in character stories (e.g., gaps in numbering)."""
     warnings_found = False
 
-    for char_id, char_info in characters.items():
+    for char_id, char_info in characters_in_scope(characters, changed).items():
         pages = char_info['data'].get('story', [])
         char_name = char_info['name']
 
         # Expected: 12 pages
         if len(pages) != 12:
-            warning(f"{char_name} ({char_id}): Has {len(pages)} pages, expected 12")
+            report.warning(f"{char_name} ({char_id}): Has {len(pages)} pages, expected 12")
             warnings_found = True
 
         # Check for sequential numbering (this is a soft check)
@@ -227,15 +367,15 @@ def test_missing_pages(characters):
         if page_numbers:
             expected = list(range(1, 13))
             if page_numbers != expected:
-                info(f"{char_name} ({char_id}): Page numbering is {page_numbers}")
+                report.info(f"{char_name} ({char_id}): Page numbering is {page_numbers}")
 
     if not warnings_found:
-        success("All characters have 12 pages")
+        report.success("All characters have 12 pages")
 
     return True  # Warnings don't fail the test
 
 
-def test_page_yaml_validity(characters):
+def test_page_yaml_validity(characters, report, changed=None):
     """Test that all page YAML files are valid."""
     errors_found = False
     pages_dir = Path('pages')
@@ -246,67 +386,258 @@ def test_page_yaml_validity(characters):
         pages = char_info['data'].get('story', [])
         all_pages.update(pages)
 
-    for page in all_pages:
+    # Only re-parse pages that changed, or that a changed character now references
+    if changed is not None:
+        in_scope = {Path(p).name for p in changed if p.startswith('pages/')}
+        for char_info in characters_in_scope(characters, changed).values():
+            if Path(char_info['file']).as_posix() in changed:
+                in_scope.update(char_info['data'].get('story', []))
+        all_pages &= in_scope
+
+    for page in sorted(all_pages):
         page_path = pages_dir / page
         if page_path.exists():
             try:
-                with open(page_path, 'r') as f:
-                    yaml.safe_load(f)
+                load_yaml(page_path)
             except Exception as e:
-                error(f"Page '{page}' is not valid YAML: {e}")
+                report.error(f"Page '{page}' is not valid YAML: {e}")
                 errors_found = True
 
     if not errors_found:
-        success("All page YAML files are valid")
+        report.success("All page YAML files are valid")
     return not errors_found
 
 
-def main():
-    """Run all tests."""
+def test_documents_match_schemas(characters, report, changed=None):
+    """Test that all documents match the schemas compiled from templates/."""
+    # Spreads are checked against every story, so a changed character can
+    # surface violations in pages it references
+    paths = None
+    if changed is not None:
+        paths = set(changed)
+        for char_info in characters_in_scope(characters, changed).values():
+            paths.add(Path(char_info['file']).as_posix())
+            paths.update(f"pages/{page}" for page in char_info['data'].get('story', []))
+
+    violations = validate_documents(paths)
+    for violation in violations:
+        report.error(str(violation))
+
+    if not violations:
+        report.success("All documents match their template schemas")
+    return not violations
+
+
+# (name, check) pairs in report order
+TESTS = [
+    ("At least one character exists", test_at_least_one_character),
+    ("Page formatting is correct", test_page_formatting),
+    ("All referenced pages exist", test_pages_exist),
+    ("Spreads 1, 11, 12 are character-specific", test_no_overlaps_on_required_solo_spreads),
+    ("Shared pages are spread-synchronized", test_shared_spreads_synchronized),
+    ("No stray pages in pages directory", test_no_stray_pages),
+    ("Page YAML files are valid", test_page_yaml_validity),
+    ("Documents match template schemas", test_documents_match_schemas),
+    ("Check for missing pages", test_missing_pages),
+]
+
+# Checks that take the shared spread graph
+SPREAD_GRAPH_CHECKS = {test_no_overlaps_on_required_solo_spreads, test_shared_spreads_synchronized}
+
+
+def check_result(test_name, passed, report, duration_ms):
+    """Return the result dict for one check."""
+    return {
+        'name': test_name,
+        'passed': passed,
+        'duration_ms': round(duration_ms, 3),
+        'messages': [{'level': level, 'message': message} for level, message in report.messages],
+    }
+
+
+def run_check(test_name, test_func, characters, changed, **kwargs):
+    """Run one check, returning its result dict."""
+    report = Report()
+    start = time.perf_counter()
+    try:
+        with profiling.stage(f"check: {test_func.__name__}"):
+            passed = bool(test_func(characters, report, changed, **kwargs))
+    except Exception as e:
+        report.error(f"Check crashed: {e}")
+        passed = False
+    return check_result(test_name, passed, report, (time.perf_counter() - start) * 1000)
+
+
+def run_checks(characters, changed=None):
+    """Run every check and return the results in report order."""
+    try:
+        with profiling.stage("build spread graph"):
+            graph = build_spread_graph(characters, load_page)
+    except Exception:
+        # Each spread check builds its own and reports the crash
+        graph = None
+
+    return [
+        run_check(test_name, test_func, characters, changed,
+                  **({'graph': graph} if test_func in SPREAD_GRAPH_CHECKS else {}))
+        for test_name, test_func in TESTS
+    ]
+
+
+def print_text_report(results, changed, duration_ms):
+    """Print the colour-coded report."""
     print("\n" + "="*80)
     print("REPOSITORY STRUCTURE VALIDATION")
     print("="*80 + "\n")
 
-    # Load all characters
-    try:
-        characters = load_all_characters()
-    except SystemExit:
-        return 1
-
-    # Run all tests
-    tests = [
-        ("At least one character exists", lambda: test_at_least_one_character(characters)),
-        ("Page formatting is correct", lambda: test_page_formatting(characters)),
-        ("All referenced pages exist", lambda: test_pages_exist(characters)),
-        ("Spreads 1, 11, 12 are character-specific", lambda: test_no_overlaps_on_required_solo_spreads(characters)),
-        ("No stray pages in pages directory", lambda: test_no_stray_pages(characters)),
-        ("Page YAML files are valid", lambda: test_page_yaml_validity(characters)),
-        ("Check for missing pages", lambda: test_missing_pages(characters)),
-    ]
+    if changed is not None:
+        info(f"Checking {len(changed)} changed file(s)")
 
-    results = []
-    for test_name, test_func in tests:
-        print(f"\nTesting: {test_name}")
+    for result in results:
+        print(f"\nTesting: {result['name']} ({result['duration_ms']:.1f} ms)")
         print("-" * 80)
-        result = test_func()
-        results.append(result)
+        for message in result['messages']:
+            PRINTERS[message['level']](message['message'])
 
     # Summary
     print("\n" + "="*80)
     print("TEST SUMMARY")
     print("="*80)
 
-    passed = sum(results)
+    passed = sum(result['passed'] for result in results)
     total = len(results)
 
-    if all(results):
-        success(f"All {total} tests passed!")
-        print()
-        return 0
+    if passed == total:
+        success(f"All {total} tests passed! ({duration_ms:.1f} ms)")
+    else:
+        error(f"{total - passed} out of {total} tests failed ({duration_ms:.1f} ms)")
+    print()
+
+
+def json_report(results, changed, duration_ms):
+    """Return the report as a JSON string."""
+    return json.dumps({
+        'passed': all(result['passed'] for result in results),
+        'changed': sorted(changed) if changed is not None else None,
+        'duration_ms': round(duration_ms, 3),
+        'checks': results,
+    }, indent=2)
+
+
+def junit_report(results, duration_ms):
+    """Return the report as a JUnit XML string."""
+    failures = sum(not result['passed'] for result in results)
+    suites = ET.Element('testsuites')
+    suite = ET.SubElement(suites, 'testsuite', {
+        'name': 'validate_structure',
+        'tests': str(len(results)),
+        'failures': str(failures),
+        'errors': '0',
+        'time': f"{duration_ms / 1000:.6f}",
+    })
+    for result in results:
+        case = ET.SubElement(suite, 'testcase', {
+            'classname': 'validate_structure',
+            'name': result['name'],
+            'time': f"{result['duration_ms'] / 1000:.6f}",
+        })
+        lines = [f"{m['level'].upper()}: {m['message']}" for m in result['messages']]
+        if not result['passed']:
+            errors = [m['message'] for m in result['messages'] if m['level'] == 'error']
+            failure = ET.SubElement(case, 'failure', {'message': errors[0] if errors else 'failed'})
+            failure.text = "\n".join(lines)
+        if lines:
+            ET.SubElement(case, 'system-out').text = "\n".join(lines)
+    return ET.tostring(suites, encoding='unicode')
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Validate repository structure and formatting",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python3 scripts/validate_structure.py
+    python3 scripts/validate_structure.py --changed
+    python3 scripts/validate_structure.py --changed HEAD~1 --format json
+    python3 scripts/validate_structure.py --format junit --output validate.xml
+        """
+    )
+    parser.add_argument(
+        "--changed",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="REV",
+        help="Only re-check files changed since the last successful run, or since git revision REV",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "junit"],
+        default="text",
+        help="Output format (default: text)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Write the report to this file instead of stdout",
+    )
+    profiling.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    """Run all tests."""
+    args = parse_args()
+    profiling.enable("validate_structure", args)
+    start = time.perf_counter()
+
+    # Load failures are reported as a failed check, so JSON and JUnit output stay well formed
+    setup = Report()
+    with profiling.stage("load characters"):
+        characters = load_all_characters(setup)
+
+    # Work out which files need re-checking
+    with profiling.stage("snapshot files"):
+        snapshot = snapshot_files()
+    changed = None
+    if characters is not None and args.changed == "":
+        changed = changed_since_last_run(snapshot)
+    elif characters is not None and args.changed is not None:
+        changed = changed_since_revision(args.changed, setup)
+
+    if setup.messages:
+        results = [check_result("Characters and changes can be loaded", False, setup,
+                                (time.perf_counter() - start) * 1000)]
+    else:
+        results = run_checks(characters, changed)
+    duration_ms = (time.perf_counter() - start) * 1000
+    all_passed = all(result['passed'] for result in results)
+
+    if all_passed:
+        save_state(snapshot)
+
+    if args.format == "text" and not args.output:
+        print_text_report(results, changed, duration_ms)
     else:
-        error(f"{total - passed} out of {total} tests failed")
-        print()
-        return 1
+        if args.format == "json":
+            output = json_report(results, changed, duration_ms)
+        elif args.format == "junit":
+            output = junit_report(results, duration_ms)
+        else:
+            output = "\n".join(
+                f"{m['level'].upper()}: {m['message']}"
+                for result in results for m in result['messages']
+            )
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + "\n")
+        else:
+            print(output)
+
+    return 0 if all_passed else 1
 
 
 if __name__ == '__main__':
@@ -0,0 +1,20 @@
+"""Shared pytest setup: the scripts are flat modules, imported from scripts/."""
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+
+@pytest.fixture
+def project_dir(tmp_path, monkeypatch):
+    """A copy of the repository's templates, characters and pages, as the working directory."""
+    for name in ("templates", "characters", "pages"):
+        shutil.copytree(ROOT / name, tmp_path / name)
+    shutil.copy(ROOT / "book.yaml", tmp_path / "book.yaml")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,104 @@
+import asyncio
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+import backends
+from conftest import ROOT
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(backends, "RATE_LIMIT_DB", tmp_path / "rate-limits.db")
+    monkeypatch.setattr(backends, "RATE_LIMIT_POLL", 0.01)
+
+
+async def _hold(limiter, seconds, log):
+    async with limiter:
+        log.append(("start", time.time()))
+        await asyncio.sleep(seconds)
+        log.append(("end", time.time()))
+
+
+def test_limiter_slots_are_shared_between_instances():
+    # Separate instances share state exactly as separate processes do
+    log = []
+
+    async def run():
+        await asyncio.gather(*(_hold(backends.RateLimiter("b", 1, None), 0.05, log) for _ in range(3)))
+
+    asyncio.run(run())
+
+    assert [event for event, _ in log] == ["start", "end"] * 3
+
+
+def test_limiter_spaces_request_starts():
+    log = []
+
+    async def run():
+        await asyncio.gather(*(_hold(backends.RateLimiter("b", 5, 600), 0, log) for _ in range(3)))
+
+    asyncio.run(run())
+
+    starts = sorted(t for event, t in log if event == "start")
+    assert starts[2] - starts[0] >= 0.19
+
+
+def test_slot_of_dead_process_is_reclaimed():
+    limiter = backends.RateLimiter("b", 1, None)
+    conn = limiter._connect()
+    conn.execute("INSERT INTO slots (token, backend, pid, host, expires_at) VALUES ('x', 'b', ?, ?, ?)",
+                 (2 ** 22 + 1, socket.gethostname(), time.time() + 60))
+    conn.close()
+
+    assert limiter._try_acquire("y") is not None
+
+
+def test_waiting_on_the_database_does_not_block_the_event_loop():
+    backends.RateLimiter("b", 1, None)._connect().close()
+    blocker = sqlite3.connect(str(backends.RATE_LIMIT_DB), isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    ticks = []
+
+    async def unblock():
+        for _ in range(5):
+            ticks.append(time.time())
+            await asyncio.sleep(0.02)
+        blocker.execute("COMMIT")
+
+    async def run():
+        await asyncio.gather(_hold(backends.RateLimiter("b", 1, None), 0, []), unblock())
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+    blocker.close()
+
+    assert len(ticks) == 5
+
+
+def test_plugins_register_when_run_as_a_script(tmp_path):
+    scripts = tmp_path / "scripts"
+    shutil.copytree(ROOT / "scripts", scripts, ignore=shutil.ignore_patterns("__pycache__"))
+    (scripts / "backend_demo.py").write_text(
+        "from backends import Backend, register\n\n\n"
+        "@register\nclass DemoBackend(Backend):\n    name = 'demo'\n    description = 'Demo service'\n"
+    )
+
+    result = subprocess.run([sys.executable, str(scripts / "backends.py")], capture_output=True, text=True,
+                            cwd=tmp_path)
+
+    assert "Demo service" in result.stdout
+
+
+def test_only_capped_backends_are_sent_reference_sheets():
+    import argparse
+    import gen_image
+
+    args = argparse.Namespace(separate_references=False)
+    assert [b.name for b in backends.all_backends() if gen_image.uses_reference_sheets(b, args)] == ["openai"]
+    args.separate_references = True
+    assert not any(gen_image.uses_reference_sheets(b, args) for b in backends.all_backends())
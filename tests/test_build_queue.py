@@ -0,0 +1,52 @@
+import sqlite3
+import sys
+import time
+
+import pytest
+
+import build_queue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    db_path = tmp_path / "queue.db"
+    conn = build_queue.connect(db_path)
+    conn.execute("INSERT INTO tenants (tenant) VALUES (?)", (str(tmp_path),))
+    conn.execute("INSERT INTO jobs (tenant, char_code, created_at) VALUES (?, 'cu', ?)", (str(tmp_path), time.time()))
+    yield db_path, conn
+    conn.close()
+
+
+def _status(conn):
+    return conn.execute("SELECT status FROM jobs").fetchone()["status"]
+
+
+def test_failed_jobs_are_retried_up_to_max_attempts(queue):
+    db_path, conn = queue
+    statuses = []
+    for _ in range(build_queue.MAX_ATTEMPTS):
+        job = build_queue.claim(conn, "w", 1)
+        statuses.append(build_queue.finish(conn, job, "w", False, "exit code 1"))
+
+    assert statuses == ["queued"] * (build_queue.MAX_ATTEMPTS - 1) + ["failed"]
+    assert _status(conn) == "failed"
+    assert build_queue.claim(conn, "w", 1) is None
+
+
+def test_dead_lease_renewer_stops_the_job(queue, monkeypatch):
+    db_path, conn = queue
+    monkeypatch.setattr(build_queue, "JOB_COMMAND", [sys.executable, "-c", "import time; time.sleep(30)"])
+    monkeypatch.setattr(build_queue, "LEASE_RENEW_SECONDS", 0.01)
+    monkeypatch.setattr(build_queue, "POLL_SECONDS", 0.05)
+
+    def broken_renewal(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(build_queue, "renew_lease", broken_renewal)
+
+    start = time.time()
+    assert not build_queue.run_job(db_path, build_queue.claim(conn, "w", 1), "w")
+    assert time.time() - start < 10
+    row = conn.execute("SELECT * FROM jobs").fetchone()
+    assert row["status"] == "queued"
+    assert "lease renewal failed: disk I/O error" in row["message"]
@@ -0,0 +1,78 @@
+import continuity
+
+SEEDS = {
+    'cu': continuity.seed_character('cu', {
+        'attributes': {'name': 'Cullan', 'gender': 'male', 'age': 9,
+                       'visual_description': ['Nine years old', 'Messy brown hair']},
+        'story': [f"cu-{n:02d}.yaml" for n in range(1, 7)],
+    }),
+    'em': continuity.seed_character('em', {
+        'attributes': {'name': 'Emer', 'gender': 'female', 'age': 5},
+        'story': [f"em-{n:02d}.yaml" for n in range(1, 7)],
+    }),
+}
+
+
+def _props(text, participants=('cu',)):
+    return [key for owner, phrase, key in continuity.scan_page({'visual': text}, SEEDS, list(participants))['props']]
+
+
+def test_concrete_possessions_are_props():
+    assert _props("Cullan lifts his trusty camera and his blue pyramid toy.") == ['camera', 'pyramid']
+
+
+def test_feelings_ideas_and_people_are_not_props():
+    text = "Emer shows her joy and her creativity to her brother on her journey, full of her happiness."
+    assert _props(text, participants=('em',)) == []
+
+
+def test_adjectives_and_fields_of_study_are_recognised_by_rule():
+    assert _props("Cullan flicks his bushy tail, shows his photography and his journey began.") == ['tail']
+
+
+def _tracker(carried_on, noun):
+    tracker = continuity.ContinuityTracker()
+    tracker.seeds = SEEDS
+    for spread, page in enumerate(SEEDS['cu']['story'], start=1):
+        text = f"Cullan holds his {noun}." if spread in carried_on else "Cullan looks around."
+        tracker.pages[page] = {'stamp': None, 'scan': continuity.scan_page({'visual': text}, SEEDS, ['cu'])}
+    return tracker
+
+
+def test_single_prop_gap_is_a_disappearance():
+    issues = _tracker({1, 2, 4, 5}, 'camera').issues()
+
+    assert [issue['message'] for issue in issues] == [
+        "Cullan's camera disappears on spread 3 (cu-03) between spreads 2 and 4"
+    ]
+
+
+def test_longer_prop_gap_names_the_spread_range():
+    issues = _tracker({1, 2, 5, 6}, 'camera').issues()
+
+    assert [issue['message'] for issue in issues] == [
+        "Cullan's camera disappears on spreads 3-4 (cu-03, cu-04) between spreads 2 and 5"
+    ]
+
+
+def test_collections_are_not_reported_as_disappearing():
+    assert _tracker({1, 2, 4, 5}, 'toys').issues() == []
+
+
+def test_trait_colour_contradiction():
+    scan = continuity.scan_page({'visual': "Cullan pushes back his blonde hair."}, SEEDS, ['cu'])
+    tracker = continuity.ContinuityTracker()
+    tracker.seeds = SEEDS
+    tracker.pages['cu-01.yaml'] = {'stamp': None, 'scan': scan}
+
+    assert [issue['level'] for issue in tracker.issues()] == ['error']
+
+
+def test_unreadable_character_is_reported_and_skipped(project_dir, capsys):
+    (project_dir / "characters" / "zz-broken.yaml").write_text("id: [zz\n")
+
+    tracker = continuity.ContinuityTracker()
+    tracker.update()
+
+    assert sorted(tracker.seeds) == ['cu', 'em', 'ha']
+    assert "zz-broken.yaml" in capsys.readouterr().err
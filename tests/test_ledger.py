@@ -0,0 +1,78 @@
+import shutil
+import time
+
+import pytest
+
+import budget
+import gen_image
+import ledger
+from conftest import ROOT
+
+PAGE = "cu-01.yaml"
+
+
+@pytest.fixture
+def project(project_dir):
+    shutil.copytree(ROOT / "ref-images", project_dir / "ref-images")
+    (project_dir / "out-images").mkdir()
+    return project_dir
+
+
+def _generate(quality):
+    """Record a successful generation of PAGE as gen_image.py would, without calling the API."""
+    backend = gen_image.get_backend("openai")
+    references = gen_image.get_reference_images("cu-01")
+    prompt = gen_image.build_full_prompt(
+        gen_image.load_page_data(f"pages/{PAGE}"), gen_image.load_visual_style(), references,
+        gen_image.load_character_descriptions("cu-01"), gen_image.typeset_enabled(), backend.max_prompt_chars,
+    )
+    output_path = "out-images/cu-01-openai.jpg"
+    open(output_path, "wb").close()
+    ledger.record("cu-01", "openai", prompt, references, time.time(), "ok", output_path=output_path,
+                  model=backend.model, size=backend.sizes[0], quality=backend.quality_for(quality))
+
+
+def _status(quality=None):
+    conn = ledger.connect()
+    try:
+        return ledger.stale(conn, [PAGE], quality)[0]["status"]
+    finally:
+        conn.close()
+
+
+def test_planning_does_not_build_reference_sheets(project):
+    build_plan = budget.plan([PAGE], "medium")
+
+    assert build_plan["pages"][0]["references"] > 0
+    assert _status() == "unknown"
+    assert not (project / ".katha-cache" / "ref-sheets").exists()
+
+
+def test_stale_matches_the_requested_quality(project):
+    _generate("low")
+
+    assert _status() == "current"
+    assert _status("low") == "current"
+    assert _status("high") == "stale"
+    assert budget.plan([PAGE], "high", skip_current=True)["pages"][0]["generate"]
+    assert not budget.plan([PAGE], "low", skip_current=True)["pages"][0]["generate"]
+
+
+def test_unbuilt_sheets_match_by_name(project):
+    _generate("medium")
+    shutil.rmtree(project / ".katha-cache" / "ref-sheets")
+
+    assert _status("medium") == "current"
+
+
+def test_skip_current_plan_builds_each_prompt_once(project, monkeypatch):
+    _generate("low")
+    calls = []
+    build_full_prompt = gen_image.build_full_prompt
+    monkeypatch.setattr(gen_image, "build_full_prompt", lambda *a: calls.append(a) or build_full_prompt(*a))
+
+    with_ledger = budget.plan([PAGE], "high", skip_current=True)["pages"][0]
+    without_ledger = budget.plan([PAGE], "high")["pages"][0]
+
+    assert len(calls) == 2
+    assert with_ledger["cost"] == without_ledger["cost"]
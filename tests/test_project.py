@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import build_queue
+from project import load_characters
+
+
+def test_characters_are_keyed_by_id(project_dir):
+    (project_dir / "characters" / "xx-renamed.yaml").write_text("id: zz\nattributes:\n  name: Zed\n")
+    (project_dir / "characters" / "qq-example.yaml").write_text("id: qq\n")
+
+    characters = load_characters()
+
+    assert sorted(characters) == ["cu", "em", "ha", "zz"]
+    assert characters["zz"]["name"] == "Zed"
+    assert build_queue.find_characters(Path(".")) == ["cu", "em", "ha", "zz"]
+
+
+def test_unreadable_characters_are_reported_and_skipped(project_dir):
+    (project_dir / "characters" / "zz-broken.yaml").write_text("id: [zz\n")
+
+    errors = []
+    characters = load_characters(errors=errors)
+
+    assert sorted(characters) == ["cu", "em", "ha"]
+    assert [path.name for path, _ in errors] == ["zz-broken.yaml"]
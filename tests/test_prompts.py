@@ -0,0 +1,79 @@
+import pytest
+
+import prompts
+
+PAGE = {
+    "visual": " ".join(["A dramatic forest scene where a clear stream rushes over smooth rocks."] * 10),
+    "text": " ".join(["Cullan heard frightened crying from the stream. There was little Hansel, stuck on a boulder!"] * 4),
+}
+STYLE = "\n".join(f"- Style point {n}, soft watercolour textures throughout" for n in range(10))
+CHARACTERS = {"Hansel": ["Two years old", "Wispy blonde hair"], "Cullan": ["Nine years old", "Carries a camera"]}
+REFERENCES = [{"description": "a labelled reference sheet for Cullan"}]
+
+
+def _compile(max_chars=None, **page):
+    sections = prompts.build_sections(dict(PAGE, **page), STYLE, REFERENCES, CHARACTERS)
+    return prompts.compile_prompt(sections, max_chars)
+
+
+def _chars(compiled, section):
+    return next(s["chars"] for s in compiled.sections if s["section"] == section)
+
+
+def test_no_budget_keeps_everything_with_a_stable_prefix():
+    compiled = _compile()
+
+    assert compiled.trimmed == []
+    assert compiled.text.startswith("Create a beautiful illustration")
+    assert compiled.text.index("CHARACTER: Cullan") < compiled.text.index("CHARACTER: Hansel")
+    assert compiled.text.endswith(PAGE["text"])
+    # The shared prefix doesn't depend on the page
+    other = _compile(visual="A quiet meadow.", text="")
+    assert other.text[:other.prefix_chars] == compiled.text[:compiled.prefix_chars]
+
+
+def test_style_is_trimmed_before_characters():
+    full = _compile()
+    compiled = _compile(len(full.text) - 100)
+
+    assert len(compiled.text) <= len(full.text) - 100
+    assert compiled.trimmed == ["style"]
+
+
+def test_repeated_bullets_are_sent_once():
+    sections = prompts.build_sections(PAGE, "- Carries a camera\n- Warm light", [], CHARACTERS)
+    compiled = prompts.compile_prompt(sections)
+
+    assert compiled.text.count("Carries a camera") == 1
+    assert "CHARACTER: Cullan ---\n- Nine years old\n- Carries a camera" in compiled.text
+
+
+@pytest.mark.parametrize("max_chars", [1200, 300])
+def test_tight_budget_keeps_instruction_and_scene(max_chars):
+    compiled = _compile(max_chars)
+
+    assert "IMPORTANT: You MUST include story text" in compiled.text
+    assert _chars(compiled, "scene") > len("--- SCENE TO ILLUSTRATE ---")
+    assert "TEXT TO INCLUDE IN IMAGE" in compiled.text
+
+
+def test_budget_1200_fits_and_keeps_text_whole():
+    compiled = _compile(1200)
+
+    assert len(compiled.text) <= 1200
+    assert compiled.text.endswith(PAGE["text"])
+    assert "VISUAL STYLE" not in compiled.text
+
+
+def test_text_is_shortened_before_the_scene_drops_below_its_summary():
+    compiled = _compile(500)
+
+    scene = compiled.text.split("--- SCENE TO ILLUSTRATE ---\n")[1].split("\n\n")[0]
+    assert len(scene) >= prompts.MIN_SCENE_CHARS - 20
+    assert PAGE["visual"].startswith(scene)
+
+
+def test_truncation_is_at_word_boundaries():
+    assert prompts._truncate_words("Cullan heard crying", 14) == "Cullan heard"
+    assert prompts._truncate_words("Cullan heard crying", 12) == "Cullan heard"
+    assert prompts._truncate_words("Cullan heard crying", 3) == "Cullan"
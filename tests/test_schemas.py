@@ -0,0 +1,42 @@
+import yaml
+
+import schemas
+
+
+def _rewrite(path, **fields):
+    data = yaml.safe_load(path.read_text())
+    data.update(fields)
+    path.write_text(yaml.safe_dump(data, sort_keys=False))
+
+
+def test_repository_documents_are_valid(project_dir):
+    assert schemas.validate_documents() == []
+
+
+def test_spread_must_match_story_position(project_dir):
+    _rewrite(project_dir / "pages" / "em-03.yaml", spread=7)
+
+    violations = schemas.validate_documents()
+
+    assert [v.path for v in violations] == ["pages/em-03.yaml"]
+    assert "position 3" in violations[0].message
+
+
+def test_missing_field_and_wrong_id_are_reported_together(project_dir):
+    page = project_dir / "pages" / "cu-01.yaml"
+    data = yaml.safe_load(page.read_text())
+    del data["visual"]
+    data["id"] = "cu-99"
+    page.write_text(yaml.safe_dump(data))
+
+    messages = [v.message for v in schemas.validate_documents(["pages/cu-01.yaml"])]
+
+    assert len(messages) == 2
+    assert any("visual" in m for m in messages)
+    assert any("cu-99" in m for m in messages)
+
+
+def test_paths_filter_reports_only_those_files(project_dir):
+    _rewrite(project_dir / "pages" / "em-03.yaml", spread=7)
+
+    assert schemas.validate_documents(["pages/cu-01.yaml"]) == []
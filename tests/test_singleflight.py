@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import socket
+import time
+
+import pytest
+
+import singleflight
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(singleflight, "LOCK_DIR", tmp_path / "locks")
+    monkeypatch.setattr(singleflight, "POLL_INTERVAL", 0.01)
+    return tmp_path / "locks"
+
+
+def _acquire(name):
+    async def run():
+        async with singleflight.single_flight(name, log=lambda message: None) as lock:
+            return lock
+    return asyncio.run(asyncio.wait_for(run(), 5))
+
+
+def test_lock_is_exclusive_and_released():
+    first, second = singleflight.Lock("page.jpg"), singleflight.Lock("page.jpg")
+
+    assert first.try_acquire()
+    assert singleflight.read_holder(first.path)['token'] == first.token
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    assert [p.name for p in first.path.parent.iterdir()] == ["page.jpg.lock"]
+
+
+def test_lock_of_dead_pid_is_broken(lock_dir):
+    lock_dir.mkdir()
+    owner = {'token': 'dead', 'pid': 2 ** 22 + 1, 'host': socket.gethostname(), 'started_at': time.time()}
+    (lock_dir / "page.jpg.lock").write_text(json.dumps(owner))
+
+    lock = _acquire("page.jpg")
+
+    assert lock.broke['token'] == 'dead'
+    assert not (lock_dir / "page.jpg.lock").exists()
+
+
+def test_old_unreadable_lock_is_broken(lock_dir):
+    lock_dir.mkdir()
+    path = lock_dir / "page.jpg.lock"
+    path.write_text("")
+    old = time.time() - singleflight.STALE_AFTER - 10
+    os.utime(path, (old, old))
+
+    _acquire("page.jpg")
+
+    assert not path.exists()
+
+
+def test_fresh_unreadable_lock_is_waited_for_without_spinning(lock_dir, monkeypatch):
+    lock_dir.mkdir()
+    (lock_dir / "page.jpg.lock").write_text("")
+    reads = []
+
+    def read_holder(path):
+        reads.append(path)
+        if len(reads) > 1000:
+            raise AssertionError("busy-waiting on an unreadable lock")
+        return None
+
+    monkeypatch.setattr(singleflight, "read_holder", read_holder)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(singleflight.single_flight("page.jpg").__aenter__(), 0.2))
+    assert 1 <= len(reads) <= 100
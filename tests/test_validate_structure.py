@@ -0,0 +1,45 @@
+import json
+import subprocess
+import sys
+
+import validate_structure as vs
+from conftest import ROOT
+
+
+def test_changed_since_last_run_includes_deleted_files(project_dir):
+    vs.save_state(vs.snapshot_files())
+    (project_dir / "pages" / "em-03.yaml").unlink()
+    (project_dir / "pages" / "em-04.yaml").write_text("id: em-04\n")
+
+    changed = vs.changed_since_last_run(vs.snapshot_files())
+
+    assert changed == {"pages/em-03.yaml", "pages/em-04.yaml"}
+
+
+def test_changed_since_last_run_without_state_is_everything(project_dir):
+    snapshot = vs.snapshot_files()
+
+    assert vs.changed_since_last_run(snapshot) == set(snapshot)
+
+
+def test_changed_mode_reports_a_deleted_page(project_dir):
+    command = [sys.executable, str(ROOT / "scripts" / "validate_structure.py")]
+    assert subprocess.run(command, capture_output=True).returncode == 0
+
+    (project_dir / "pages" / "em-03.yaml").unlink()
+    result = subprocess.run(command + ["--changed"], capture_output=True, text=True)
+
+    assert result.returncode == 1
+    assert "Referenced page 'em-03.yaml' does not exist" in result.stdout
+
+
+def test_load_failures_keep_json_output_valid(project_dir):
+    (project_dir / "characters" / "zz-broken.yaml").write_text("id: [zz\n")
+    command = [sys.executable, str(ROOT / "scripts" / "validate_structure.py"), "--format", "json"]
+
+    result = subprocess.run(command, capture_output=True, text=True)
+
+    assert result.returncode == 1
+    report = json.loads(result.stdout)
+    assert not report["passed"]
+    assert "zz-broken.yaml" in report["checks"][0]["messages"][0]["message"]